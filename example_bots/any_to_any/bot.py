@@ -22,10 +22,12 @@ class AnyToAny(Bot):
         # Set side
         self.side = Side.SELL if self.market.base == self.from_currency else Side.BUY
         # Set buda trading client
-        self.buda = buda.BudaTrading(
-            self.market, dry_run=self.dry_run, timeout=self.timeout, logger=self.log, store=self.store)
-        # Get deposits
-        self.deposits = self.store.get(self.from_currency + '_deposits') or {}
+        self.buda = self.get_client(
+            buda.BudaTrading, self.market, dry_run=self.dry_run, timeout=self.timeout, logger=self.log,
+            store=self.store)
+        # Get deposits, stored as a hash by id
+        self.deposits_key = self.from_currency + '_deposits'
+        self.deposits = self.store.hgetall(self.deposits_key)
         # Set start date
         self.start_date = datetime.utcnow()
 
@@ -53,12 +55,14 @@ class AnyToAny(Bot):
         if self.from_address != 'Any':
             new_deposits = [deposit for deposit in new_deposits if deposit.data.address == self.from_address]
         new_deposits = [deposit for deposit in new_deposits if deposit.created_at >= self.start_date]
-        # Update states on existing keys and add new keys with base structure
+        # Update states on existing keys and add new keys with base structure, stored at once
+        pipe = self.store.pipeline()
         for deposit in new_deposits:
             idx = str(deposit.id)
             if idx in deposits.keys():
                 if deposit.state != deposits[idx]['state']:
                     deposits[idx]['state'] = deposit.state
+                    pipe.hset(self.deposits_key, idx, deposits[idx])
             else:
                 deposits[idx] = {
                     'state': deposit.state,
@@ -68,8 +72,9 @@ class AnyToAny(Bot):
                     'orders': [],
                     'pending_withdrawal': self.to_withdraw
                     }
-            self.store.store(self.from_currency + '_deposits', deposits)
-            self.deposits = deposits
+                pipe.hset(self.deposits_key, idx, deposits[idx])
+        pipe.execute()
+        self.deposits = deposits
 
     def process_conversions(self):
         # Get deposits
@@ -106,7 +111,7 @@ class AnyToAny(Bot):
                 # Save new values
                 deposits[deposit_id]['amounts']['converted_amount'] = converted_amount
                 deposits[deposit_id]['amounts']['converted_value'] = converted_value
-                self.store.store(self.from_currency + '_deposits', deposits)
+                self.store.hset(self.deposits_key, deposit_id, deposits[deposit_id])
                 self.deposits = deposits
 
     def process_withdrawals(self):
@@ -127,7 +132,7 @@ class AnyToAny(Bot):
                     if w.state == 'pending_preparation':  # Check state to set and store updated values
                         self.log.info(f'{self.to_currency} withdrawal request received, updating store values')
                         deposits[deposit_id]['pending_withdrawal'] = False
-                        self.store.store(self.from_currency + '_deposits', deposits)
+                        self.store.hset(self.deposits_key, deposit_id, deposits[deposit_id])
                         self.deposits = deposits
                     else:
                         self.log.warning('Withdrawal failed')
@@ -22,8 +22,9 @@ class SimpleLimit(Bot):
         self.bid_price, self.ask_price = None, None
         self.base_amount, self.quote_amount = None, None
         # Set buda trading client
-        self.buda = buda.BudaTrading(
-            self.market, dry_run=self.dry_run, timeout=self.timeout, logger=self.log, store=self.store)
+        self.buda = self.get_client(
+            buda.BudaTrading, self.market, dry_run=self.dry_run, timeout=self.timeout, logger=self.log,
+            store=self.store)
         # Set converter
         self.converter = OpenExchangeRates(timeout=self.timeout)
         # Set reference market client
@@ -134,8 +135,8 @@ class SimpleLimit(Bot):
     def _get_market_client(self, name, market):
         for client in self.market_clients:
             if client.name == name:
-                return client(market, client=None, dry_run=self.dry_run,
-                              timeout=self.timeout, logger=self.log, store=self.store)
+                return self.get_client(client, market, client=None, dry_run=self.dry_run,
+                                       timeout=self.timeout, logger=self.log, store=self.store)
         raise NotImplementedError(f'Client {name} not found!')
 
     def truncate_amount(self, value):
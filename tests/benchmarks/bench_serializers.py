@@ -0,0 +1,60 @@
+"""Serializer size and dumps/loads times across payload sizes: stdlib json and pickle, and the framed
+codecs with and without compression.
+
+Run from the repository root: PYTHONPATH=. python tests/benchmarks/bench_serializers.py [--trades 1000 100000]
+"""
+import argparse
+import json
+import pickle
+import random
+import time
+
+from trading_bots.core.serializers import *
+
+
+def payload(trades: int) -> dict:
+    """Ingestion state like the TechnicalAnalysis bot's: seen trade ids and trades"""
+    return {
+        'ids': list(range(trades)),
+        'trades': [{'id': i, 'timestamp': 1500000000 + i, 'rate': random.uniform(6000, 7000),
+                    'amount': random.uniform(0, 2), 'side': random.choice(['buy', 'sell'])} for i in range(trades)],
+    }
+
+
+def candidates() -> dict:
+    framed = {'framed json': JSONCodec(), 'framed pickle': PickleCodec()}
+    if 'orjson' in serializers:
+        framed['framed orjson'] = OrjsonCodec()
+    if 'msgpack' in serializers:
+        framed['framed msgpack'] = MsgpackCodec()
+    results = {'json': json, 'pickle': pickle}
+    for name, codec in framed.items():
+        results[name] = FramedSerializer(codec, compress_threshold=None)
+        results[f'{name} zlib'] = FramedSerializer(codec, compress_threshold=1024)
+    return results
+
+
+def timed(function, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trades', type=int, nargs='+', default=[10, 1000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    for trades in args.trades:
+        value = payload(trades)
+        print(f'{trades} trades:')
+        for name, serializer in candidates().items():
+            data = serializer.dumps(value)
+            dumps = timed(lambda: serializer.dumps(value), args.repeat)
+            loads = timed(lambda: serializer.loads(data), args.repeat)
+            print(f'  {name:<22} {len(data):>10,} bytes  dumps {dumps * 1e3:8.2f} ms  loads {loads * 1e3:8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
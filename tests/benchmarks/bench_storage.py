@@ -0,0 +1,57 @@
+"""LogStore vs JSONStore, per hset and hget on a single hash of N keys, and LogStore replay.
+
+Run from the repository root: PYTHONPATH=. python tests/benchmarks/bench_storage.py [--keys 10000 1000000]
+"""
+import argparse
+import logging
+import os
+import random
+import tempfile
+import time
+
+from trading_bots.core.storage import JSONStore, LogStore
+
+# Debug logs of every operation would be most of the measure
+logger = logging.getLogger('benchmark')
+logger.setLevel(logging.ERROR)
+
+
+def per_op(function, ops: int) -> float:
+    started = time.perf_counter()
+    for i in range(ops):
+        function(i)
+    return (time.perf_counter() - started) / ops
+
+
+def bench(store_cls, filename: str, keys: int, ops: int) -> dict:
+    store = store_cls(filename, logger=logger)
+    store.hmset('hash', {str(i): i for i in range(keys)})
+    store.close()
+    results = {}
+    started = time.perf_counter()
+    store = store_cls(filename, logger=logger)
+    results['open'] = time.perf_counter() - started
+    results['hset'] = per_op(lambda i: store.hset('hash', str(random.randrange(keys)), i), ops)
+    results['hget'] = per_op(lambda i: store.hget('hash', str(random.randrange(keys))), ops)
+    store.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--keys', type=int, nargs='+', default=[10000, 1000000])
+    parser.add_argument('--ops', type=int, default=1000, help='LogStore operations per measure')
+    parser.add_argument('--json-ops', type=int, default=5, help='JSONStore operations per measure')
+    args = parser.parse_args()
+    for keys in args.keys:
+        with tempfile.TemporaryDirectory() as tmp:
+            json_results = bench(JSONStore, os.path.join(tmp, 'store.json'), keys, args.json_ops)
+            log_results = bench(LogStore, os.path.join(tmp, 'store.log'), keys, args.ops)
+        print(f'{keys} keys: JSONStore hset {json_results["hset"] * 1e3:.1f} ms, '
+              f'hget {json_results["hget"] * 1e3:.1f} ms | '
+              f'LogStore hset {log_results["hset"] * 1e6:.0f} us, hget {log_results["hget"] * 1e6:.0f} us, '
+              f'replay {log_results["open"]:.2f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+from trading_bots.conf import settings
+
+# Clients and converters read their credentials on init, without a settings file there are none
+if 'credentials' not in settings.as_dict():
+    settings.configure(credentials={})
@@ -0,0 +1,147 @@
+import tempfile
+import threading
+import time
+import unittest
+
+import numpy as np
+
+from trading_bots.backtest import *
+from trading_bots.bots import Bot
+from trading_bots.contrib.clients import Side, buda
+from trading_bots.contrib.simulator import SimulatedExchange, SimulatedTrading, simulated_clients, synthetic_books
+from trading_bots.core.storage import MemoryStore
+
+START = 1500000000
+
+
+class BuyTheDip(Bot):
+    label = 'BuyTheDip'
+
+    def _setup(self, config):
+        self.buda = self.get_client(buda.BudaTrading, config['market'], dry_run=self.dry_run, logger=self.log,
+                                    store=self.store)
+        self.timestamps = []
+
+    def _algorithm(self):
+        self.timestamps.append(time.time())
+        max_bid, min_ask = self.buda.get_spread_details()
+        if min_ask < self.config['price'] and not self.store.get('bought'):
+            self.buda.place_market_order(Side.BUY, self.config['amount'])
+            self.store.set('bought', True)
+
+
+class BacktestTest(unittest.TestCase):
+
+    def setUp(self):
+        self.config = {'market': 'BTCCLP', 'price': 5000000, 'amount': 0.5}
+        self.books = list(synthetic_books(5000000, START, interval=60, steps=120, volatility=0.005, seed=3))
+
+    def backtest(self, **kwargs):
+        feed = book_events('BTCCLP', self.books)
+        return Backtest(BuyTheDip, self.config, feed, balances={'CLP': 10000000}, **kwargs)
+
+    def test_run(self):
+        result = self.backtest(interval=300).run()
+        self.assertEqual(result.ticks, 25)
+        self.assertEqual(result.errors, 0)
+        self.assertEqual(len(result.cpu_times), result.ticks)
+        self.assertEqual(result.start, START)
+        self.assertEqual(result.end, START + 24 * 300)
+        self.assertEqual(result.fills, 1)
+        self.assertAlmostEqual(result.balances_end['BTC'], 0.5)
+        self.assertEqual(len(result.equity), result.ticks)
+
+    def test_simulated_clients(self):
+        exchange = SimulatedExchange()
+        bot = BuyTheDip(self.config, store=MemoryStore(), clients=simulated_clients(exchange))
+        self.assertIsInstance(bot.buda, SimulatedTrading)
+        self.assertIs(bot.buda.client, exchange)
+        self.assertFalse(bot.buda.dry_run)
+        # Clients are only simulated when given
+        self.assertIsInstance(buda.BudaTrading('BTCCLP', client=object(), store=MemoryStore()), buda.BudaTrading)
+
+    def test_market_data(self):
+        data = MarketData.from_books('BTCCLP', self.books)
+        with tempfile.TemporaryDirectory() as directory:
+            data.save(directory)
+            loaded, = load_market_data(directory)
+            self.assertIsInstance(loaded.books, np.memmap)
+            events = list(loaded.feed(start=START + 60, end=START + 180))
+            self.assertEqual([e.timestamp for e in events], [START + 60, START + 120, START + 180])
+            self.assertEqual(events[0].order_book, self.books[1][1])
+
+    def test_sweep(self):
+        data = MarketData.from_books('BTCCLP', self.books)
+        parameter_sweep = ParameterSweep(BuyTheDip, self.config, data, interval=300, balances={'CLP': 10000000},
+                                         workers=2, sort_by='fills')
+        results = parameter_sweep.grid({'price': [1000, 5000000], 'amount': [0.1, 0.5]})
+        self.assertEqual([r['rank'] for r in results], [1, 2, 3, 4])
+        self.assertEqual([r['fills'] for r in results], [1, 1, 0, 0])
+        self.assertEqual({r['price'] for r in results[:2]}, {5000000})
+        self.assertIn('total_return', format_table(results).splitlines()[0])
+
+    def test_random_params(self):
+        params = random_params({'talib.rsi.periods': (7, 28), 'prices.buy_multiplier': [0.9, 0.95]}, 10, seed=1)
+        self.assertEqual(len(params), 10)
+        self.assertTrue(all(7 <= p['talib.rsi.periods'] <= 28 for p in params))
+        config = {'talib': {'rsi': {'periods': 14}}}
+        set_param(config, 'talib.rsi.periods', 21)
+        self.assertEqual(config, {'talib': {'rsi': {'periods': 21}}})
+
+    def test_virtual_clock(self):
+        real_time = time.time
+        clock = VirtualClock(START)
+        with clock.patch():
+            time.sleep(30)
+            self.assertEqual(time.time(), START + 30)
+            # Other threads keep the real time
+            times = []
+            thread = threading.Thread(target=lambda: times.append(time.time()))
+            thread.start()
+            thread.join()
+            self.assertGreater(times[0], START + 30)
+        self.assertIs(time.time, real_time)
+
+
+class VectorizedBacktestTest(unittest.TestCase):
+
+    def setUp(self):
+        rnd = np.random.default_rng(5)
+        self.close = 1000 * np.exp(np.cumsum(rnd.normal(0, 0.01, 5000)))
+        self.backtest = VectorizedBacktest(self.close, '5min', fee=0.001)
+
+    def test_candles_from_trades(self):
+        candles = candles_from_trades([0, 10, 70, 250], [1, 3, 2, 5], interval='1min')
+        self.assertEqual(list(candles.timestamp), [0, 60, 120, 180, 240])
+        self.assertEqual(list(candles.close), [3, 2, 2, 2, 5])
+        self.assertEqual(list(candles.high), [3, 2, 2, 2, 5])
+        self.assertEqual(list(candles.open), [1, 2, 2, 2, 5])
+
+    def test_positions_follow_signals(self):
+        params = dict(bbands_periods=20, rsi_periods=14, overbought=70, oversold=30)
+        positions = self.backtest.positions(**params)
+        upper, lower = self.backtest.bbands(20, 2.0)
+        rsi = self.backtest.rsi(14)
+        position = 0
+        for i, close in enumerate(self.close):
+            if position == 1 and rsi[i] >= 30:
+                position = 0
+            elif position == -1 and rsi[i] <= 70:
+                position = 0
+            if position == 0:
+                if close < lower[i] and rsi[i] < 30:
+                    position = 1
+                elif close > upper[i] and rsi[i] > 70:
+                    position = -1
+            self.assertEqual(positions[i], position)
+
+    def test_sweep(self):
+        results = self.backtest.sweep({'bbands_periods': [10, 20], 'oversold': [20, 30]})
+        self.assertEqual(len(results), 4)
+        self.assertGreaterEqual(results[0]['total_return'], results[-1]['total_return'])
+
+    def test_params_from_config(self):
+        config = {'talib': {'bbands': {'periods': 10}, 'rsi': {'periods': 7, 'overbought': 80, 'oversold': 20}}}
+        params = VectorizedBacktest.params_from_config(config)
+        self.assertEqual(params['bbands_periods'], 10)
+        self.assertEqual(params['oversold'], 20)
@@ -0,0 +1,109 @@
+import threading
+import time
+import unittest
+import unittest.mock
+
+from trading_bots.core.cache import *
+from trading_bots.core.storage import MemoryStore
+
+
+class MemoizeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.store = MemoryStore()
+        self.calls = []
+
+    def memoize(self, **options):
+        def rate(currency, to='USD'):
+            self.calls.append((currency, to))
+            return len(self.calls)
+        return memoize(rate, store=self.store, **options)
+
+    def test_ttl(self):
+        rate = self.memoize(ttl=10)
+        self.assertEqual(rate('BTC'), 1)
+        self.assertEqual(rate('BTC'), 1)
+        self.assertEqual(rate('BTC', to='CLP'), 2)
+        with unittest.mock.patch('time.time', return_value=time.time() + 15):
+            self.assertEqual(rate('BTC'), 3)
+        self.assertEqual((rate.hits, rate.misses), (1, 3))
+
+    def test_store(self):
+        self.memoize()('BTC')
+        # A restarted process finds the result in the store
+        restarted = self.memoize()
+        self.assertEqual(restarted('BTC'), 1)
+        self.assertEqual(len(self.calls), 1)
+        # Another version doesn't
+        self.assertEqual(self.memoize(version=2)('BTC'), 2)
+
+    def test_in_process_only(self):
+        rate = memoize(lambda currency: currency.lower(), store=False, maxsize=2)
+        for currency in ('BTC', 'ETH', 'LTC', 'LTC'):
+            rate(currency)
+        self.assertEqual(list(rate.cache), [rate.key('ETH'), rate.key('LTC')])
+        self.assertEqual(self.store.scan(), [])
+
+    def test_stale_while_revalidate(self):
+        rate = self.memoize(ttl=10, stale_ttl=60)
+        rate('BTC')
+        with unittest.mock.patch('time.time', return_value=time.time() + 15):
+            self.assertEqual(rate('BTC'), 1)
+            for _ in range(100):
+                if len(self.calls) == 2 and rate.cache[rate.key('BTC')][0] == 2:
+                    break
+                time.sleep(0.01)
+        self.assertEqual(rate('BTC'), 2)
+
+    def test_single_flight(self):
+        computing = threading.Event()
+
+        def slow(currency):
+            self.calls.append(currency)
+            computing.wait(1)
+            return currency
+
+        rate = memoize(slow, store=self.store)
+        threads = [threading.Thread(target=rate, args=('BTC',)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        computing.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, ['BTC'])
+
+    def test_invalidate(self):
+        rate = self.memoize()
+        rate('BTC')
+        rate.invalidate('BTC')
+        self.assertEqual(rate('BTC'), 2)
+        self.assertEqual(rate.refresh('BTC'), 3)
+
+    def test_method(self):
+        class Converter:
+            market = 'BTCUSD'
+
+            @memoize(store=self.store, key=lambda converter, amount: (converter.market, amount))
+            def convert(self, amount):
+                return amount * 2
+
+        self.assertEqual(Converter().convert(2), 4)
+        self.assertEqual(Converter().convert(2), 4)
+        self.assertEqual(Converter.convert.hits, 1)
+
+    def test_method_default_key(self):
+        class Converter:
+
+            def __init__(self, rate):
+                self.rate = rate
+
+            @memoize(store=self.store)
+            def convert(self, amount):
+                return amount * self.rate
+
+        # Keyed without the instance, results are shared by the bots rebuilt on every run
+        self.assertEqual(Converter(2).convert(2), 4)
+        self.assertEqual(Converter(3).convert(2), 4)
+        self.assertEqual(Converter.convert.hits, 1)
+        self.assertEqual(Converter.convert.key(Converter(2), 2), Converter.convert.key(Converter(3), 2))
@@ -0,0 +1,57 @@
+import os
+import tempfile
+import unittest
+
+from trading_bots.core.history import TradeHistory
+
+
+def trades(*timestamps):
+    return [dict(timestamp=t, rate=t * 10, amount=-1 if t % 2 else 1) for t in timestamps]
+
+
+class TradeHistoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.history = TradeHistory(os.path.join(self.tmp.name, 'history', 'btcusd.trades'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_append_and_range(self):
+        self.assertIsNone(self.history.last_timestamp())
+        self.assertEqual(self.history.append(trades(3, 1, 2)), 3)
+        self.assertEqual(self.history.append(trades(4, 5)), 2)
+        records = self.history.range(2, 4)
+        self.assertEqual(list(records['timestamp']), [2, 3, 4])
+        self.assertEqual(list(records['side']), [1, -1, 1])
+        self.assertEqual(list(records['amount']), [1, 1, 1])
+        self.assertEqual(self.history.first_timestamp(), 1)
+        self.assertEqual(self.history.last_timestamp(), 5)
+
+    def test_older_trades_dropped(self):
+        self.history.append(trades(5, 6))
+        self.assertEqual(self.history.append(trades(4, 6, 7)), 2)
+        self.assertEqual(list(self.history.range()['timestamp']), [5, 6, 6, 7])
+
+    def test_discard_before(self):
+        self.history.append(trades(*range(10)))
+        self.assertEqual(self.history.discard_before(3), 0)
+        self.assertEqual(len(self.history), 10)
+        self.assertEqual(self.history.discard_before(6), 6)
+        self.assertEqual(list(self.history.range()['timestamp']), [6, 7, 8, 9])
+
+    def test_partial_record_ignored(self):
+        self.history.append(trades(1))
+        with open(self.history.filename, 'ab') as f:
+            f.write(b'\0' * 7)
+        self.assertEqual(len(self.history), 1)
+        self.history.append(trades(2))
+        self.assertEqual(list(self.history.range()['rate']), [10, 20])
+
+    def test_persistence(self):
+        self.history.append(trades(1, 2))
+        reopened = TradeHistory(self.history.filename)
+        self.assertEqual(len(reopened), 2)
+        reopened.clear()
+        self.assertEqual(len(reopened), 0)
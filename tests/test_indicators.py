@@ -0,0 +1,199 @@
+import json
+import math
+import random
+import unittest
+
+from trading_bots.core.storage import MemoryStore
+from trading_bots.indicators import ATR, BBANDS, EMA, RSI, CandleAggregator, CandleBuffer, batch
+
+
+def reference_smooth(values, periods, alpha):
+    out = [math.nan] * len(values)
+    if len(values) < periods:
+        return out
+    smoothed = sum(values[:periods]) / periods
+    out[periods - 1] = smoothed
+    for i in range(periods, len(values)):
+        smoothed = (1 - alpha) * smoothed + alpha * values[i]
+        out[i] = smoothed
+    return out
+
+
+class BatchIndicatorsTest(unittest.TestCase):
+
+    def setUp(self):
+        rnd = random.Random(7)
+        price = 1000.0
+        self.close = []
+        for _ in range(2000):
+            price *= 1 + rnd.gauss(0, 0.01)
+            self.close.append(price)
+        self.high = [c * (1 + rnd.random() * 0.01) for c in self.close]
+        self.low = [c * (1 - rnd.random() * 0.01) for c in self.close]
+
+    def assertSeriesAlmostEqual(self, first, second, places=7):
+        self.assertEqual(len(first), len(second))
+        for a, b in zip(first, second):
+            if math.isnan(b):
+                self.assertTrue(math.isnan(a))
+            else:
+                self.assertAlmostEqual(a, b, places=places)
+
+    def test_sma(self):
+        n = 20
+        expected = [math.nan] * (n - 1) + [sum(self.close[i - n + 1:i + 1]) / n for i in range(n - 1, len(self.close))]
+        self.assertSeriesAlmostEqual(batch.sma(self.close, n), expected)
+
+    def test_ema(self):
+        for n in (2, 14, 200):
+            self.assertSeriesAlmostEqual(batch.ema(self.close, n), reference_smooth(self.close, n, 2 / (n + 1)))
+
+    def test_bbands(self):
+        n = 20
+        upper, middle, lower = batch.bbands(self.close, n, 2, 2)
+        window = self.close[-n:]
+        mean = sum(window) / n
+        std = math.sqrt(sum((x - mean) ** 2 for x in window) / n)
+        self.assertAlmostEqual(middle[-1], mean)
+        self.assertAlmostEqual(upper[-1], mean + 2 * std)
+        self.assertAlmostEqual(lower[-1], mean - 2 * std)
+        self.assertTrue(math.isnan(middle[n - 2]))
+
+    def test_rsi(self):
+        n = 14
+        deltas = [b - a for a, b in zip(self.close, self.close[1:])]
+        gains = reference_smooth([max(d, 0) for d in deltas], n, 1 / n)
+        losses = reference_smooth([max(-d, 0) for d in deltas], n, 1 / n)
+        expected = [math.nan] + [100 * g / (g + l) for g, l in zip(gains, losses)]
+        self.assertSeriesAlmostEqual(batch.rsi(self.close, n), expected)
+
+    def test_atr(self):
+        n = 14
+        tr = [max(h, c) - min(l, c) for h, l, c in zip(self.high[1:], self.low[1:], self.close)]
+        expected = [math.nan] + reference_smooth(tr, n, 1 / n)
+        self.assertSeriesAlmostEqual(batch.atr(self.high, self.low, self.close, n), expected)
+
+    def test_short_series(self):
+        self.assertTrue(all(math.isnan(v) for v in batch.rsi(self.close[:5], 14)))
+
+
+class CandleBufferTest(unittest.TestCase):
+
+    def setUp(self):
+        rnd = random.Random(3)
+        self.timestamps = sorted(1500000000 + rnd.random() * 86400 for _ in range(3000))
+        self.rates = [1000 + rnd.random() * 10 for _ in self.timestamps]
+        self.amounts = [rnd.random() for _ in self.timestamps]
+
+    def test_matches_batch_resample(self):
+        from trading_bots.backtest import candles_from_trades
+        buffer = CandleBuffer('5min', size=1000)
+        buffer.update_many(self.timestamps, self.rates, self.amounts)
+        candles = buffer.candles()
+        expected = candles_from_trades(self.timestamps, self.rates, '5min')
+        for field in ('timestamp', 'open', 'high', 'low', 'close'):
+            self.assertEqual(list(candles[field]), list(getattr(expected, field)))
+        self.assertAlmostEqual(candles['volume'].sum(), sum(self.amounts))
+
+    def test_ring_buffer(self):
+        buffer = CandleBuffer(60, size=10)
+        for i in range(25):
+            buffer.update(i * 60, i)
+        self.assertEqual(len(buffer), 10)
+        self.assertEqual(list(buffer.closed()[:, 4]), list(range(14, 24)))
+        self.assertEqual(list(buffer.candles(n=3)['close']), [22, 23, 24])
+
+    def test_empty_intervals_and_advance(self):
+        buffer = CandleBuffer(60, size=5)
+        buffer.update(0, 10)
+        buffer.update(10 * 60 + 1, 12)
+        self.assertEqual(list(buffer.closed()[:, 0]), [300, 360, 420, 480, 540])
+        self.assertEqual(list(buffer.closed()[:, 4]), [10] * 5)
+        buffer.advance(11 * 60)
+        self.assertEqual(buffer.closed()[-1, 4], 12)
+        self.assertEqual(buffer.open, [660, 12, 12, 12, 12, 0.0])
+        buffer.update(11 * 60 + 5, 15)
+        self.assertEqual(buffer.open[1], 15)
+        self.assertFalse(buffer.update(0, 1))
+
+    def test_checkpoint(self):
+        aggregator = CandleAggregator(['1min', '5min'], size=50)
+        half = len(self.timestamps) // 2
+        aggregator.update_many(self.timestamps[:half], self.rates[:half])
+        restored = CandleAggregator.from_state(json.loads(json.dumps(aggregator.get_state())))
+        for candles in (aggregator, restored):
+            candles.update_many(self.timestamps[half:], self.rates[half:])
+        for interval in ('1min', '5min'):
+            self.assertEqual(restored[interval].closed().tolist(), aggregator[interval].closed().tolist())
+            self.assertEqual(restored[interval].open, aggregator[interval].open)
+
+
+class StreamingIndicatorsTest(unittest.TestCase):
+
+    def setUp(self):
+        rnd = random.Random(11)
+        price = 1000.0
+        self.close = []
+        for _ in range(1500):
+            price *= 1 + rnd.gauss(0, 0.01)
+            self.close.append(price)
+        self.high = [c * (1 + rnd.random() * 0.01) for c in self.close]
+        self.low = [c * (1 - rnd.random() * 0.01) for c in self.close]
+
+    def assertMatches(self, streamed, expected):
+        for a, b in zip(streamed, expected):
+            if math.isnan(b):
+                self.assertTrue(math.isnan(a))
+            else:
+                self.assertAlmostEqual(a, b, places=6)
+
+    def test_ema(self):
+        ema = EMA(20)
+        self.assertMatches([ema.update(x) for x in self.close], batch.ema(self.close, 20))
+
+    def test_bbands(self):
+        bands = BBANDS(20, 2, 1.5)
+        streamed = list(zip(*(bands.update(x) for x in self.close)))
+        for values, expected in zip(streamed, batch.bbands(self.close, 20, 2, 1.5)):
+            self.assertMatches(values, expected)
+
+    def test_rsi(self):
+        rsi = RSI(14)
+        self.assertMatches([rsi.update(x) for x in self.close], batch.rsi(self.close, 14))
+
+    def test_atr(self):
+        atr = ATR(14)
+        streamed = [atr.update(h, l, c) for h, l, c in zip(self.high, self.low, self.close)]
+        self.assertMatches(streamed, batch.atr(self.high, self.low, self.close, 14))
+
+    def test_peek(self):
+        rsi, bands = RSI(14), BBANDS(20)
+        for x in self.close[:-1]:
+            rsi.update(x)
+            bands.update(x)
+        self.assertAlmostEqual(rsi.peek(self.close[-1]), batch.rsi(self.close, 14)[-1])
+        self.assertAlmostEqual(bands.peek(self.close[-1])[2], batch.bbands(self.close, 20)[2][-1])
+        self.assertAlmostEqual(rsi.value, batch.rsi(self.close[:-1], 14)[-1])
+
+    def test_checkpoint(self):
+        store = MemoryStore()
+        indicators = {'rsi': RSI(14), 'bbands': BBANDS(20), 'atr': ATR(14), 'ema': EMA(10)}
+        half = len(self.close) // 2
+        for i in range(half):
+            self.update_all(indicators, i)
+        for name, indicator in indicators.items():
+            indicator.save(store, 'indicators', name)
+        restored = {name: type(indicator).load(store, 'indicators', name) for name, indicator in indicators.items()}
+        for i in range(half, len(self.close)):
+            self.update_all(indicators, i)
+            self.update_all(restored, i)
+        for name in indicators:
+            self.assertEqual(restored[name].get_state(), indicators[name].get_state())
+        self.assertIsNone(RSI.load(store, 'indicators', 'missing'))
+
+    def update_all(self, indicators, i):
+        for indicator in indicators.values():
+            if isinstance(indicator, ATR):
+                indicator.update(self.high[i], self.low[i], self.close[i])
+            else:
+                indicator.update(self.close[i])
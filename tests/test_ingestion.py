@@ -0,0 +1,114 @@
+import unittest
+
+from trading_bots.contrib.ingestion import TradeIngestion
+from trading_bots.indicators import CandleBuffer
+
+START = 1500076800  # 2017-07-15 00:00:00 UTC
+
+
+class FakeTape:
+    """Market client returning at most page_size trades since a timestamp, the oldest or the latest ones"""
+    name = 'Fake'
+    market = 'BTCUSD'
+
+    def __init__(self, page_size: int=None, latest: bool=False):
+        self.page_size = page_size
+        self.latest = latest
+        self.trades = []
+        self.calls = 0
+
+    def add(self, n: int, step: float=1.0):
+        last = self.trades[-1] if self.trades else dict(id=0, timestamp=START)
+        for i in range(1, n + 1):
+            self.trades.append(dict(id=last['id'] + i, timestamp=last['timestamp'] + i * step, rate=100.0 + i,
+                                    amount=1.0 if i % 2 else -1.0))
+
+    def get_trades(self, since: float=None):
+        self.calls += 1
+        trades = [t for t in self.trades if since is None or t['timestamp'] >= since]
+        if self.page_size:
+            trades = trades[-self.page_size:] if self.latest else trades[:self.page_size]
+        return [dict(t) for t in trades]
+
+
+class TradeIngestionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tape = FakeTape()
+        self.ingestion = TradeIngestion(self.tape, overlap=5)
+        self.published = []
+        self.ingestion.subscribe(self.published.extend)
+
+    def ids(self, trades=None):
+        return [t['id'] for t in (self.published if trades is None else trades)]
+
+    def test_overlapping_polls_dedup(self):
+        self.tape.add(10)
+        self.assertEqual(self.ids(self.ingestion.poll()), list(range(1, 11)))
+        self.assertEqual(self.ingestion.poll(), [])
+        self.tape.add(3)
+        self.assertEqual(self.ids(self.ingestion.poll()), [11, 12, 13])
+        self.assertEqual(self.ids(), list(range(1, 14)))
+
+    def test_same_timestamp_trades(self):
+        self.tape.add(2)
+        self.ingestion.poll()
+        self.tape.trades.append(dict(id=3, timestamp=self.tape.trades[-1]['timestamp'], rate=1.0, amount=1.0))
+        self.assertEqual(self.ids(self.ingestion.poll()), [3])
+
+    def test_bounded_window(self):
+        ingestion = TradeIngestion(self.tape, window=5)
+        self.tape.add(20)
+        ingestion.poll()
+        self.assertEqual(len(ingestion._seen), 5)
+        self.assertEqual(list(ingestion._ids), list(range(16, 21)))
+
+    def test_paging(self):
+        self.tape.page_size = self.ingestion.page_size = 4
+        self.tape.add(3)
+        self.ingestion.poll()
+        # More trades than a page since the last poll
+        self.tape.add(10)
+        self.assertEqual(self.ids(self.ingestion.poll()), list(range(4, 14)))
+        self.assertEqual(self.ids(), list(range(1, 14)))
+        self.assertEqual(self.ingestion.gaps, [])
+
+    def test_unfilled_gap(self):
+        self.tape.page_size = self.ingestion.page_size = 4
+        self.tape.latest = True
+        self.tape.add(3)
+        self.ingestion.poll()
+        # Only the latest page is available, it starts after the cursor
+        self.tape.add(20)
+        self.assertEqual(self.ids(self.ingestion.poll()), [20, 21, 22, 23])
+        self.assertEqual(self.ingestion.gaps, [(START + 3, START + 20)])
+
+    def test_sequential_id_gap(self):
+        ingestion = TradeIngestion(self.tape, sequential_ids=True)
+        self.tape.add(3)
+        ingestion.poll()
+        self.tape.add(3)
+        # The first response misses trade 4, it shows up when backfilling
+        get_trades = self.tape.get_trades
+        self.tape.get_trades = lambda since=None: [t for t in get_trades(since) if t['id'] != 4 or self.tape.calls > 2]
+        self.assertEqual(self.ids(ingestion.poll()), [4, 5, 6])
+        self.assertEqual(ingestion.last_id, 6)
+
+    def test_consumers_ordered(self):
+        candles = CandleBuffer(60, 10)
+        self.ingestion.subscribe(candles.add_trades)
+        self.tape.add(5, step=30)
+        self.tape.trades.reverse()
+        self.ingestion.poll()
+        self.assertEqual([t['timestamp'] for t in self.published], sorted(t['timestamp'] for t in self.published))
+        self.assertEqual(candles.count, 2)
+        self.assertEqual(candles.last_timestamp, START + 150)
+
+    def test_state(self):
+        self.tape.add(5)
+        self.ingestion.poll()
+        resumed = TradeIngestion(self.tape, overlap=5)
+        resumed.set_state(self.ingestion.get_state())
+        self.assertEqual(resumed.poll(), [])
+        self.tape.add(2)
+        self.assertEqual(self.ids(resumed.poll()), [6, 7])
@@ -0,0 +1,223 @@
+import time
+import unittest
+import unittest.mock
+from decimal import Decimal
+
+from trading_bots.contrib.converters import *
+from trading_bots.core.storage import MemoryStore
+
+
+class FakeConverter(Converter):
+    name = 'Fake'
+    slug = 'fake'
+
+    def __init__(self, rates: list, **kwargs):
+        super().__init__(**kwargs)
+        self.rates = rates
+        self.calls = 0
+
+    def _get_rate(self, currency: str, to: str):
+        self.calls += 1
+        rate = self.rates.pop(0)
+        if isinstance(rate, Exception):
+            raise rate
+        return rate
+
+
+class RateCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.store = MemoryStore()
+        self.now = time.time()
+
+    def at(self, seconds: float):
+        return unittest.mock.patch('time.time', return_value=self.now + seconds)
+
+    def test_ttl(self):
+        converter = FakeConverter(['600.5', '610.0'], rate_ttl=60, max_staleness=60, store=self.store)
+        self.assertEqual(converter.get_rate_for('USD', 'CLP'), 600.5)
+        self.assertEqual(converter.get_rate_for('usd', 'clp'), 600.5)
+        self.assertEqual(converter.convert(2, 'USD', 'CLP'), 1201.0)
+        with self.at(61):
+            self.assertEqual(converter.get_rate_for('USD', 'CLP'), 610.0)
+        self.assertEqual(converter.calls, 2)
+
+    def test_shared(self):
+        FakeConverter(['600.5'], store=self.store).get_rate_for('USD', 'CLP')
+        # Another process, or the next tick's converter, gets the stored rate
+        converter = FakeConverter([], store=self.store)
+        self.assertEqual(converter.get_rate_for('USD', 'CLP'), 600.5)
+        self.assertEqual(converter.calls, 0)
+        # Decimal converters don't share float rates
+        converter = FakeConverter(['600.5'], return_decimal=True, store=self.store)
+        self.assertEqual(converter.get_rate_for('USD', 'CLP'), Decimal('600.5'))
+
+    def test_stale_while_revalidate(self):
+        converter = FakeConverter(['600.5', ValueError('Down'), '610.0'], rate_ttl=60, max_staleness=300,
+                                  store=self.store)
+        converter.get_rate_for('USD', 'CLP')
+        with self.at(90):
+            # Stale rate served, the failed refresh keeps it
+            self.assertEqual(converter.get_rate_for('USD', 'CLP'), 600.5)
+            self.wait_for(lambda: converter.calls == 2)
+            self.assertEqual(converter.get_rate_for('USD', 'CLP'), 600.5)
+            self.wait_for(lambda: converter._rates.cache[converter._rates.key('USD', 'CLP')][0] == 610.0)
+            self.assertEqual(converter.get_rate_for('USD', 'CLP'), 610.0)
+
+    def test_invalid_rate_not_cached(self):
+        converter = FakeConverter(['-1', '600.5'], store=self.store)
+        with self.assertRaises(ConverterValidationError):
+            converter.get_rate_for('USD', 'CLP')
+        self.assertEqual(converter.get_rate_for('USD', 'CLP'), 600.5)
+
+    def test_disabled(self):
+        converter = FakeConverter(['600.5', '610.0'], rate_ttl=0)
+        converter.get_rate_for('USD', 'CLP')
+        self.assertEqual(converter.get_rate_for('USD', 'CLP'), 610.0)
+
+    def wait_for(self, condition):
+        for _ in range(200):
+            if condition():
+                return
+            time.sleep(0.005)
+        self.fail('Condition not met!')
+
+
+class FakeTableConverter(Converter):
+    """Source with USD rates only, many per request"""
+    name = 'Fake Table'
+    slug = 'fake-table'
+    pivot = 'USD'
+    usd_rates = {'CLP': 600.0, 'ARS': 30.0, 'EUR': 0.8}
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.requests = []
+
+    def _get_rates(self, currency: str, to: list):
+        assert currency.upper() == 'USD', 'Only USD rates!'
+        self.requests.append(to)
+        return {quote: str(rate) for quote, rate in self.usd_rates.items() if to is None or quote in to}
+
+
+class RateTableTest(unittest.TestCase):
+
+    def setUp(self):
+        self.converter = FakeTableConverter(store=MemoryStore())
+
+    def test_cross_rates(self):
+        table = RateTable('USD', {'CLP': 600.0, 'ARS': 30.0})
+        self.assertEqual(table.rate('USD', 'CLP'), 600.0)
+        self.assertEqual(table.rate('clp', 'ars'), 0.05)
+        self.assertEqual(table.rate('ARS', 'USD'), 1 / 30.0)
+        self.assertEqual(table.convert(2, 'ARS', 'ARS'), 2)
+        self.assertIn('usd', table)
+        with self.assertRaises(KeyError):
+            table.rate('USD', 'EUR')
+
+    def test_get_rates_for(self):
+        rates = self.converter.get_rates_for('USD', ['CLP', 'ars'])
+        self.assertEqual(rates, {'CLP': 600.0, 'ars': 30.0})
+        self.assertEqual(self.converter.get_rates_for('USD', ['CLP'], reverse=True), {'CLP': 1 / 600.0})
+        self.assertEqual(self.converter.get_rate_table('USD').currencies, ['ARS', 'CLP', 'EUR', 'USD'])
+        self.assertEqual(self.converter.requests, [['ARS', 'CLP'], ['CLP'], None])
+        # Cached
+        self.converter.get_rates_for('USD', ['ars', 'CLP'])
+        self.assertEqual(len(self.converter.requests), 3)
+
+    def test_convert_many(self):
+        converted = self.converter.convert_many([(1000, 'CLP', 'ARS'), (10, 'EUR', 'CLP'), (5, 'USD', 'USD')])
+        self.assertEqual([round(amount, 6) for amount in converted], [50.0, 7500.0, 5])
+        self.assertEqual(self.converter.requests, [['ARS', 'CLP', 'EUR']])
+
+    def test_missing_rate(self):
+        with self.assertRaises(ConverterRateError):
+            self.converter.convert_many([(1, 'CLP', 'JPY')])
+
+
+class FakeProvider(Converter):
+    """Source answering after delay, or failing with error"""
+    name = 'Fake Provider'
+
+    def __init__(self, slug: str, rate: str, delay: float=0, error: Exception=None):
+        super().__init__(rate_ttl=0)
+        self.slug = slug
+        self.rate = rate
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    def _get_rate(self, currency: str, to: str):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.rate
+
+    def _get_rates(self, currency: str, to: list):
+        return {quote: self._get_rate(currency, quote) for quote in to}
+
+
+class CompositeConverterTest(unittest.TestCase):
+
+    def composite(self, *providers, **options):
+        return CompositeConverter(providers, rate_ttl=0, **options)
+
+    def test_first(self):
+        slow, fast = FakeProvider('slow', '610.0', delay=0.2), FakeProvider('fast', '600.0', delay=0.01)
+        converter = self.composite(slow, fast)
+        started = time.time()
+        self.assertEqual(converter.get_rate_for('USD', 'CLP'), 600.0)
+        self.assertLess(time.time() - started, 0.15)
+
+    def test_failover(self):
+        down = FakeProvider('down', '610.0', error=ValueError('Down'))
+        invalid = FakeProvider('invalid', '-1')
+        backup = FakeProvider('backup', '600.0')
+        converter = self.composite(down, invalid, backup, fanout=2)
+        self.assertEqual(converter.get_rate_for('USD', 'CLP'), 600.0)
+        self.assertEqual((down.calls, invalid.calls, backup.calls), (1, 1, 1))
+        self.assertEqual(converter.stats['down'].errors, 1)
+
+    def test_all_failing(self):
+        converter = self.composite(FakeProvider('down', '600.0', error=ValueError('Down')),
+                                   FakeProvider('invalid', '0'))
+        with self.assertRaises(ConverterRateError):
+            converter.get_rate_for('USD', 'CLP')
+
+    def test_timeout(self):
+        converter = self.composite(FakeProvider('slow', '600.0', delay=0.2), strategy='median', timeout=0.05)
+        with self.assertRaises(ConverterRateError):
+            converter.get_rate_for('USD', 'CLP')
+
+    def test_timeout_failover(self):
+        slow, backup = FakeProvider('slow', '610.0', delay=0.3), FakeProvider('backup', '600.0')
+        converter = self.composite(slow, backup, fanout=1, timeout=0.05)
+        self.assertEqual(converter.get_rate_for('USD', 'CLP'), 600.0)
+        self.assertEqual(backup.calls, 1)
+
+    def test_median(self):
+        converter = self.composite(FakeProvider('a', '600.0'), FakeProvider('b', '601.0'), FakeProvider('c', '900.0'),
+                                   strategy='median', return_decimal=True)
+        self.assertEqual(converter.get_rate_for('USD', 'CLP'), Decimal('601.0'))
+        self.assertEqual(converter.get_rates_for('USD', ['CLP', 'ARS']), {'CLP': Decimal('601.0'),
+                                                                          'ARS': Decimal('601.0')})
+
+    def test_consensus(self):
+        converter = self.composite(FakeProvider('a', '600.0'), FakeProvider('b', '606.0'), FakeProvider('c', '900.0'),
+                                   strategy='consensus', max_deviation=0.02)
+        # The outlier is dropped
+        self.assertEqual(converter.get_rate_for('USD', 'CLP'), 603.0)
+        converter = self.composite(FakeProvider('a', '600.0'), FakeProvider('c', '900.0'), strategy='consensus')
+        with self.assertRaises(ConverterValidationError):
+            converter.get_rate_for('USD', 'CLP')
+
+    def test_slow_provider_skipped(self):
+        slow, fast = FakeProvider('slow', '610.0', delay=0.05), FakeProvider('fast', '600.0')
+        converter = self.composite(slow, fast, strategy='median', probe_interval=5)
+        for _ in range(10):
+            self.assertIn(converter.get_rate_for('USD', 'CLP'), (600.0, 605.0))
+        # Queried on the first call and the probes only
+        self.assertEqual(slow.calls, 3)
+        self.assertEqual(converter.stats['slow'].skipped, 7)
+        self.assertEqual(converter.stats['fast'].calls, 10)
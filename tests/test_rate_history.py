@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+from decimal import Decimal
+
+import numpy as np
+
+from trading_bots.backtest import VirtualClock
+from trading_bots.contrib.converters import *
+
+START = 1500076800  # 2017-07-15 00:00:00 UTC
+
+
+class RateHistoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.history = RateHistory(os.path.join(self.tmp.name, 'rates'))
+        self.history.append('USD', 'CLP', [START + 120, START, START + 60], [602.0, 600.0, 601.0])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_rate_at(self):
+        self.assertEqual(self.history.rate_at('USD', 'CLP', START), 600.0)
+        self.assertEqual(self.history.rate_at('usd', 'clp', START + 59.9), 600.0)
+        self.assertEqual(self.history.rate_at('USD', 'CLP', START + 1e6), 602.0)
+        self.assertEqual(self.history.rate_at('CLP', 'USD', START + 60), 1 / 601.0)
+        with self.assertRaises(KeyError):
+            self.history.rate_at('USD', 'CLP', START - 1)
+        with self.assertRaises(KeyError):
+            self.history.rate_at('USD', 'CLP', START + 200, max_age=60)
+        with self.assertRaises(KeyError):
+            self.history.rate_at('USD', 'ARS', START)
+
+    def test_rates_at(self):
+        rates = self.history.rates_at('USD', 'CLP', [START - 1, START + 30, START + 130, START + 500], max_age=300)
+        np.testing.assert_array_equal(rates, [np.nan, 600.0, 602.0, np.nan])
+
+    def test_append(self):
+        self.history.rate_at('CLP', 'USD', START)
+        # Older rates are dropped, lookups see the new ones
+        self.assertEqual(self.history.append('USD', 'CLP', [START + 90, START + 180], [1.0, 603.0]), 1)
+        self.assertEqual(self.history.rate_at('USD', 'CLP', START + 200), 603.0)
+        self.assertEqual(self.history.rate_at('CLP', 'USD', START + 200), 1 / 603.0)
+        self.assertEqual(self.history.pairs(), [('USD', 'CLP')])
+
+    def test_partial_record_ignored(self):
+        with open(os.path.join(self.history.directory, 'USD-CLP.rates'), 'ab') as f:
+            f.write(b'\0' * 11)
+        reopened = RateHistory(self.history.directory)
+        self.assertEqual(reopened.rate_at('USD', 'CLP', START + 500), 602.0)
+        reopened.append('USD', 'CLP', [START + 600], [604.0])
+        self.assertEqual(list(reopened.pair('USD', 'CLP')[1]), [600.0, 601.0, 602.0, 604.0])
+
+    def test_converter(self):
+        converter = HistoricalConverter(self.history, max_age=3600, rate_ttl=0)
+        self.assertEqual(converter.get_rate_for('USD', 'CLP', at=START + 60), 601.0)
+        self.assertEqual(converter.get_rate_for('CLP', 'USD', reverse=True, at=START), 1 / 600.0)
+        self.assertEqual(converter.convert(2, 'USD', 'CLP', at=START), 1200.0)
+        self.assertEqual(converter.get_rate_for('CLP', 'clp'), 1.0)
+        np.testing.assert_array_equal(converter.convert_at([1, 2], 'USD', 'CLP', [START, START + 60]), [600.0, 1202.0])
+        # Now is the simulated time in backtests
+        with VirtualClock(START + 61).patch():
+            self.assertEqual(converter.get_rate_for('USD', 'CLP'), 601.0)
+            self.assertEqual(converter.convert_many([(1, 'CLP', 'USD')]), [1 / 601.0])
+        with self.assertRaises(ConverterRateError):
+            converter.get_rate_for('USD', 'CLP')
+        converter = HistoricalConverter(self.history, return_decimal=True)
+        self.assertEqual(converter.convert(2, 'USD', 'CLP', at=START), Decimal('1200'))
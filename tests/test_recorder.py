@@ -0,0 +1,134 @@
+import logging
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from trading_bots.backtest import MarketData
+from trading_bots.contrib.clients import MarketClient, Side
+from trading_bots.contrib.simulator import SimulatedExchange, SimulatedMarket, synthetic_order_book
+from trading_bots.recorder import *
+
+DAY = 86400
+START = 1500076800  # 2017-07-15 00:00:00 UTC
+
+
+class ColumnarLogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'trades')
+        self.log = ColumnarLog(self.path, trade_schema)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def append(self, timestamps):
+        self.log.append(timestamp=timestamps, rate=[t / 1e6 for t in timestamps], amount=[1] * len(timestamps))
+
+    def test_day_partitions(self):
+        self.append([START + 10, START + DAY - 1, START + DAY, START + DAY + 5])
+        self.append([START + 2 * DAY + 1])
+        self.assertEqual(self.log.days(), ['2017-07-15', '2017-07-16', '2017-07-17'])
+        self.assertEqual(len(self.log), 5)
+        columns = self.log.read(START + DAY - 1, START + DAY + 5)
+        self.assertEqual(list(columns['timestamp']), [START + DAY - 1, START + DAY, START + DAY + 5])
+
+    def test_zero_copy_reads(self):
+        self.append([START + 1, START + 2, START + 3])
+        columns = self.log.read(START + 2)
+        self.assertIsInstance(columns['rate'].base, np.memmap)
+        self.assertEqual(list(columns['timestamp']), [START + 2, START + 3])
+
+    def test_seal(self):
+        self.append([START + 1, START + DAY + 1])
+        self.log.seal_before(START + DAY)
+        self.assertTrue(self.log.is_sealed('2017-07-15'))
+        self.assertFalse(self.log.is_sealed('2017-07-16'))
+        self.assertEqual(list(self.log.read()['timestamp']), [START + 1, START + DAY + 1])
+        with self.assertRaises(AssertionError):
+            self.append([START + 2])
+
+    def test_partial_rows_ignored(self):
+        self.append([START + 1])
+        with open(os.path.join(self.path, '2017-07-15', 'rate.bin'), 'ab') as f:
+            f.write(b'\0' * 12)
+        self.assertEqual(len(self.log), 1)
+        self.append([START + 2])
+        self.assertEqual(list(self.log.read()['rate']), [(START + 1) / 1e6, (START + 2) / 1e6])
+
+    def test_schema_persisted(self):
+        self.append([START + 1])
+        reopened = ColumnarLog(self.path)
+        self.assertEqual(reopened.schema, self.log.schema)
+        with self.assertRaises(AssertionError):
+            ColumnarLog(self.path, {'timestamp': 'f8'})
+
+
+class MarketRecorderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.exchange = SimulatedExchange()
+        self.exchange.load_order_book('BTCUSD', synthetic_order_book(5000, depth=3))
+        self.client = SimulatedMarket('BTCUSD', client=self.exchange, store=object())
+        self.recorder = MarketRecorder([self.client], self.tmp.name, depth=5)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_record(self):
+        self.exchange.process_trade('BTCUSD', 5001, 0.1, Side.BUY)
+        self.recorder.record(START + 10)
+        self.exchange.process_trade('BTCUSD', 4999, 0.2, Side.SELL)
+        self.recorder.record(START + 20)
+        ticker = self.recorder.log_for('Simulated', 'BTCUSD', 'ticker').read()
+        self.assertEqual(len(ticker['timestamp']), 2)
+        self.assertLess(ticker['bid'][0], ticker['ask'][0])
+        trades = self.recorder.log_for('Simulated', 'BTCUSD', 'trades').read()
+        self.assertEqual(list(trades['rate']), [5001, 4999])
+        self.assertEqual(list(trades['amount']), [0.1, -0.2])
+        book_log = self.recorder.log_for('Simulated', 'BTCUSD', 'book')
+        data = MarketData.from_log('BTCUSD', book_log)
+        self.assertEqual(len(data.order_book(0).bids), 3)
+
+    def test_same_timestamp_trades(self):
+        self.exchange.clock = lambda: START
+        self.exchange.process_trade('BTCUSD', 5001, 0.1, Side.BUY)
+        self.recorder.record(START)
+        # Arrives after the poll, at the same timestamp
+        self.exchange.process_trade('BTCUSD', 4999, 0.2, Side.SELL)
+        self.recorder.record(START + 10)
+        self.recorder.record(START + 20)
+        trades = self.recorder.log_for('Simulated', 'BTCUSD', 'trades').read()
+        self.assertEqual(list(trades['rate']), [5001, 4999])
+
+    def test_resume_same_timestamp_trades(self):
+        self.exchange.clock = lambda: START
+        self.exchange.process_trade('BTCUSD', 5001, 0.1, Side.BUY)
+        self.recorder.record(START)
+        # Restarted, then a trade arrives at the last recorded timestamp
+        recorder = MarketRecorder([self.client], self.tmp.name, depth=5)
+        self.exchange.process_trade('BTCUSD', 4999, 0.2, Side.SELL)
+        recorder.record(START + 10)
+        trades = recorder.log_for('Simulated', 'BTCUSD', 'trades').read()
+        self.assertEqual(list(trades['rate']), [5001, 4999])
+
+    def test_books_only_without_trades(self):
+        class BooksOnlyMarket(SimulatedMarket):
+            _trades = MarketClient._trades
+
+        client = BooksOnlyMarket('BTCUSD', client=self.exchange, store=object())
+        logger = logging.getLogger('test_recorder')
+        with self.assertLogs(logger, logging.WARNING) as logs:
+            recorder = MarketRecorder([client], self.tmp.name, depth=5, logger=logger)
+            recorder.record(START + 10)
+            recorder.record(START + 20)
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(len(recorder.log_for('Simulated', 'BTCUSD', 'book')), 2)
+
+    def test_seal_on_new_day(self):
+        self.recorder.record(START + 10)
+        self.recorder.record(START + DAY + 10)
+        self.assertTrue(self.recorder.log_for('Simulated', 'BTCUSD', 'book').is_sealed('2017-07-15'))
@@ -0,0 +1,123 @@
+import types
+import unittest
+
+from trading_bots.contrib.clients import OrderBook, OrderType, Side
+from trading_bots.contrib.clients.buda import BudaTrading
+from trading_bots.contrib.simulator import *
+
+
+class SimulatedExchangeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.market = 'BTCUSD'
+        self.exchange = SimulatedExchange(
+            balances={'BTC': 10, 'USD': 100000}, fee_model=MakerTakerFee(maker=0.001, taker=0.002))
+
+    def place(self, side, amount, price=None):
+        o_type = OrderType.LIMIT if price else OrderType.MARKET
+        return self.exchange.place_order(self.market, side, o_type, amount, price)
+
+    def test_price_time_priority(self):
+        first = self.place(Side.SELL, 1, 100)
+        second = self.place(Side.SELL, 1, 100)
+        better = self.place(Side.SELL, 1, 99)
+        taker = self.place(Side.BUY, 1.5, 100)
+        self.assertEqual(better.state, OrderState.TRADED)
+        self.assertAlmostEqual(first.traded_amount, 0.5)
+        self.assertEqual(second.traded_amount, 0)
+        self.assertEqual(taker.state, OrderState.TRADED)
+        self.assertAlmostEqual(taker.average_price, (99 + 0.5 * 100) / 1.5)
+
+    def test_limit_order_rests(self):
+        order = self.place(Side.BUY, 1, 90)
+        self.assertTrue(order.is_open)
+        self.assertEqual(self.exchange.order_book(self.market).bids, [[90, 1]])
+        self.assertAlmostEqual(self.exchange.available('USD'), 100000 - 90)
+        self.assertEqual(self.exchange.balance('USD'), 100000)
+
+    def test_cancel_releases_funds(self):
+        order = self.place(Side.SELL, 2, 110)
+        self.assertAlmostEqual(self.exchange.available('BTC'), 8)
+        self.exchange.cancel_order(order.id)
+        self.assertEqual(order.state, OrderState.CANCELED)
+        self.assertAlmostEqual(self.exchange.available('BTC'), 10)
+        self.assertEqual(self.exchange.open_orders(self.market), [])
+        self.assertIsNone(self.exchange.engine(self.market).best_ask())
+
+    def test_fees_and_balances(self):
+        self.exchange.load_order_book(self.market, OrderBook(bids=[[99, 5]], asks=[[101, 5]]))
+        order = self.place(Side.BUY, 1)
+        self.assertAlmostEqual(order.paid_fee, 0.002)
+        self.assertAlmostEqual(self.exchange.balance('BTC'), 10 + 1 - 0.002)
+        self.assertAlmostEqual(self.exchange.balance('USD'), 100000 - 101)
+
+    def test_market_buy_bounded_by_balance(self):
+        self.exchange.load_order_book(self.market, OrderBook(bids=[], asks=[[100000, 5]]))
+        order = self.place(Side.BUY, 5)
+        self.assertAlmostEqual(order.traded_amount, 1)
+        self.assertAlmostEqual(self.exchange.available('USD'), 0)
+
+    def test_insufficient_funds(self):
+        with self.assertRaises(InsufficientFundsError):
+            self.place(Side.SELL, 11, 100)
+
+    def test_book_update_fills_resting_orders(self):
+        order = self.place(Side.BUY, 1, 100)
+        self.exchange.load_order_book(self.market, OrderBook(bids=[[95, 1]], asks=[[99, 0.4], [100, 1]]))
+        self.assertEqual(order.state, OrderState.TRADED)
+        self.assertEqual(self.exchange.order_book(self.market).asks, [[100, 0.4]])
+
+    def test_trade_replay_fills_resting_orders(self):
+        order = self.place(Side.SELL, 1, 105)
+        self.exchange.process_trade(self.market, 106, 0.25, Side.BUY)
+        self.assertAlmostEqual(order.traded_amount, 0.25)
+        self.assertEqual(self.exchange.ticker(self.market)['last'], 106)
+
+
+class SimulatedClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.exchange = SimulatedExchange(balances={'BTC': 1, 'USD': 10000})
+        self.exchange.load_order_book('BTCUSD', synthetic_order_book(5000, spread=0.01, depth=5))
+        self.client = SimulatedTrading('BTCUSD', client=self.exchange, store=object())
+
+    def test_market_data(self):
+        max_bid, min_ask = self.client.get_spread_details()
+        self.assertLess(max_bid, 5000)
+        self.assertGreater(min_ask, 5000)
+
+    def test_wallets(self):
+        self.assertEqual(self.client.wallets.base.get_available(), 1)
+        self.assertEqual(self.client.wallets.quote.get_balance(), 10000)
+
+    def test_orders(self):
+        order = self.client.place_limit_order(Side.BUY, 1, 4000)
+        self.assertEqual(self.client.get_open_orders(), [order])
+        self.client.cancel_orders()
+        self.assertEqual(self.client.get_open_orders(), [])
+
+    def test_dry_run_simulator(self):
+        client = SimulatedTrading('BTCUSD', client=self.exchange, store=object(), dry_run=True)
+        order = client.place_market_order(Side.SELL, 0.5)
+        self.assertEqual(order.state, OrderState.TRADED)
+        self.assertAlmostEqual(client.wallets.base.get_balance(), 0.5)
+        limit_order = client.place_limit_order(Side.BUY, 0.1, 4000)
+        self.assertEqual(client.cancel_order(limit_order).state, OrderState.CANCELED)
+        with self.assertRaises(OrderNotFoundError):
+            client.cancel_order(types.SimpleNamespace(id=-1))
+        with self.assertRaisesRegex(NotImplementedError, 'not simulated'):
+            self.client.open_position(Side.BUY, OrderType.MARKET, 1)
+
+    def test_placed_amount(self):
+        self.exchange.load_order_book('BTCUSD', OrderBook(bids=[], asks=[[5000, 5]]))
+        for client in (self.client, SimulatedTrading('BTCUSD', client=self.exchange, store=object(), dry_run=True)):
+            order = client.place_market_order(Side.BUY, 5)
+            # Bounded by the USD balance, not the requested amount
+            self.assertAlmostEqual(client.placed_amount(order), 2)
+            self.exchange.deposit('USD', 10000)
+        self.assertEqual(self.client.placed_amount(None), 0)
+        # Live market orders report their fills later, the amount ordered is placed
+        live = BudaTrading('BTCCLP', client=object(), store=object())
+        order = types.SimpleNamespace(amount=types.SimpleNamespace(amount=0.5),
+                                      traded_amount=types.SimpleNamespace(amount=0.0))
+        self.assertEqual(live.placed_amount(order), 0.5)
@@ -1,6 +1,20 @@
+import asyncio
+import math
+import multiprocessing
 import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
 import unittest
+import unittest.mock
 
+from trading_bots.bots import Bot
+from trading_bots.contrib.clients import BitfinexTrading
+from trading_bots.core.exceptions import ConflictError, LockError
+from trading_bots.core.async_storage import *
+from trading_bots.core.serializers import *
 from trading_bots.core.storage import *
 
 
@@ -28,10 +42,12 @@ class JSONStorageTest(unittest.TestCase):
         self.store = JSONStore(self.filename)
 
     def tearDown(self):
-        try:
-            os.remove(self.filename)
-        except OSError:
-            pass
+        for filename in (self.filename, self.filename + '.lock'):
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+        shutil.rmtree(self.filename + '.locks', ignore_errors=True)
 
     def test_instantiate_bot(self):
         self.assertIsInstance(self.store, Store)
@@ -106,3 +122,631 @@ class JSONStorageTest(unittest.TestCase):
         self.store.hdel('foo', 'bar')
         value = self.store.hget('foo', 'bar')
         self.assertIsNone(value)
+
+    # EXPIRY -----------------------------------------------------------------
+    def test_ttl(self):
+        now = time.time()
+        self.store.set('foo', 'bar', ttl=10)
+        self.store.hset('hash', 'key', 1, ttl=20)
+        self.assertAlmostEqual(self.store.ttl('foo'), 10, delta=1)
+        self.assertIsNone(self.store.ttl('str'))
+        with unittest.mock.patch('time.time', return_value=now + 15):
+            self.assertIsNone(self.store.get('foo'))
+            self.assertEqual(self.store.hget('hash', 'key'), 1)
+            self.assertNotIn('foo', self.store.scan())
+        # Expired names stay deleted
+        self.assertIsNone(self.store.get('foo'))
+        self.assertIsNone(self.store.ttl('foo'))
+
+    def test_set_drops_ttl(self):
+        self.store.set('foo', 'bar', ttl=10)
+        self.store.set('foo', 'baz')
+        self.assertIsNone(self.store.ttl('foo'))
+        with self.store.pipeline() as pipe:
+            pipe.set('foo', 'bar', ttl=10)
+        self.assertIsNotNone(self.store.ttl('foo'))
+
+    def test_sweep(self):
+        now = time.time()
+        self.store.mset({'a': 1, 'b': 2}, ttl=10)
+        with unittest.mock.patch('time.time', return_value=now + 15):
+            self.assertEqual(self.store.sweep(), 2)
+        self.assertEqual(self.store.mget(['a', 'b']), [None, None])
+        self.assertNotIn(self.store.EXPIRES, self.store.scan())
+
+    def test_namespace(self):
+        bot_store = self.store.namespace('Bot:default:')
+        bot_store.set('position', 'open')
+        bot_store.hset('deposits', '1', 1, ttl=10)
+        self.assertEqual(self.store.get('Bot:default:position'), 'open')
+        self.assertEqual(bot_store.get('position'), 'open')
+        self.assertEqual(bot_store.scan(), ['deposits', 'position'])
+        self.assertIsNotNone(self.store.ttl('Bot:default:deposits'))
+        with bot_store.pipeline() as pipe:
+            pipe.delete('position')
+        self.assertIsNone(self.store.get('Bot:default:position'))
+
+    def test_metrics(self):
+        snapshot = self.store.metrics.snapshot()
+        bot_store = self.store.namespace('Bot:default:')
+        bot_store.set('position', 'open')
+        bot_store.get('position')
+        bot_store.get('missing')
+        self.store.mget(['str', 'foo'])
+        stats = self.store.metrics.since(snapshot)
+        self.assertEqual(stats[('set', 'Bot')].bytes, 4)
+        self.assertEqual((stats[('get', 'Bot')].hits, stats[('get', 'Bot')].misses), (1, 1))
+        self.assertEqual((stats[('mget', 'str')].hits, stats[('mget', 'str')].misses), (1, 1))
+        self.assertIs(bot_store.metrics, self.store.metrics)
+        self.assertIn('get Bot: 2 calls', self.store.metrics.format(snapshot))
+
+    def test_slow_operation(self):
+        self.store.slow_threshold = 0
+        with self.assertLogs(self.store.log, 'WARNING') as logs:
+            self.store.hget('dict', 'int')
+        self.assertIn('Slow hget dict int', logs.output[0])
+        self.assertEqual(self.store.metrics.stats[('hget', 'dict')].slow, 1)
+
+    # CONCURRENCY ------------------------------------------------------------
+    def test_cas(self):
+        self.assertEqual(self.store.get_versioned('counter'), (None, 0))
+        self.assertTrue(self.store.cas('counter', {'n': 1}, 0, serializer='json'))
+        self.assertFalse(self.store.cas('counter', {'n': 2}, 0, serializer='json'))
+        self.assertEqual(self.store.get_versioned('counter', serializer='json'), ({'n': 1}, 1))
+        self.assertNotIn(self.store.VERSIONS, self.store.scan())
+
+    def test_update(self):
+        self.store.update('counter', lambda n: (n or 0) + 1)
+        self.assertEqual(self.store.update('counter', lambda n: n + 1), 2)
+        bot_store = self.store.namespace('Bot:')
+        bot_store.update('counter', lambda n: (n or 0) + 10)
+        self.assertEqual(self.store.get_versioned('Bot:counter'), (10, 1))
+
+    def test_update_conflict(self):
+        def change(n):
+            # Another writer gets in between every read and write
+            self.store.cas('counter', 0, self.store.get_versioned('counter')[1])
+            return n
+        with self.assertRaises(ConflictError):
+            self.store.update('counter', change, retries=2)
+
+    def test_lock(self):
+        with self.store.lock('position'):
+            self.assertFalse(self.store.lock('position').acquire(blocking=False))
+            with self.assertRaises(LockError):
+                with self.store.lock('position', blocking_timeout=0.01):
+                    pass
+            self.assertTrue(self.store.lock('deposits').acquire(blocking=False))
+        self.assertTrue(self.store.lock('position').acquire(blocking=False))
+
+    # BATCH ------------------------------------------------------------------
+    def test_mget(self):
+        values = self.store.mget(['str', 'foo', 'list'])
+        self.assertEqual(values, ['a', None, ['a', 1, 1.0, True]])
+
+    def test_mset(self):
+        self.store.mset({'foo': 1, 'str': 'b'})
+        self.assertEqual(self.store.mget(['foo', 'str']), [1, 'b'])
+
+    def test_hmget(self):
+        values = self.store.hmget('dict', ['int', 'foo', 'bool'])
+        self.assertEqual(values, [1, None, True])
+
+    def test_hmset(self):
+        self.store.hmset('dict', {'int': 2, 'foo': {'bar': 1}}, serializer='json')
+        self.assertEqual(self.store.hget('dict', 'foo', serializer='json'), {'bar': 1})
+        self.assertEqual(self.store.hget('dict', 'str'), 'a')
+
+    def test_hgetall(self):
+        self.assertDictEqual(self.store.hgetall('dict'), self.types_dict)
+        self.assertDictEqual(self.store.hgetall('foo'), {})
+
+    def test_scan(self):
+        self.store.mset({'deposits_1': 1, 'deposits_2': 2})
+        self.assertEqual(self.store.scan('deposits_'), ['deposits_1', 'deposits_2'])
+        self.assertIn('dict', self.store.scan())
+
+    def test_pipeline(self):
+        with self.store.pipeline() as pipe:
+            pipe.set('foo', 'bar').hset('dict', 'int', 2).hdel('dict', 'str').delete('test')
+            pipe.delete('missing')
+            self.assertIsNone(self.store.get('foo'))
+        self.assertEqual(self.store.get('foo'), 'bar')
+        self.assertEqual(self.store.hmget('dict', ['int', 'str']), [2, None])
+        self.assertIsNone(self.store.get('test'))
+
+    def test_pipeline_discarded(self):
+        with self.assertRaises(ValueError):
+            with self.store.pipeline() as pipe:
+                pipe.set('foo', 'bar')
+                raise ValueError
+        self.assertIsNone(self.store.get('foo'))
+
+
+def _update_many(filename, n):
+    store = JSONStore(filename)
+    for _ in range(n):
+        store.update('counter', lambda counter: counter + 1)
+        with store.lock('deposits'):
+            deposits = store.get('deposits')
+            store.set('deposits', deposits + 1)
+
+
+class JSONProcessesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'store.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_processes(self):
+        store = JSONStore(self.filename)
+        store.mset({'counter': 0, 'deposits': 0, 'other': 0})
+        context = multiprocessing.get_context('spawn')
+        processes = [context.Process(target=_update_many, args=(self.filename, 25)) for _ in range(4)]
+        for process in processes:
+            process.start()
+        # Plain writes of other names aren't lost either
+        for _ in range(25):
+            store.hset('hash', 'key', 1)
+        for process in processes:
+            process.join()
+        self.assertEqual(store.mget(['counter', 'deposits']), [100, 100])
+        self.assertEqual(store.hget('hash', 'key'), 1)
+
+
+class JSONWriteBackStorageTest(JSONStorageTest):
+
+    def setUp(self):
+        super().setUp()
+        self.store = JSONStore(self.filename, write_back=True)
+
+    def read_file(self):
+        with open(self.filename) as f:
+            return j.load(f)
+
+    def test_flush(self):
+        self.store.set('foo', 'bar')
+        self.store.hdel('dict', 'test')
+        self.assertDictEqual(self.read_file(), self.sample_json)
+        self.store.flush()
+        data = self.read_file()
+        self.assertEqual(data['foo'], 'bar')
+        self.assertNotIn('test', data['dict'])
+
+    def test_flush_keeps_other_writes(self):
+        self.store.set('foo', 'bar')
+        JSONStore(self.filename).set('other', 'value')
+        self.store.flush()
+        data = self.read_file()
+        self.assertEqual(data['foo'], 'bar')
+        self.assertEqual(data['other'], 'value')
+
+    def test_flush_reloads(self):
+        self.store.get('foo')
+        JSONStore(self.filename).set('other', 'value')
+        self.assertIsNone(self.store.get('other'))
+        self.store.flush()
+        self.assertEqual(self.store.get('other'), 'value')
+        self.store.set('foo', 'bar')
+        JSONStore(self.filename).set('other', 'changed')
+        self.store.flush()
+        self.assertEqual(self.store.get('other'), 'changed')
+
+    def test_values_copied(self):
+        value = self.store.get('list')
+        value.append('changed')
+        self.assertEqual(self.store.get('list'), self.sample_json['list'])
+
+    def test_flush_interval(self):
+        self.store.flush_interval = 0
+        self.store.set('foo', 'bar')
+        self.assertEqual(self.read_file()['foo'], 'bar')
+        self.assertFalse(os.path.exists(self.filename + '.tmp'))
+
+    def test_bot_execute_flushes(self):
+        class StoreBot(Bot):
+            label = 'StoreBot'
+
+            def _algorithm(self):
+                self.store.set('foo', 'bar')
+
+        StoreBot(store=self.store).execute()
+        self.assertEqual(self.read_file()['foo'], 'bar')
+
+
+class LogStorageTest(JSONStorageTest):
+
+    def setUp(self):
+        super().setUp()
+        os.remove(self.filename)
+        self.filename = 'test.log'
+        self.store = LogStore(self.filename)
+        for name, value in self.sample_json.items():
+            self.store.set(name, value)
+
+    def tearDown(self):
+        self.store.close()
+        super().tearDown()
+
+    def test_replay(self):
+        self.store.hset('dict', 'test', 'foo')
+        self.store.hdel('dict', 'str')
+        self.store.delete('int')
+        store = LogStore(self.filename)
+        self.assertEqual(store.index.keys(), self.store.index.keys())
+        expected = {**self.types_dict, 'test': 'foo'}
+        del expected['str']
+        self.assertDictEqual(store.get('dict'), expected)
+        self.assertIsNone(store.get('int'))
+        store.close()
+
+    def test_partial_record_ignored(self):
+        self.store.close()
+        with open(self.filename, 'ab') as f:
+            f.write(b'["s", "foo", null]\t"ba')
+        self.store = LogStore(self.filename)
+        self.assertIsNone(self.store.get('foo'))
+        self.store.set('foo', 'bar')
+        self.assertEqual(LogStore(self.filename).get('foo'), 'bar')
+
+    def test_compact(self):
+        for i in range(10):
+            self.store.hset('counter', 'value', i)
+        size = os.path.getsize(self.filename)
+        self.store.compact()
+        self.assertLess(os.path.getsize(self.filename), size)
+        self.assertEqual(self.store.records, self.store.live)
+        self.assertEqual(self.store.hget('counter', 'value'), 9)
+        self.assertDictEqual(LogStore(self.filename).get('dict'), self.types_dict)
+
+    def test_compact_emptied_hash(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        json_store = JSONStore(os.path.join(tmp.name, 'store.json'))
+        for store in (self.store, json_store):
+            store.hset('hash', 'key', 1)
+            store.hdel('hash', 'key')
+        self.store.compact()
+        store = LogStore(self.filename)
+        # Swappable with JSONStore
+        self.assertEqual(store.get('hash'), json_store.get('hash'))
+        self.assertEqual(store.hgetall('hash'), json_store.hgetall('hash'))
+        self.assertEqual('hash' in store.scan(), 'hash' in json_store.scan())
+        store.close()
+
+    def test_auto_compact(self):
+        store = LogStore(self.filename, compact_min=10)
+        for i in range(20):
+            store.set('counter', i)
+        self.assertLess(store.records, 20)
+        self.assertEqual(store.get('counter'), 19)
+        store.close()
+
+
+def _hset_many(filename, name, n):
+    store = SQLiteStore(filename)
+    for i in range(n):
+        store.hset(name, str(i), i)
+        store.hset('shared', f'{name}-{i}', i)
+
+
+class SQLiteStorageTest(JSONStorageTest):
+
+    def setUp(self):
+        super().setUp()
+        os.remove(self.filename)
+        self.filename = 'test.db'
+        self.store = SQLiteStore(self.filename)
+        for name, value in self.sample_json.items():
+            self.store.set(name, value)
+
+    def tearDown(self):
+        self.store.close()
+        super().tearDown()
+        for suffix in ('-wal', '-shm'):
+            try:
+                os.remove(self.filename + suffix)
+            except OSError:
+                pass
+
+    def test_hash_rows(self):
+        self.store.hset('hash', 'a', 1)
+        self.store.hset('hash', 'b', {'c': [1, 2]})
+        self.store.hset('hash', 'p', b'\x80pickled')
+        self.assertEqual(self.store.hget('hash', 'b'), {'c': [1, 2]})
+        self.assertEqual(self.store.hget('hash', 'p'), b'\x80pickled')
+        rows = self.store.connection.execute('SELECT COUNT(*) FROM store_hashes WHERE name = ?', ('hash',))
+        self.assertEqual(rows.fetchone()[0], 3)
+
+    def test_pipeline_transaction(self):
+        pipe = self.store.pipeline().hset('str', 'key', 1).set('foo', 'bar')
+        with unittest.mock.patch.object(self.store, 'SET', 'INVALID'):
+            with self.assertRaises(Exception):
+                pipe.execute()
+        self.assertIsNone(self.store.get('foo'))
+        self.assertEqual(self.store.get('str'), 'a')
+
+    def test_wal_mode(self):
+        mode = self.store.connection.execute('PRAGMA journal_mode').fetchone()[0]
+        self.assertEqual(mode, 'wal')
+
+    def test_processes(self):
+        context = multiprocessing.get_context('spawn')
+        processes = [context.Process(target=_hset_many, args=(self.filename, f'p{i}', 50)) for i in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        for i in range(4):
+            self.assertEqual(len(self.store.get(f'p{i}')), 50)
+        self.assertEqual(len(self.store.get('shared')), 200)
+
+
+class DictAsyncStore(AsyncStore):
+    """Async hooks on a dict, expiry checked on reads"""
+    name = 'DictAsync'
+
+    def __init__(self, logger=None):
+        super().__init__(logger)
+        self.data = {}
+        self.expires = {}
+
+    def _check(self, name):
+        if name in self.expires and self.expires[name] <= time.time():
+            self.data.pop(name, None)
+            del self.expires[name]
+
+    async def _get(self, name, **kwargs):
+        self._check(name)
+        return self.data[name]
+
+    async def _hget(self, name, key, **kwargs):
+        self._check(name)
+        return self.data[name][key]
+
+    async def _set(self, name, value, **kwargs):
+        self.expires.pop(name, None)
+        self.data[name] = value
+
+    async def _hset(self, name, key, value, **kwargs):
+        self.data.setdefault(name, {})[key] = value
+
+    async def _delete(self, name, **kwargs):
+        del self.data[name]
+
+    async def _hdel(self, name, key, **kwargs):
+        del self.data[name][key]
+
+    async def _hgetall(self, name, **kwargs):
+        self._check(name)
+        return dict(self.data.get(name, {}))
+
+    async def _scan(self, prefix, **kwargs):
+        return [name for name in self.data if name.startswith(prefix)]
+
+    async def _execute(self, operations):
+        for op, name, key, value in operations:
+            if op == 'set':
+                await self._set(name, value)
+            elif op == 'hset':
+                await self._hset(name, key, value)
+            elif op == 'delete':
+                self.data.pop(name, None)
+            elif op == 'expire':
+                await self._expire(name, value)
+
+    async def _expire(self, name, ttl):
+        self.expires[name] = time.time() + ttl
+
+    async def _ttl(self, name):
+        return self.expires[name] - time.time() if name in self.expires else None
+
+
+class AsyncStorageTest(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.run = self.loop.run_until_complete
+        self.store = DictAsyncStore()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_get_set(self):
+        self.run(self.store.set('float', '1.5'))
+        self.run(self.store.hset('dict', 'list', [1, 2], serializer='json'))
+        self.assertEqual(self.run(self.store.get('float', cast=float)), 1.5)
+        self.assertEqual(self.run(self.store.hget('dict', 'list', serializer='json')), [1, 2])
+        self.assertIsNone(self.run(self.store.get('missing')))
+        self.run(self.store.hdel('dict', 'list'))
+        self.assertEqual(self.run(self.store.hgetall('dict')), {})
+        self.assertEqual(self.store.metrics.stats[('get', 'missing')].misses, 1)
+
+    def test_batch(self):
+        self.run(self.store.mset({'a': 1, 'b': 2}, serializer='fast'))
+        self.assertEqual(self.run(self.store.mget(['a', 'c', 'b'], serializer='fast')), [1, None, 2])
+        self.run(self.store.hmset('h', {'x': 1, 'y': 2}))
+        self.assertEqual(self.run(self.store.hmget('h', ['y', 'z'])), [2, None])
+        self.assertEqual(self.run(self.store.scan()), ['a', 'b', 'h'])
+
+    def test_ttl(self):
+        now = time.time()
+        self.run(self.store.set('foo', 'bar', ttl=10))
+        self.assertAlmostEqual(self.run(self.store.ttl('foo')), 10, delta=1)
+        with unittest.mock.patch('time.time', return_value=now + 15):
+            self.assertIsNone(self.run(self.store.get('foo')))
+
+    def test_pipeline_namespace(self):
+        bot_store = self.store.namespace('Bot:default:')
+
+        async def write():
+            async with bot_store.pipeline() as pipe:
+                pipe.set('position', {'side': 'buy'}, serializer='json').hset('deposits', '1', 1.0)
+
+        self.run(write())
+        self.assertEqual(self.store.data['Bot:default:position'], '{"side": "buy"}')
+        self.assertEqual(self.run(bot_store.get('position', serializer='json')), {'side': 'buy'})
+        self.assertEqual(self.run(bot_store.scan()), ['deposits', 'position'])
+        self.assertIn(('execute', 'Bot'), self.store.metrics.stats)
+
+    def test_threaded(self):
+        sync_store = JSONStore('test.json')
+        self.addCleanup(os.remove, 'test.json')
+        self.addCleanup(os.remove, 'test.json.lock')
+        store = ThreadedStore(sync_store)
+        self.run(store.namespace('Bot:').set('position', {'side': 'buy'}, serializer='fast', ttl=10))
+        self.assertEqual(sync_store.get('Bot:position', serializer='fast'), {'side': 'buy'})
+        self.assertEqual(self.run(store.mget(['Bot:position', 'foo'], serializer='fast')), [{'side': 'buy'}, None])
+        self.assertIsNotNone(self.run(store.ttl('Bot:position')))
+        self.assertIs(store.metrics, sync_store.metrics)
+        self.run(store.close())
+
+    def test_get_async_store(self):
+        store = get_async_store(store_settings={'name': 'memory'})
+        self.assertIsInstance(store, ThreadedStore)
+        self.assertIs(store.store, get_store(store_settings={'name': 'memory'}))
+        self.run(store.close())
+
+    def test_store_worker(self):
+        sync_store = MemoryStore()
+        store = ThreadedStore(sync_store)
+        # Namespaced views and async bot loops run on the same single worker
+        self.assertIs(store.executor, store_executor(sync_store))
+        self.assertIs(ThreadedStore(sync_store.namespace('Bot:')).executor, store.executor)
+        self.assertIsNot(store_executor(MemoryStore()), store.executor)
+        thread = self.run(store._run(threading.current_thread))
+        self.assertIs(store.executor.submit(threading.current_thread).result(), thread)
+
+    def test_worker_store(self):
+        sync_store = MemoryStore()
+        store = WorkerStore(sync_store).namespace('Bot:')
+        store.set('position', {'side': 'buy'})
+        self.assertEqual(sync_store.get('Bot:position'), {'side': 'buy'})
+        # Bots run on their own threads, their store operations on the store's worker
+        worker = store_executor(sync_store).submit(threading.current_thread).result()
+        current_thread = unittest.mock.Mock(side_effect=lambda *args, **kwargs: threading.current_thread())
+        with unittest.mock.patch.object(sync_store, '_get', current_thread):
+            self.assertIs(store.get('position'), worker)
+
+    def test_get_async_store_redis(self):
+        settings = {'name': 'redis', 'url': 'redis://localhost:6379/0'}
+        with unittest.mock.patch('trading_bots.core.async_storage.AsyncRedisStore') as store_cls:
+            store_cls.configure.return_value = {'url': settings['url']}
+            store_cls.side_effect = lambda **kwargs: unittest.mock.Mock()
+
+            async def get(store_settings):
+                return get_async_store(store_settings=store_settings)
+
+            store = self.run(get(settings))
+            self.assertIs(self.run(get(dict(settings))), store)
+            self.assertEqual(store_cls.call_count, 1)
+            # Clients are bound to their event loop
+            loop = asyncio.new_event_loop()
+            self.addCleanup(loop.close)
+            self.assertIsNot(loop.run_until_complete(get(settings)), store)
+
+
+class StoreRegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.filename = 'test.json'
+        self.store_settings = {'name': 'json', 'filename': self.filename, 'write_back': True}
+
+    def tearDown(self):
+        close_stores()
+        for filename in (self.filename, self.filename + '.lock'):
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+
+    def test_shared(self):
+        store = get_store(store_settings=self.store_settings)
+        self.assertIs(get_store(store_settings=dict(self.store_settings)), store)
+        self.assertIsNot(get_store(store_settings={**self.store_settings, 'write_back': False}), store)
+        self.assertIsInstance(get_store(store_settings={'name': 'memory'}), MemoryStore)
+
+    def test_threads(self):
+        stores = []
+        threads = [threading.Thread(target=lambda: stores.append(get_store(store_settings=self.store_settings)))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len({id(store) for store in stores}), 1)
+
+    def test_close_flushes(self):
+        store = get_store(store_settings=self.store_settings)
+        store.set('foo', 'bar')
+        self.assertFalse(os.path.exists(self.filename))
+        close_stores()
+        self.assertEqual(JSONStore(self.filename).get('foo'), 'bar')
+        self.assertIsNot(get_store(store_settings=self.store_settings), store)
+
+    def test_client_store(self):
+        store = MemoryStore()
+        client = BitfinexTrading('BTCUSD', client=object(), store=store)
+        self.assertIs(client.store, store)
+        for wallet in client.wallets:
+            self.assertIs(wallet.store, store)
+            self.assertEqual(wallet.wallet_type, 'exchange')
+
+
+class SerializersTest(unittest.TestCase):
+
+    def setUp(self):
+        self.value = {'str': 'a', 'int': 1, 'float': 1.5, 'list': [1, 2.0, None, True], 'ids': list(range(1000))}
+
+    def test_codecs(self):
+        for name in ('fast', 'orjson', 'msgpack'):
+            if name not in serializers:
+                continue
+            with self.subTest(name):
+                serializer = serializers[name]
+                self.assertEqual(serializer.loads(serializer.dumps(self.value)), self.value)
+        serializer = FramedSerializer(PickleCodec())
+        self.assertEqual(serializer.loads(serializer.dumps((1, 2))), (1, 2))
+
+    def test_compression(self):
+        data = FramedSerializer(JSONCodec(), compress_threshold=100).dumps(self.value)
+        self.assertEqual(data[:5], b'\x00TB\x01\x01')
+        self.assertLess(len(data), len(j.dumps(self.value)) / 2)
+        data = FramedSerializer(JSONCodec(), compress_threshold=None).dumps(self.value)
+        self.assertEqual(data[:5], b'\x00TB\x01\x00')
+
+    def test_read_any_codec(self):
+        data = FramedSerializer(JSONCodec()).dumps(self.value)
+        self.assertEqual(serializers['fast'].loads(data), self.value)
+
+    def test_legacy_values(self):
+        serializer = serializers['fast']
+        self.assertEqual(serializer.loads(j.dumps(self.value)), self.value)
+        self.assertEqual(serializer.loads(j.dumps(self.value).encode()), self.value)
+
+    def test_pickles_opt_in(self):
+        framed, legacy = FramedSerializer(PickleCodec()).dumps(self.value), pickle.dumps(self.value)
+        for data in (framed, legacy):
+            with self.assertRaises(AssertionError):
+                serializers['fast'].loads(data)
+            self.assertEqual(FramedSerializer(allow_pickle=True).loads(data), self.value)
+
+    def test_nan(self):
+        serializer = FramedSerializer(JSONCodec())
+        self.assertTrue(math.isnan(serializers['fast'].loads(serializer.dumps(float('nan')))))
+
+    def test_text_stores(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for store in (JSONStore(os.path.join(directory, 'store.json')),
+                          LogStore(os.path.join(directory, 'store.log')),
+                          SQLiteStore(os.path.join(directory, 'store.db')),
+                          MemoryStore()):
+                with self.subTest(store.name):
+                    store.hset('name', 'key', self.value, serializer='fast')
+                    store.hset('name', 'pickle', {1, 2}, serializer='pickle')
+                    self.assertEqual(store.hget('name', 'key', serializer='fast'), self.value)
+                    self.assertEqual(store.hget('name', 'pickle', serializer='pickle'), {1, 2})
+                    store.close()
@@ -0,0 +1,122 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from trading_bots.contrib.converters import *
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(self.path)
+        status = server.statuses.pop(0) if server.statuses else 200
+        time.sleep(server.delay)
+        body = json.dumps({'last': 600.5}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+
+class TransportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.requests, self.server.statuses, self.server.delay, self.server.connections = [], [], 0, 0
+        threading.Thread(target=self.server.serve_forever, args=(0.01,), daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        self.transport = Transport(timeout=1, backoff_factor=0)
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def converter(self, **kwargs):
+        converter = BitcoinAverage(rate_ttl=0, transport=kwargs.pop('transport', self.transport), **kwargs)
+        converter.base_url = self.url
+        return converter
+
+    def test_pooled(self):
+        first, second = self.converter(), self.converter()
+        for converter in (first, second, first):
+            self.assertEqual(converter.get_rate_for('BTC', 'USD'), 600.5)
+        self.assertEqual(self.server.requests, ['/indices/global/ticker/BTCUSD'] * 3)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_mounted_client(self):
+        session = requests.Session()
+        self.transport.mount(session)
+        session.get(self.url)
+        # Closing a mounted session keeps the shared pool
+        session.close()
+        self.transport.get_json(self.url)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_retries(self):
+        self.server.statuses = [503, 502]
+        self.assertEqual(self.converter().get_rate_for('BTC', 'USD'), 600.5)
+        self.assertEqual(len(self.server.requests), 3)
+        self.server.statuses = [503] * 4
+        with self.assertRaises(ConverterRateError):
+            self.converter().get_rate_for('BTC', 'USD')
+
+    def test_timeout(self):
+        self.server.delay = 0.3
+        transport = Transport(timeout=0.1, retries=0)
+        self.addCleanup(transport.close)
+        with self.assertRaises(requests.RequestException):
+            transport.get_json(self.url)
+
+    def test_metrics(self):
+        self.converter().get_rate_for('BTC', 'USD')
+        self.server.statuses = [404]
+        with self.assertRaises(requests.HTTPError):
+            self.transport.get_json(f'{self.url}/missing')
+        host = f'127.0.0.1:{self.server.server_port}'
+        [row] = self.transport.metrics.summary()
+        self.assertEqual((row['operation'], row['prefix'], row['calls'], row['errors']), ('GET', host, 2, 1))
+        self.assertGreater(row['bytes'], 0)
+        self.assertIn(f'http GET {host}: 2 calls', self.transport.metrics.format())
+
+    def test_cassette(self):
+        path = os.path.join(self.tmp.name, 'cassette.json')
+        cassette = Cassette(path, mode='record')
+        transport = Transport(cassette=cassette)
+        self.transport.close()
+        transport.get_json(self.url, params={'app_id': 'secret', 'base': 'USD'})
+        cassette.save()
+        transport.close()
+        with open(path) as f:
+            self.assertNotIn('secret', f.read())
+        # Replayed offline
+        self.server.shutdown()
+        transport = Transport(cassette=Cassette(path))
+        response = transport.get_json(self.url, params={'base': 'USD', 'app_id': 'other'})
+        self.assertEqual(response, {'last': 600.5})
+        self.assertEqual(self.server.requests, ['/?app_id=secret&base=USD'])
+        with self.assertRaises(requests.ConnectionError):
+            transport.get_json(self.url, params={'base': 'CLP'})
+
+    def test_shared(self):
+        self.assertIs(get_transport(), get_transport())
+        self.assertIs(BitcoinAverage().transport, get_transport())
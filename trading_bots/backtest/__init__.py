@@ -0,0 +1,5 @@
+from .clock import *
+from .data import *
+from .runner import *
+from .sweep import *
+from .vectorized import *
@@ -0,0 +1,65 @@
+import threading
+import time
+from contextlib import contextmanager
+
+__all__ = [
+    'VirtualClock',
+]
+
+# Virtual clock of each thread running a patched block, other threads keep the real time
+_clocks = threading.local()
+_patched = 0
+_real = None
+_lock = threading.Lock()
+
+
+def _time() -> float:
+    clock = getattr(_clocks, 'clock', None)
+    return _real[0]() if clock is None else clock.time()
+
+
+def _sleep(seconds: float):
+    clock = getattr(_clocks, 'clock', None)
+    if clock is None:
+        _real[1](seconds)
+    else:
+        clock.sleep(seconds)
+
+
+class VirtualClock:
+    """Simulated time source for backtests.
+    Sleeping advances the clock instead of blocking, and time never goes backwards."""
+
+    def __init__(self, start: float=0.0):
+        self.now = start
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += max(seconds, 0)
+
+    def set(self, timestamp: float):
+        if timestamp > self.now:
+            self.now = timestamp
+
+    @contextmanager
+    def patch(self):
+        """Make time.time and time.sleep use the virtual clock, in the current thread only.
+        Other threads, e.g. lock polling and background refreshes, keep the real time.
+        Code that imported the functions directly (from time import sleep) keeps the real ones."""
+        global _patched, _real
+        with _lock:
+            if not _patched:
+                _real = time.time, time.sleep
+                time.time, time.sleep = _time, _sleep
+            _patched += 1
+        previous, _clocks.clock = getattr(_clocks, 'clock', None), self
+        try:
+            yield self
+        finally:
+            _clocks.clock = previous
+            with _lock:
+                _patched -= 1
+                if not _patched:
+                    time.time, time.sleep = _real
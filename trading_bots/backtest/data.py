@@ -0,0 +1,106 @@
+import os
+from heapq import merge
+from operator import attrgetter
+
+from trading_bots.contrib.clients import OrderBook
+from .runner import MarketEvent
+
+try:
+    import numpy as np
+except ImportError:
+    pass
+
+__all__ = [
+    'MarketData',
+    'load_market_data',
+    'merged_feed',
+]
+
+BIDS, ASKS = 0, 1
+
+
+class MarketData:
+    """Order book snapshots of a market as NumPy arrays.
+
+    `timestamps` has shape (n,) and `books` (n, 2, depth, 2): bids and asks of every snapshot,
+    as [price, amount] levels padded with zero amounts. Saved as .npy files, so any number of
+    processes can map the same data with `load` instead of receiving a copy each.
+    """
+
+    def __init__(self, market: str, timestamps, books):
+        assert len(timestamps) == len(books), 'Timestamps and books lengths differ!'
+        self.market = str(market)
+        self.timestamps = timestamps
+        self.books = books
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @classmethod
+    def from_books(cls, market: str, books, depth: int=None):
+        """Build from (timestamp, OrderBook) snapshots, keeping up to depth levels per side"""
+        books = list(books)
+        if depth is None:
+            depth = max((max(len(book.bids), len(book.asks)) for _, book in books), default=0)
+        timestamps = np.array([timestamp for timestamp, _ in books], dtype=float)
+        levels = np.zeros((len(books), 2, depth, 2))
+        for i, (_, book) in enumerate(books):
+            for side, entries in ((BIDS, book.bids), (ASKS, book.asks)):
+                entries = [entry[:2] for entry in entries[:depth]]
+                if entries:
+                    levels[i, side, :len(entries)] = entries
+        return cls(market, timestamps, levels)
+
+    @classmethod
+    def from_log(cls, market: str, book_log, start: float=None, end: float=None):
+        """Build from a recorder order book ColumnarLog, without copying when in a single day"""
+        columns = book_log.read(start, end)
+        return cls(market, columns['timestamp'], columns['book'])
+
+    @staticmethod
+    def _paths(directory: str, market: str):
+        return (os.path.join(directory, f'{market}.timestamps.npy'),
+                os.path.join(directory, f'{market}.books.npy'))
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        timestamps_path, books_path = self._paths(directory, self.market)
+        np.save(timestamps_path, np.asarray(self.timestamps, dtype=float))
+        np.save(books_path, np.asarray(self.books, dtype=float))
+        return directory
+
+    @classmethod
+    def load(cls, directory: str, market: str, mmap_mode: str='r'):
+        """Load saved data, memory mapped read-only by default"""
+        timestamps_path, books_path = cls._paths(directory, market)
+        return cls(market, np.load(timestamps_path, mmap_mode=mmap_mode), np.load(books_path, mmap_mode=mmap_mode))
+
+    def order_book(self, i: int) -> OrderBook:
+        book = self.books[i]
+        return OrderBook(
+            bids=[level for level in book[BIDS].tolist() if level[1] > 0],
+            asks=[level for level in book[ASKS].tolist() if level[1] > 0],
+        )
+
+    def mid_prices(self):
+        with np.errstate(invalid='ignore'):
+            return (self.books[:, BIDS, 0, 0] + self.books[:, ASKS, 0, 0]) / 2
+
+    def feed(self, start: float=None, end: float=None):
+        """Backtest market events, optionally between start and end timestamps"""
+        lo = 0 if start is None else int(np.searchsorted(self.timestamps, start, side='left'))
+        hi = len(self) if end is None else int(np.searchsorted(self.timestamps, end, side='right'))
+        for i in range(lo, hi):
+            yield MarketEvent(float(self.timestamps[i]), self.market, self.order_book(i))
+
+
+def load_market_data(directory: str, mmap_mode: str='r') -> list:
+    """Load the data of every market saved in a directory"""
+    suffix = '.timestamps.npy'
+    markets = sorted(name[:-len(suffix)] for name in os.listdir(directory) if name.endswith(suffix))
+    return [MarketData.load(directory, market, mmap_mode) for market in markets]
+
+
+def merged_feed(data: list, start: float=None, end: float=None):
+    """Events of several markets in timestamp order"""
+    return merge(*(market_data.feed(start, end) for market_data in data), key=attrgetter('timestamp'))
@@ -0,0 +1,194 @@
+import logging
+import time
+from array import array
+from collections import namedtuple
+from itertools import chain
+from logging import Logger
+
+from trading_bots.bots import Bot
+from trading_bots.contrib.clients.base import Market
+from trading_bots.contrib.simulator import FeeModel, SimulatedExchange, simulated_clients
+from trading_bots.core.logging import get_logger
+from trading_bots.core.storage import MemoryStore
+from .clock import VirtualClock
+
+__all__ = [
+    'MarketEvent',
+    'book_events',
+    'BacktestResult',
+    'Backtest',
+]
+
+MarketEvent = namedtuple('market_event', 'timestamp market order_book trades')
+MarketEvent.__new__.__defaults__ = (None, ())
+
+
+def book_events(market, books, trades=None):
+    """Turn (timestamp, OrderBook) snapshots and optional {timestamp: [(price, amount, side)]} trades into events"""
+    trades = trades or {}
+    for timestamp, order_book in books:
+        yield MarketEvent(timestamp, str(market), order_book, trades.get(timestamp, ()))
+
+
+class BacktestResult:
+    """Strategy results and per-tick CPU times of a backtest"""
+
+    def __init__(self, label: str, quote: str):
+        self.label = label
+        self.quote = quote
+        self.start = None
+        self.end = None
+        self.ticks = 0
+        self.errors = 0
+        self.cpu_times = array('d')
+        self.equity = array('d')
+        self.balances_start = {}
+        self.balances_end = {}
+        self.orders = 0
+        self.fills = 0
+        self.wall_time = 0.0
+
+    @property
+    def cpu_total(self):
+        return sum(self.cpu_times)
+
+    @property
+    def cpu_mean(self):
+        return self.cpu_total / len(self.cpu_times) if self.cpu_times else 0.0
+
+    def cpu_percentile(self, p: float):
+        if not self.cpu_times:
+            return 0.0
+        times = sorted(self.cpu_times)
+        return times[min(int(p / 100 * len(times)), len(times) - 1)]
+
+    @property
+    def total_return(self):
+        if len(self.equity) < 2 or not self.equity[0]:
+            return 0.0
+        return self.equity[-1] / self.equity[0] - 1
+
+    @property
+    def max_drawdown(self):
+        peak, drawdown = float('-inf'), 0.0
+        for value in self.equity:
+            peak = max(peak, value)
+            if peak > 0:
+                drawdown = max(drawdown, 1 - value / peak)
+        return drawdown
+
+    @property
+    def speedup(self):
+        """Simulated seconds per wall clock second"""
+        if not self.wall_time or self.start is None:
+            return 0.0
+        return (self.end - self.start) / self.wall_time
+
+    def summary(self):
+        return {
+            'bot': self.label,
+            'ticks': self.ticks,
+            'errors': self.errors,
+            'orders': self.orders,
+            'fills': self.fills,
+            f'equity_start ({self.quote})': self.equity[0] if self.equity else None,
+            f'equity_end ({self.quote})': self.equity[-1] if self.equity else None,
+            'total_return': self.total_return,
+            'max_drawdown': self.max_drawdown,
+            'cpu_mean_ms': self.cpu_mean * 1000,
+            'cpu_p99_ms': self.cpu_percentile(99) * 1000,
+            'cpu_max_ms': max(self.cpu_times, default=0.0) * 1000,
+            'wall_time': self.wall_time,
+            'speedup': self.speedup,
+        }
+
+    def __str__(self):
+        return '\n'.join(f'{key}: {value}' for key, value in self.summary().items())
+
+
+class Backtest:
+    """Event-driven backtest of a Bot over recorded or synthetic market data.
+
+    Market events are replayed into a simulated exchange on a virtual clock, and the bot
+    is executed every `interval` simulated seconds, as `bots.py loop` would. The clients the
+    bot creates with `get_client` are bound to the simulated exchange and its store lives in memory.
+    """
+
+    def __init__(self, bot_cls: type, config: dict, feed, interval: float=60, balances: dict=None,
+                 fee_model: FeeModel=None, valuation_market: (str, Market)=None, config_name: str='backtest',
+                 log_level: int=logging.WARNING, stop_on_error: bool=False, logger: Logger=None):
+        assert issubclass(bot_cls, Bot), f'{bot_cls} is not a Bot subclass!'
+        assert interval > 0, 'Interval must be positive!'
+        self.bot_cls = bot_cls
+        self.config = config
+        self.feed = feed
+        self.interval = interval
+        self.balances = balances or {}
+        self.fee_model = fee_model
+        self.valuation_market = Market(valuation_market) if valuation_market else None
+        self.config_name = config_name
+        self.log_level = log_level
+        self.stop_on_error = stop_on_error
+        self.log = logger or get_logger(__name__)
+
+    def run(self) -> BacktestResult:
+        events = iter(self.feed)
+        first = next(events, None)
+        if first is None:
+            raise ValueError('Feed has no market data!')
+        market = self.valuation_market or Market(first.market)
+        result = BacktestResult(self.bot_cls.label, market.quote)
+        clock = VirtualClock(first.timestamp)
+        exchange = SimulatedExchange(self.balances, self.fee_model, clock=clock.time)
+        result.balances_start = exchange.balances()
+        result.start = first.timestamp
+        self.log.info(f'Backtesting {self.bot_cls.label} from {first.timestamp} every {self.interval}s')
+        wall_start = time.perf_counter()
+        with clock.patch():
+            bot = self.bot_cls(self.config, self.config_name, store=MemoryStore(self.log),
+                               clients=simulated_clients(exchange))
+            bot.log.setLevel(self.log_level)
+            next_run = first.timestamp
+            for event in chain((first,), events):
+                while next_run < event.timestamp:
+                    self._tick(bot, clock, exchange, market, next_run, result)
+                    next_run += self.interval
+                clock.set(event.timestamp)
+                self._apply(exchange, event)
+            self._tick(bot, clock, exchange, market, next_run, result)
+        result.end = clock.time()
+        result.wall_time = time.perf_counter() - wall_start
+        result.balances_end = exchange.balances()
+        result.orders = len(exchange.orders)
+        result.fills = len(exchange.fills)
+        self.log.info(f'Backtest finished: {result.ticks} ticks in {result.wall_time:,.2f} seconds')
+        return result
+
+    @staticmethod
+    def _apply(exchange: SimulatedExchange, event: MarketEvent):
+        if event.order_book is not None:
+            exchange.load_order_book(event.market, event.order_book)
+        for price, amount, side in event.trades:
+            exchange.process_trade(event.market, price, amount, side)
+
+    def _tick(self, bot: Bot, clock: VirtualClock, exchange: SimulatedExchange, market: Market, timestamp: float,
+              result: BacktestResult):
+        clock.set(timestamp)
+        cpu_start = time.process_time()
+        try:
+            bot.execute()
+        except Exception:
+            result.errors += 1
+            if self.stop_on_error:
+                raise
+        result.cpu_times.append(time.process_time() - cpu_start)
+        result.equity.append(self._equity(exchange, market))
+        result.ticks += 1
+
+    @staticmethod
+    def _equity(exchange: SimulatedExchange, market: Market):
+        """Account value in the valuation market quote currency, at mid price"""
+        engine = exchange.engine(market)
+        bid, ask = engine.best_bid(), engine.best_ask()
+        mid = (bid + ask) / 2 if bid and ask else bid or ask or 0.0
+        return exchange.balance(market.quote) + exchange.balance(market.base) * mid
@@ -0,0 +1,159 @@
+import csv
+import logging
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from copy import deepcopy
+from itertools import product
+from logging import Logger
+
+from trading_bots.core.logging import get_logger
+from .data import MarketData, load_market_data, merged_feed
+from .runner import Backtest
+
+__all__ = [
+    'set_param',
+    'grid_params',
+    'random_params',
+    'ParameterSweep',
+    'format_table',
+    'write_results',
+]
+
+RESULT_COLUMNS = ('total_return', 'max_drawdown', 'fills', 'errors', 'ticks', 'cpu_mean_ms')
+
+
+def set_param(config: dict, path: str, value):
+    """Set a nested config value by dotted path, e.g. 'talib.rsi.periods'"""
+    *parents, key = path.split('.')
+    for parent in parents:
+        config = config.setdefault(parent, {})
+    config[key] = value
+
+
+def grid_params(grid: dict) -> list:
+    """Every combination of a {path: [values]} grid"""
+    paths = list(grid)
+    return [dict(zip(paths, values)) for values in product(*grid.values())]
+
+
+def random_params(space: dict, samples: int, seed: int=None) -> list:
+    """Random search over a {path: values} space.
+    Lists are sampled as choices, (low, high) tuples uniformly, as integers when both bounds are."""
+    rnd = random.Random(seed)
+
+    def sample(values):
+        if isinstance(values, tuple):
+            low, high = values
+            if isinstance(low, int) and isinstance(high, int):
+                return rnd.randint(low, high)
+            return rnd.uniform(low, high)
+        return rnd.choice(values)
+
+    return [{path: sample(values) for path, values in space.items()} for _ in range(samples)]
+
+
+# Worker process state, set once per process by _init_worker
+_worker = {}
+
+
+def _init_worker(bot_cls: type, config: dict, data_dir: str, backtest_kwargs: dict):
+    _worker.update(
+        bot_cls=bot_cls,
+        config=config,
+        data=load_market_data(data_dir),
+        backtest_kwargs=backtest_kwargs,
+    )
+
+
+def _run_backtest(params: dict) -> dict:
+    config = deepcopy(_worker['config'])
+    for path, value in params.items():
+        set_param(config, path, value)
+    feed = merged_feed(_worker['data'])
+    result = Backtest(_worker['bot_cls'], config, feed, **_worker['backtest_kwargs']).run()
+    summary = result.summary()
+    return {**params, **{column: summary[column] for column in RESULT_COLUMNS}}
+
+
+class ParameterSweep:
+    """Backtest a bot over many config variations in parallel.
+
+    Market data is saved once as .npy files and memory mapped by every worker process, so
+    tasks only carry the parameters to override. Results are ranked by `sort_by`.
+    """
+
+    def __init__(self, bot_cls: type, config: dict, data: list, interval: float=60, balances: dict=None,
+                 fee_model=None, valuation_market: str=None, workers: int=None, sort_by: str='total_return',
+                 descending: bool=True, logger: Logger=None):
+        self.bot_cls = bot_cls
+        self.config = config
+        self.data = [data] if isinstance(data, MarketData) else list(data)
+        assert self.data, 'No market data to backtest!'
+        self.backtest_kwargs = dict(interval=interval, balances=balances, fee_model=fee_model,
+                                    valuation_market=valuation_market, log_level=logging.CRITICAL)
+        self.workers = workers or os.cpu_count()
+        self.sort_by = sort_by
+        self.descending = descending
+        self.log = logger or get_logger(__name__)
+
+    def rank(self, results: list) -> list:
+        results = sorted(results, key=lambda r: r[self.sort_by], reverse=self.descending)
+        for rank, result in enumerate(results, 1):
+            result['rank'] = rank
+        return results
+
+    def run(self, params: list) -> list:
+        """Backtest every {path: value} override set, returns ranked result rows"""
+        with tempfile.TemporaryDirectory(prefix='sweep-') as data_dir:
+            for market_data in self.data:
+                market_data.save(data_dir)
+            initargs = (self.bot_cls, self.config, data_dir, self.backtest_kwargs)
+            self.log.info(f'Sweeping {len(params)} configs of {self.bot_cls.label} on {self.workers} workers')
+            start = time.perf_counter()
+            results = []
+            with ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=initargs) as executor:
+                futures = [executor.submit(_run_backtest, p) for p in params]
+                for done, future in enumerate(as_completed(futures), 1):
+                    results.append(future.result())
+                    self.log.debug(f'{done}/{len(params)} backtests done')
+            self.log.info(f'Sweep finished in {time.perf_counter() - start:,.2f} seconds')
+        return self.rank(results)
+
+    def grid(self, grid: dict) -> list:
+        return self.run(grid_params(grid))
+
+    def random(self, space: dict, samples: int, seed: int=None) -> list:
+        return self.run(random_params(space, samples, seed))
+
+
+def _format(value):
+    if isinstance(value, float):
+        return f'{value:.6g}'
+    return str(value)
+
+
+def format_table(results: list, limit: int=None) -> str:
+    """Ranked results as an aligned text table"""
+    results = results[:limit] if limit else results
+    if not results:
+        return ''
+    columns = ['rank'] + [c for c in results[0] if c != 'rank']
+    rows = [columns] + [[_format(result.get(c)) for c in columns] for result in results]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(columns))]
+    lines = ['  '.join(cell.rjust(width) for cell, width in zip(row, widths)) for row in rows]
+    lines.insert(1, '  '.join('-' * width for width in widths))
+    return '\n'.join(lines)
+
+
+def write_results(results: list, path: str):
+    """Ranked results as CSV"""
+    if not results:
+        return
+    columns = ['rank'] + [c for c in results[0] if c != 'rank']
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, columns)
+        writer.writeheader()
+        writer.writerows(results)
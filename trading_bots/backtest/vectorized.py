@@ -0,0 +1,156 @@
+from collections import namedtuple
+from itertools import product
+
+from trading_bots.indicators import bbands, rsi
+from trading_bots.utils import interval_to_seconds
+
+try:
+    import numpy as np
+except ImportError:
+    pass
+
+__all__ = [
+    'Candles',
+    'candles_from_trades',
+    'VectorizedBacktest',
+]
+
+Candles = namedtuple('candles', 'timestamp open high low close')
+
+SECONDS_PER_YEAR = 365 * 86400
+
+
+def candles_from_trades(timestamps, rates, interval: (str, int)='5min') -> Candles:
+    """Resample trades into OHLC candles. Candles without trades take the previous close as every price."""
+    timestamps = np.asarray(timestamps, dtype=float)
+    rates = np.asarray(rates, dtype=float)
+    if len(timestamps) == 0:
+        return Candles(*(np.empty(0) for _ in Candles._fields))
+    order = np.argsort(timestamps, kind='stable')
+    timestamps, rates = timestamps[order], rates[order]
+    seconds = interval_to_seconds(interval)
+    buckets = np.floor(timestamps / seconds).astype(np.int64)
+    index = buckets - buckets[0]
+    n = index[-1] + 1
+    starts = np.flatnonzero(np.r_[True, index[1:] != index[:-1]])
+    ends = np.r_[starts[1:], len(index)] - 1
+    candles = {name: np.full(n, np.nan) for name in ('open', 'high', 'low', 'close')}
+    slots = index[starts]
+    candles['open'][slots] = rates[starts]
+    candles['close'][slots] = rates[ends]
+    candles['high'][slots] = np.maximum.reduceat(rates, starts)
+    candles['low'][slots] = np.minimum.reduceat(rates, starts)
+    # Forward fill the close of empty candles
+    filled = np.zeros(n, dtype=np.int64)
+    filled[slots] = slots
+    np.maximum.accumulate(filled, out=filled)
+    close = candles['close'][filled]
+    empty = np.isnan(candles['open'])
+    for name in ('open', 'high', 'low'):
+        candles[name][empty] = close[empty]
+    candles['close'] = close
+    timestamp = (buckets[0] + np.arange(n)) * seconds
+    return Candles(timestamp=timestamp, **candles)
+
+
+def _hold(entries, exits):
+    """1 from each entry until the following exit, 0 otherwise"""
+    events = np.where(entries, 1.0, np.where(exits, 0.0, np.nan))
+    index = np.where(np.isnan(events), 0, np.arange(len(events)))
+    np.maximum.accumulate(index, out=index)
+    held = events[index]
+    held[np.isnan(held)] = 0.0
+    return held
+
+
+class VectorizedBacktest:
+    """Vectorized backtest of the TechnicalAnalysis Bollinger Bands + RSI strategy.
+
+    Indicators are computed once per period over the whole candle history and cached, signals
+    and positions are derived with array operations, so every parameter combination costs a few
+    passes over the close prices. Positions: long (1) when the close is under the lower band and
+    RSI is oversold, until RSI rises to exit_oversold; short (-1) when the close is over the upper
+    band and RSI is overbought, until RSI falls to exit_overbought. A position opens and earns
+    the return from the candle after its signal, and fees are charged on every position change.
+    """
+
+    defaults = dict(bbands_periods=14, bbands_nbdev=2.0, rsi_periods=14, overbought=85, oversold=15,
+                    exit_overbought=70, exit_oversold=30)
+
+    def __init__(self, close, interval: (str, int)='5min', fee: float=0.0):
+        self.close = np.asarray(close, dtype=float)
+        self.interval = interval_to_seconds(interval)
+        self.fee = fee
+        self.returns = np.zeros(len(self.close))
+        self.returns[1:] = np.diff(self.close) / self.close[:-1]
+        self._bbands = {}
+        self._rsi = {}
+
+    @classmethod
+    def from_trades(cls, timestamps, rates, interval: (str, int)='5min', fee: float=0.0):
+        candles = candles_from_trades(timestamps, rates, interval)
+        return cls(candles.close, interval, fee)
+
+    @classmethod
+    def params_from_config(cls, config: dict) -> dict:
+        """Strategy parameters from a TechnicalAnalysis config"""
+        talib_config = config['talib']
+        return {
+            **cls.defaults,
+            'bbands_periods': talib_config['bbands']['periods'],
+            'rsi_periods': talib_config['rsi']['periods'],
+            'overbought': talib_config['rsi']['overbought'],
+            'oversold': talib_config['rsi']['oversold'],
+        }
+
+    def bbands(self, periods: int, nbdev: float):
+        key = (periods, nbdev)
+        if key not in self._bbands:
+            upper, _, lower = bbands(self.close, periods, nbdev, nbdev)
+            self._bbands[key] = upper, lower
+        return self._bbands[key]
+
+    def rsi(self, periods: int):
+        if periods not in self._rsi:
+            self._rsi[periods] = rsi(self.close, periods)
+        return self._rsi[periods]
+
+    def positions(self, **params):
+        p = {**self.defaults, **params}
+        upper, lower = self.bbands(p['bbands_periods'], p['bbands_nbdev'])
+        rsi_values = self.rsi(p['rsi_periods'])
+        with np.errstate(invalid='ignore'):
+            long = _hold((self.close < lower) & (rsi_values < p['oversold']), rsi_values >= p['exit_oversold'])
+            short = _hold((self.close > upper) & (rsi_values > p['overbought']), rsi_values <= p['exit_overbought'])
+        return np.clip(long - short, -1, 1)
+
+    def returns_for(self, positions):
+        """Net return of every candle for a positions series"""
+        net = np.zeros(len(positions))
+        net[1:] = positions[:-1] * self.returns[1:]
+        net[1:] -= self.fee * np.abs(np.diff(positions))
+        return net
+
+    def evaluate(self, **params) -> dict:
+        positions = self.positions(**params)
+        net = self.returns_for(positions)
+        equity = np.cumprod(1 + net)
+        drawdown = 1 - equity / np.maximum.accumulate(equity)
+        std = net.std()
+        sharpe = net.mean() / std * np.sqrt(SECONDS_PER_YEAR / self.interval) if std > 0 else 0.0
+        return {
+            **self.defaults,
+            **params,
+            'total_return': float(equity[-1] - 1) if len(equity) else 0.0,
+            'sharpe': float(sharpe),
+            'max_drawdown': float(drawdown.max()) if len(drawdown) else 0.0,
+            'trades': int(np.count_nonzero(np.diff(positions))),
+            'exposure': float(np.mean(positions != 0)) if len(positions) else 0.0,
+        }
+
+    def sweep(self, grid: dict, sort_by: str='total_return') -> list:
+        """Evaluate every combination of a {param: [values]} grid, best first"""
+        names = list(grid)
+        results = [self.evaluate(**dict(zip(names, values))) for values in product(*grid.values())]
+        results.sort(key=lambda r: r[sort_by], reverse=True)
+        return results
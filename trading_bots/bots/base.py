@@ -16,7 +16,7 @@ class Bot:
     verbose_name = ''
     config_file = ''
 
-    def __init__(self, config: dict=None, config_name: str=None, logger: Logger=None):
+    def __init__(self, config: dict=None, config_name: str=None, logger: Logger=None, store=None, clients=None):
         assert self.label, 'A Bot object must have a label attribute!'
         # Set configuration
         self.config = config
@@ -28,8 +28,12 @@ class Bot:
         # Set logger
         self.log = logger or self.get_logger()
         self.setup_logger(self.log)
-        # Set store
-        self.store = get_store(self.log)
+        # Set store, namespaced by bot and config if set
+        self.store = store or get_store(self.log)
+        if settings.storage.get('namespace'):
+            self.store = self.store.namespace(f'{self.label}:{self.config_name}:')
+        # Callable (client_cls, *args, **kwargs) creating the bot's clients, e.g. simulated ones in backtests
+        self.clients = clients
         # Time
         self.timestamp = None
         self.run_time = None
@@ -39,6 +43,12 @@ class Bot:
     def _setup(self, config: dict):
         pass
 
+    def get_client(self, client_cls, *args, **kwargs):
+        """Create a client of the bot, with the bot's clients factory if it was given one"""
+        if self.clients is not None:
+            return self.clients(client_cls, *args, **kwargs)
+        return client_cls(*args, **kwargs)
+
     def _algorithm(self):
         raise NotImplementedError
 
@@ -52,6 +62,7 @@ class Bot:
         self.timestamp = int(time.time())
         msg = f'Starting {self.label} {self.timestamp}: {get_iso_time_str()} '
         self.log.info(f'{msg:-<80}')
+        store_metrics = self.store.metrics.snapshot()
 
         try:
             self.check_dry_run()
@@ -68,6 +79,7 @@ class Bot:
             raise
 
         finally:
+            self._log_store_metrics(store_metrics)
             if self.timestamp:
                 self.run_time = time.time() - self.timestamp
                 self.log.info(f'Run time: {self.run_time:,.4f} seconds')
@@ -75,8 +87,14 @@ class Bot:
             else:
                 msg = f'Ending {self.label}: {get_iso_time_str()} '
             self.log.info(f'{msg:-<80}')
+            self.store.flush()
             self._post_exec()
 
+    def _log_store_metrics(self, snapshot: dict):
+        summary = self.store.metrics.format(snapshot)
+        if summary:
+            self.log.info(f'Store operations:\n{summary}')
+
     def abort(self):
         try:
             self.log.warning(f'Aborting {self.label} bot...')
@@ -5,6 +5,8 @@ from logging import Logger
 import trading_bots
 from .registry import bots
 from ..conf import settings
+from ..core.async_storage import WorkerStore
+from ..core.storage import get_store
 
 
 class BotTask:
@@ -18,11 +20,11 @@ class BotTask:
         self.bot_cls = bots.get_bot(bot_label).cls
         self.bot_config = bots.get_config(bot_label, config_name)
 
-    def get_bot_instance(self):
-        return self.bot_cls(self.bot_config, self.config_name, self.logger)
+    def get_bot_instance(self, store=None):
+        return self.bot_cls(self.bot_config, self.config_name, self.logger, store=store)
 
-    def run_once(self):
-        bot_instance = self.get_bot_instance()
+    def run_once(self, store=None):
+        bot_instance = self.get_bot_instance(store)
         bot_instance.execute()
 
     def abort(self):
@@ -35,8 +37,12 @@ class BotTask:
             time.sleep(interval)
 
     async def loop_async(self, interval: int):
+        loop = asyncio.get_event_loop()
+        # Bots are sync, they run off the event loop and their store operations on the store's worker,
+        # which async stores share
+        store = WorkerStore(get_store(self.logger))
         while True:
-            self.run_once()
+            await loop.run_in_executor(None, self.run_once, store)
             await asyncio.sleep(interval)
 
     def run_loop(self, interval: int):
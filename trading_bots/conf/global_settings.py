@@ -18,6 +18,15 @@ logging = {
 storage = {
     'name': 'json',
     'filename': 'store.json',
+    'write_back': False,
+    # Prefix store names with the bot label and config name
+    'namespace': False,
+    # Log store operations slower than this many seconds
+    'slow_threshold': 0.1,
+}
+
+history = {
+    'directory': 'history',
 }
 
 timeout = 120
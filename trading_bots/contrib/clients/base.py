@@ -16,6 +16,7 @@ __all__ = [
     'Side',
     'OrderBook',
     'OrderBookEmptyError',
+    'OrderNotFoundError',
     'OrderType',
     'APIClientSession',
     'APIClient',
@@ -57,6 +58,10 @@ class OrderBookEmptyError(Exception):
     pass
 
 
+class OrderNotFoundError(KeyError):
+    pass
+
+
 class Side(Enum):
     BUY = 'buy'
     SELL = 'sell'
@@ -79,13 +84,15 @@ class BaseClient:
     name = ''
 
     def __init__(self, client=None, dry_run: bool=False, timeout: int=None,
-                 logger: Logger=None, store=None, **kwargs):
+                 logger: Logger=None, store=None, simulator=None, **kwargs):
         assert self.name, 'A name must be defined for the client!'
         self.credentials = settings.credentials.get(self.name)
         self.dry_run = dry_run
         self.timeout = timeout
         self.log = logger or get_logger(__name__)
         self.store = store or get_store(self.log)
+        # Simulated exchange that executes dry run operations
+        self.simulator = simulator
         self.client = client or self._client()
 
     def _client(self):
@@ -196,6 +203,11 @@ class WalletClient(CurrencyClientMixin):
             msg = self._withdrawal_details_msg(f'{withdrawal_msg} requested | ', withdrawal)
             self.log.info(msg)
             return withdrawal
+        elif self.simulator:
+            withdrawal = self.simulator.withdraw(currency, amount, address, fee=self.withdrawal_fee,
+                                                 subtract_fee=subtract_fee)
+            self.log.warning(f'DRY RUN: {withdrawal_msg} simulated | {withdrawal}')
+            return withdrawal
         else:
             msg = f'DRY RUN: {withdrawal_msg} requested'
             self.log.warning(msg)
@@ -245,6 +257,21 @@ class MarketClient(MarketClientMixin):
     def _order_book_entry_price(self, order):
         return order.price
 
+    def _trades(self, since: float=None):
+        raise NotImplementedError
+
+    def get_trades(self, since: float=None):
+        """Public trades as dicts with id, timestamp, rate and signed amount (negative on sells), oldest first.
+        Trades at since are included, callers dedup them by id."""
+        self.log.debug(f'Obtaining trades from {self.name}')
+        try:
+            trades = self._trades(since)
+            self.log.debug(f'Total number of trades: {len(trades)}')
+        except Exception:
+            self.log.error(f'Failed obtaining trades from {self.name}!')
+            raise
+        return trades
+
     def _quote_book_price(self, order_book: list, amount: float=0):
         quote = 0
         if not order_book:
@@ -331,7 +358,8 @@ class TradingClient(MarketClientMixin):
         self.wallets = Wallets(base, quote)
 
     def _wallet_client_init(self, currency):
-        return self.wallet_client(currency, self.client, self.dry_run, self.timeout, self.log)
+        return self.wallet_client(currency, self.client, self.dry_run, self.timeout, self.log, store=self.store,
+                                  simulator=self.simulator)
 
     # Trading ----------------------------------------------------------------
     def _open_orders(self):
@@ -355,6 +383,15 @@ class TradingClient(MarketClientMixin):
     def _order_amount(self, order):
         return order.amount
 
+    def placed_amount(self, order) -> float:
+        """Amount of a market order just placed, 0 if it wasn't placed. Exchanges report fills later,
+        so it's the amount ordered, except on a simulator, which fills market orders when placed."""
+        if not order:
+            return 0.0
+        if self.simulator is not None:
+            return order.traded_amount
+        return self._order_amount(order)
+
     def get_open_orders_amount(self):
         orders = self.get_open_orders()
         amount = sum(self._order_amount(o) for o in orders)
@@ -369,6 +406,8 @@ class TradingClient(MarketClientMixin):
         self.log.debug('Canceling order')
         # Don't cancel if dry run
         if self.dry_run:
+            if self.simulator:
+                return self._simulated_cancel_order(order)
             self.log.warning(f'DRY RUN: Order cancelled')
             return
         # Iterate and cancel orders
@@ -388,6 +427,11 @@ class TradingClient(MarketClientMixin):
         cancelled_orders = []
         # Don't cancel if dry run
         if self.dry_run:
+            if self.simulator:
+                orders = orders or self.simulator.open_orders(self.market)
+                cancelled_orders = [self._simulated_cancel_order(order) for order in orders]
+                self.log.warning(f'DRY RUN: Simulated orders cancelled: {len(cancelled_orders)}')
+                return cancelled_orders
             self.log.warning(f'DRY RUN: Orders cancelled')
             return cancelled_orders
         # Iterate and cancel orders
@@ -398,6 +442,13 @@ class TradingClient(MarketClientMixin):
         self.log.info(f'Cancelled orders: {len(cancelled_orders)}')
         return cancelled_orders
 
+    def _simulated_cancel_order(self, order):
+        if order.id not in self.simulator.orders:
+            raise OrderNotFoundError(f'DRY RUN: Order not found on simulator: {order}')
+        cancelled_order = self.simulator.cancel_order(order.id)
+        self.log.warning(f'DRY RUN: Simulated order cancelled: {cancelled_order}')
+        return cancelled_order
+
     def _order_details(self, order_id: int):
         raise NotImplementedError
 
@@ -440,6 +491,10 @@ class TradingClient(MarketClientMixin):
             msg = self._order_details_msg(f'{order_msg} order placed: ', new_order)
             self.log.info(msg)
             return new_order
+        elif self.simulator:
+            new_order = self.simulator.place_order(self.market, side, o_type, amount, price)
+            self.log.warning(f'DRY RUN: {order_msg} order simulated: {new_order}')
+            return new_order
         else:
             msg = f'DRY RUN: {order_msg} order placed'
             self.log.warning(msg)
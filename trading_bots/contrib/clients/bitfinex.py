@@ -69,8 +69,8 @@ class BitfinexWallet(WalletClient, BitfinexAuth):
     }
 
     def __init__(self, currency: str, client=None, dry_run: bool=False, timeout: int=None, logger=None,
-                 wallet_type: str=DEFAULT_WALLET_TYPE):
-        super().__init__(currency, client, dry_run, timeout, logger)
+                 wallet_type: str=DEFAULT_WALLET_TYPE, store=None, **kwargs):
+        super().__init__(currency, client, dry_run, timeout, logger, store, **kwargs)
         self.wallet_type = wallet_type
 
     def _balance(self, currency, available_only=False):
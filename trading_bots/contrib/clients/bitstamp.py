@@ -1,3 +1,6 @@
+import time
+from operator import itemgetter
+
 from trading_api_wrappers import Bitstamp
 
 from trading_bots.utils import truncate
@@ -56,6 +59,26 @@ class BitstampMarket(MarketClient, BitstampPublic):
     def _order_book_entry_price(self, order):
         return float(order[0])
 
+    # Bitstamp returns every transaction of the last minute, hour or day
+    transactions_intervals = [(60, 'minute'), (60*60, 'hour'), (60*60*24, 'day')]
+
+    def _trades(self, since: float=None):
+        # Smallest interval covering since
+        elapsed = None if since is None else time.time() - since
+        time_interval = next(
+            (name for seconds, name in self.transactions_intervals if elapsed is not None and elapsed < seconds),
+            'day')
+        transactions = self.client.transactions(self.market_id, time_interval)
+        trades = [
+            dict(id=int(tx['tid']),
+                 timestamp=float(tx['date']),
+                 rate=float(tx['price']),
+                 amount=float(tx['amount']) * (1 if tx['type'] == '0' else -1))  # '0': buy, '1': sell
+            for tx in transactions
+            if since is None or float(tx['date']) >= since]
+        trades.sort(key=itemgetter('timestamp'))
+        return trades
+
 
 class BitstampWallet(WalletClient, BitstampAuth):
 
@@ -33,9 +33,10 @@ def paginated(data_attr: str):
 class BudaBase(BaseClient):
     name = 'Buda'
 
-    def __init__(self, client=None, dry_run: bool=False, timeout: int=None, logger=None, store=None, host: str=None):
+    def __init__(self, client=None, dry_run: bool=False, timeout: int=None, logger=None, store=None, host: str=None,
+                 **kwargs):
         self.host = host
-        super().__init__(client, dry_run, timeout, logger, store)
+        super().__init__(client, dry_run, timeout, logger, store, **kwargs)
 
 
 class BudaPublic(BudaBase):
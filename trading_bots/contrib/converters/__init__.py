@@ -1,5 +1,8 @@
 from .base import *
+from .transport import *
 from .bitcoin_average import *
 from .coinmarketcap import *
 from .currencylayer import *
 from .open_exchange_rates import *
+from .composite import *
+from .historical import *
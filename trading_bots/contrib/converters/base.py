@@ -1,12 +1,17 @@
 from decimal import Decimal
 
 from trading_bots.conf import settings
+from trading_bots.core.cache import Memoized
 from trading_bots.core.logging import get_logger
 
+from .transport import get_transport
+
 __all__ = [
     'ConverterRateError',
     'ConverterValidationError',
-    'Converter'
+    'RateTable',
+    'Converter',
+    'FiatRatesMixin',
 ]
 
 logger = get_logger(__name__)
@@ -25,14 +30,78 @@ class ConverterValidationError(Exception):
         super().__init__()
 
 
+class RateTable:
+    """Rates of a base currency to others, with cross rates between any two of them.
+    E.g. a USD table with CLP and ARS gives CLP/ARS as USD/ARS / USD/CLP."""
+
+    def __init__(self, base: str, rates: dict, one: Number=1.0):
+        self.base = base.upper()
+        self.one = one
+        self.rates = {currency.upper(): rate for currency, rate in rates.items()}
+        self.rates[self.base] = one
+
+    def __contains__(self, currency: str) -> bool:
+        return currency.upper() in self.rates
+
+    @property
+    def currencies(self) -> list:
+        return sorted(self.rates)
+
+    def rate(self, currency: str, to: str) -> Number:
+        """Rate of currency in to, raises KeyError if the table lacks either"""
+        currency, to = currency.upper(), to.upper()
+        if currency == to:
+            return self.one
+        if currency == self.base:
+            return self.rates[to]
+        return self.rates[to] / self.rates[currency]
+
+    def convert(self, amount: Number, currency: str, to: str) -> Number:
+        return amount * self.rate(currency, to)
+
+
 class Converter(object):
+    """Currency rates from an external source.
+
+    Rates are cached for rate_ttl seconds, in process and in the store (the configured one by
+    default, store=False keeps them in process only), so processes share them. Rates older than
+    rate_ttl are still served, up to max_staleness seconds old, while they are refreshed in the
+    background; a failed refresh keeps the last good rate. rate_ttl=0 disables the cache.
+
+    Sources returning many rates per request implement `_get_rates`, and set pivot if they
+    can quote every currency from it: batch conversions then derive cross rates from a single
+    table of pivot rates.
+
+    Requests go through a transport, the one shared by the converters of the process by
+    default, pooling connections, timing out, retrying and recording latencies.
+    """
     name = ''
     slug = ''
+    rate_ttl = 60
+    max_staleness = 300
+    pivot = None
 
-    def __init__(self, return_decimal: bool=False, **kwargs):
+    def __init__(self, return_decimal: bool=False, rate_ttl: float=None, max_staleness: float=None, store=None,
+                 transport=None, **kwargs):
         assert self.name, 'A converter must have a name!'
         self.credentials = settings.credentials.get(self.name)
         self.return_decimal = return_decimal
+        self.transport = transport or get_transport()
+        if rate_ttl is not None:
+            self.rate_ttl = rate_ttl
+        if max_staleness is not None:
+            self.max_staleness = max_staleness
+        self._rates = self._tables = None
+        if self.rate_ttl:
+            assert self.max_staleness >= self.rate_ttl, 'Max staleness must be at least the rate TTL!'
+            options = dict(ttl=self.rate_ttl, stale_ttl=self.max_staleness - self.rate_ttl, store=store,
+                           key=self._rate_key, logger=logger)
+            self._rates = Memoized(self._fetch_rate, **options)
+            self._tables = Memoized(self._fetch_rates, **options)
+
+    def _rate_key(self, base: str, quotes) -> tuple:
+        quotes = quotes.upper() if isinstance(quotes, str) else quotes
+        return self.slug, base.upper(), quotes, self.return_decimal
 
     def _format_number(self, value: (str, Number)) -> Number:
         if self.return_decimal:
@@ -43,6 +112,11 @@ class Converter(object):
     def _get_rate(self, currency: str, to: str) -> (str, Number):
         raise NotImplementedError
 
+    def _get_rates(self, currency: str, to: list) -> dict:
+        """Rates of currency to each of to, every rate of the source if to is None"""
+        assert to is not None, f'{self.name} can only get rates to given currencies!'
+        return {quote: self._get_rate(currency, quote) for quote in to}
+
     def get_rate_for(self, currency: str, to: str, reverse: bool=False) -> Number:
         """Get current market rate for currency"""
 
@@ -55,11 +129,30 @@ class Converter(object):
         if reverse:
             base, quote = to, currency
 
+        # Get rate from cache or source
+        rate = self._rates(base, quote) if self._rates else self._fetch_rate(base, quote)
+
+        # Return market rate
+        if reverse:
+            return self._format_number('1.0') / rate
+        return rate
+
+    def _fetch_rate(self, base: str, quote: str) -> Number:
+        """Validated rate from source, only valid rates get cached"""
         try:  # Get rate from source
             rate = self._get_rate(base, quote)
         except Exception as e:
             raise ConverterRateError(self.name) from e
+        return self._validate(rate)
 
+    def _fetch_rates(self, base: str, quotes: tuple) -> dict:
+        try:  # Get rates from source
+            rates = self._get_rates(base, None if quotes is None else list(quotes))
+        except Exception as e:
+            raise ConverterRateError(self.name) from e
+        return {quote.upper(): self._validate(rate) for quote, rate in rates.items()}
+
+    def _validate(self, rate: (str, Number)) -> Number:
         # Convert rate to number
         rate = self._format_number(rate)
 
@@ -68,15 +161,65 @@ class Converter(object):
             assert rate > 0
         except AssertionError as e:
             raise ConverterValidationError(self.name, rate) from e
-
-        # Return market rate
-        if reverse:
-            return self._format_number('1.0') / rate
         return rate
 
+    def get_rate_table(self, currency: str, to: list=None) -> RateTable:
+        """Rates of currency to the to currencies, or to every currency of the source if None,
+        with a single request to the source"""
+        quotes = None if to is None else tuple(sorted({quote.upper() for quote in to} - {currency.upper()}))
+        if quotes == ():
+            rates = {}
+        else:
+            rates = self._tables(currency, quotes) if self._tables else self._fetch_rates(currency, quotes)
+        return RateTable(currency, rates, self._format_number('1.0'))
+
+    def get_rates_for(self, currency: str, to: list, reverse: bool=False) -> dict:
+        """Get current market rates for currency to several currencies, by currency"""
+        table = self.get_rate_table(currency, to)
+        try:
+            return {quote: table.rate(quote, currency) if reverse else table.rate(currency, quote) for quote in to}
+        except KeyError as e:
+            raise ConverterRateError(self.name) from e
+
+    def _rate_tables(self, pairs: set) -> dict:
+        """Tables covering every (currency, to) pair, from the pivot table if any"""
+        if self.pivot is not None:
+            currencies = {currency for pair in pairs for currency in pair}
+            return dict.fromkeys(currencies, self.get_rate_table(self.pivot, currencies))
+        quotes = {}
+        for currency, to in pairs:
+            quotes.setdefault(currency, set()).add(to)
+        return {currency: self.get_rate_table(currency, to) for currency, to in quotes.items()}
+
     def convert(self, amount: Number, currency: str, to: str, reverse: bool=False) -> Number:
         """Convert amount to another currency"""
         rate = self.get_rate_for(currency, to, reverse)
         if self.return_decimal:
             amount = Decimal(amount)
         return amount * rate
+
+    def convert_many(self, conversions: list) -> list:
+        """Convert (amount, currency, to) tuples, fetching the rates they need at once"""
+        conversions = [(amount, currency.upper(), to.upper()) for amount, currency, to in conversions]
+        tables = self._rate_tables({(currency, to) for _, currency, to in conversions if currency != to})
+        converted = []
+        for amount, currency, to in conversions:
+            if self.return_decimal:
+                amount = Decimal(amount)
+            try:
+                rate = tables[currency].rate(currency, to) if currency != to else self._format_number('1.0')
+            except KeyError as e:
+                raise ConverterRateError(self.name) from e
+            converted.append(amount * rate)
+        return converted
+
+
+class FiatRatesMixin:
+    """Cache and pivot policy of fiat exchange rate sources.
+
+    FX rates barely move per minute, so they are cached longer than crypto rates. Free plans
+    of these sources only quote USD, to every currency, so other rates are crossed through USD.
+    """
+    rate_ttl = 300
+    max_staleness = 3600
+    pivot = 'USD'
@@ -1,5 +1,3 @@
-import requests
-
 from .base import Converter
 
 __all__ = [
@@ -16,6 +14,6 @@ class BitcoinAverage(Converter):
     def _get_rate(self, currency: str, to: str):
         symbol = (currency + to).upper()
         url = f'{self.base_url}/indices/{self.symbol_set}/ticker/{symbol}'
-        response = requests.get(url).json()
+        response = self.transport.get_json(url)
         rate = response['last']
         return rate
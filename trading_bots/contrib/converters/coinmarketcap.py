@@ -11,9 +11,10 @@ class CoinMarketCap(Converter):
     name = 'CoinMarketCap'
     slug = 'coinmarketcap'
 
-    def __init__(self, return_decimal: bool=False, timeout: int=None, retry: bool=None):
-        super().__init__(return_decimal)
-        self.client = wrappers.CoinMarketCap(timeout, retry)
+    def __init__(self, return_decimal: bool=False, timeout: int=None, retry: bool=None, **kwargs):
+        super().__init__(return_decimal, **kwargs)
+        client = wrappers.CoinMarketCap(timeout or self.transport.timeout, retry)
+        self.client = self.transport.mount(client)
 
     def _get_rate(self, currency: str, to: str):
         rate = self.client.price(currency, convert=to)
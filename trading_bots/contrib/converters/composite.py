@@ -0,0 +1,202 @@
+import statistics
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from trading_bots.core.logging import get_logger
+
+from .base import Converter, ConverterRateError, ConverterValidationError
+
+__all__ = [
+    'ProviderStats',
+    'CompositeConverter',
+]
+
+logger = get_logger(__name__)
+
+FIRST, MEDIAN, CONSENSUS = 'first', 'median', 'consensus'
+
+# Threads querying providers, shared by every composite converter of the process
+_executor = None
+_executor_lock = threading.Lock()
+MAX_WORKERS = 32
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(MAX_WORKERS, thread_name_prefix='Converter')
+        return _executor
+
+
+class ProviderStats:
+    """Moving averages of a provider's latency and error rate"""
+
+    def __init__(self, alpha: float=0.2):
+        self.alpha = alpha
+        self.latency = None
+        self.error_rate = 0.0
+        self.calls = 0
+        self.errors = 0
+        self.skipped = 0
+
+    def record(self, latency: float, error: bool):
+        self.calls += 1
+        self.errors += error
+        self.latency = latency if self.latency is None else self.latency + self.alpha * (latency - self.latency)
+        self.error_rate += self.alpha * (error - self.error_rate)
+
+    def score(self) -> float:
+        """Expected seconds to a valid rate, lower is better. Unknown providers go first."""
+        if self.latency is None:
+            return 0.0
+        return self.latency / max(1 - self.error_rate, 0.05)
+
+    def summary(self) -> dict:
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'skipped': self.skipped,
+            'latency_ms': None if self.latency is None else self.latency * 1000,
+            'error_rate': self.error_rate,
+        }
+
+
+class CompositeConverter(Converter):
+    """Rates from several converters, queried concurrently.
+
+    Strategies:
+    - first: the first valid rate, from the fanout best providers, failing over to the others.
+    - median: median of the valid rates received within timeout, from every healthy provider.
+    - consensus: median of the rates within max_deviation of the median, at least min_rates of them.
+
+    Providers are ranked by latency and error rate. Degraded ones, slower than slow_factor times
+    the best provider or failing over max_error_rate of calls, are skipped except every
+    probe_interval calls, and when the others fail or time out. Their rates are validated with the
+    providers' own rules, then the composite's. Use `stats` to see how providers are doing.
+    """
+    name = 'Composite'
+    slug = 'composite'
+    # Seconds a provider must also be slower than the best one by to be degraded, below it's noise
+    slow_margin = 0.02
+
+    def __init__(self, converters: list, strategy: str=FIRST, fanout: int=2, timeout: float=10.0,
+                 max_deviation: float=0.02, min_rates: int=2, slow_factor: float=3.0, max_error_rate: float=0.5,
+                 probe_interval: int=10, return_decimal: bool=False, **kwargs):
+        assert converters, 'Composite converter needs converters!'
+        assert strategy in (FIRST, MEDIAN, CONSENSUS), f'Unknown strategy: {strategy}!'
+        super().__init__(return_decimal, **kwargs)
+        self.converters = list(converters)
+        self.strategy = strategy
+        self.fanout = fanout
+        self.timeout = timeout
+        self.max_deviation = max_deviation
+        self.min_rates = min_rates if strategy == CONSENSUS else 1
+        self.slow_factor = slow_factor
+        self.max_error_rate = max_error_rate
+        self.probe_interval = probe_interval
+        self.stats = {converter.slug: ProviderStats() for converter in self.converters}
+        # Rates can only be pivoted if every provider shares the pivot
+        pivots = {converter.pivot for converter in self.converters}
+        self.pivot = pivots.pop() if len(pivots) == 1 else None
+        self._lock = threading.Lock()
+        self._queries = 0
+
+    # Provider selection -----------------------------------------------------
+    def _degraded(self, stats: ProviderStats, best: float) -> bool:
+        if stats.latency is None:
+            return False
+        score = stats.score()
+        slow = score > best * self.slow_factor and score - best > self.slow_margin
+        return stats.error_rate > self.max_error_rate or slow
+
+    def _providers(self) -> tuple:
+        """Providers to query now, best first, and the ones to fail over to"""
+        with self._lock:
+            self._queries += 1
+            probe = self.probe_interval and self._queries % self.probe_interval == 0
+            ranked = sorted(self.converters, key=lambda converter: self.stats[converter.slug].score())
+            best = self.stats[ranked[0].slug].score()
+            healthy = [c for c in ranked if not self._degraded(self.stats[c.slug], best)]
+            degraded = [c for c in ranked if c not in healthy]
+            queried = healthy[:self.fanout] if self.strategy == FIRST else healthy
+            if probe:
+                queried += degraded
+            else:
+                for converter in degraded:
+                    self.stats[converter.slug].skipped += 1
+        return queried, [converter for converter in ranked if converter not in queried]
+
+    # Queries ----------------------------------------------------------------
+    def _call(self, converter: Converter, method: str, *args):
+        started = time.perf_counter()
+        try:
+            result = getattr(converter, method)(*args)
+        except Exception:
+            self._record(converter, started, error=True)
+            raise
+        self._record(converter, started, error=False)
+        return result
+
+    def _record(self, converter: Converter, started: float, error: bool):
+        with self._lock:
+            self.stats[converter.slug].record(time.perf_counter() - started, error)
+
+    def _submit(self, converters: list, method: str, *args) -> dict:
+        executor = get_executor()
+        return {executor.submit(self._call, converter, method, *args): converter for converter in converters}
+
+    def _query(self, method: str, *args) -> list:
+        """Results of a converter method from the providers, as the strategy needs them"""
+        queried, failover = self._providers()
+        pending = self._submit(queried, method, *args)
+        deadline = time.time() + self.timeout
+        results = []
+        while pending:
+            done, _ = wait(pending, timeout=max(deadline - time.time(), 0), return_when=FIRST_COMPLETED)
+            if not done:
+                if not failover:
+                    break
+                # Timed out, the failover providers get another timeout, the slow ones can still answer
+                logger.warning(f'{self.name} timed out, failing over to {len(failover)} providers')
+                pending.update(self._submit(failover, method, *args))
+                failover = []
+                deadline = time.time() + self.timeout
+                continue
+            for future in done:
+                converter = pending.pop(future)
+                if future.exception() is None:
+                    results.append(future.result())
+                else:
+                    logger.warning(f'{converter.name} failed on {self.name}: {future.exception()!r}')
+            if self.strategy == FIRST and results:
+                # Slow providers finish in the background, still updating their stats
+                return results[:1]
+            if not pending and len(results) < self.min_rates and failover:
+                pending, failover = self._submit(failover, method, *args), []
+        if len(results) < self.min_rates:
+            raise ConverterRateError(self.name)
+        return results
+
+    # Aggregation ------------------------------------------------------------
+    def _aggregate(self, rates: list):
+        rates = [self._format_number(str(rate)) for rate in rates]
+        if self.strategy == FIRST:
+            return rates[0]
+        median = statistics.median(rates)
+        if self.strategy == CONSENSUS:
+            agreeing = [rate for rate in rates if abs(rate - median) <= median * self.max_deviation]
+            if len(agreeing) < self.min_rates:
+                raise ConverterValidationError(self.name, rates)
+            median = statistics.median(agreeing)
+        return median
+
+    # Providers' rates are validated already, failures aren't wrapped again
+    def _fetch_rate(self, base: str, quote: str):
+        return self._validate(self._aggregate(self._query('_fetch_rate', base, quote)))
+
+    def _fetch_rates(self, base: str, quotes: tuple) -> dict:
+        tables = self._query('_fetch_rates', base, quotes)
+        currencies = set(tables[0]).intersection(*tables[1:])
+        return {quote: self._validate(self._aggregate([table[quote] for table in tables])) for quote in currencies}
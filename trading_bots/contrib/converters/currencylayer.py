@@ -1,23 +1,30 @@
 import trading_api_wrappers as wrappers
 
-from .base import Converter
+from .base import Converter, FiatRatesMixin
 
 __all__ = [
     'CurrencyLayer'
 ]
 
 
-class CurrencyLayer(Converter):
+class CurrencyLayer(FiatRatesMixin, Converter):
     name = 'Currencylayer'
     slug = 'currencylayer'
 
-    def __init__(self, return_decimal: bool=False, timeout: int=None, retry: bool=None):
-        super().__init__(return_decimal)
+    def __init__(self, return_decimal: bool=False, timeout: int=None, retry: bool=None, **kwargs):
+        super().__init__(return_decimal, **kwargs)
         access_key = self.credentials['access_key']
-        self.client = wrappers.CurrencyLayer(access_key, timeout, retry)
+        client = wrappers.CurrencyLayer(access_key, timeout or self.transport.timeout, retry)
+        self.client = self.transport.mount(client)
 
     def _get_rate(self, currency: str, to: str):
         market = (currency + to).upper()
         response = self.client.live_rates(base=currency.lower(), currencies=[to.lower()])
         rate = response['quotes'][market]
         return rate
+
+    def _get_rates(self, currency: str, to: list) -> dict:
+        currencies = None if to is None else [quote.lower() for quote in to]
+        response = self.client.live_rates(base=currency.lower(), currencies=currencies)
+        # Quotes are keyed by market, e.g. USDCLP
+        return {market[len(currency):]: rate for market, rate in response['quotes'].items()}
@@ -0,0 +1,177 @@
+import os
+import time
+
+from trading_bots.conf import settings
+
+from .base import Converter, ConverterRateError, Number
+
+try:
+    import numpy as np
+except ImportError:
+    pass
+
+__all__ = [
+    'RateHistory',
+    'HistoricalConverter',
+]
+
+
+class RateHistory:
+    """Historical rates of currency pairs, in a directory of append-only files.
+
+    Each pair has a file of timestamps and one of rates, as contiguous float64 arrays, so
+    the rate at a point in time is a binary search over the memory mapped timestamps.
+    Pairs are mapped on their first lookup and never loaded whole. A pair missing from the
+    history is looked up inverted, e.g. CLP/USD as 1 / USD/CLP.
+    """
+
+    def __init__(self, directory: str=None):
+        self.directory = directory or os.path.join(settings.history['directory'], 'rates')
+        os.makedirs(self.directory, exist_ok=True)
+        self._pairs = {}  # (base, quote): (timestamps, rates, inverted), None if missing
+
+    def _filenames(self, base: str, quote: str) -> tuple:
+        path = os.path.join(self.directory, f'{base.upper()}-{quote.upper()}')
+        return f'{path}.timestamps', f'{path}.rates'
+
+    def _count(self, base: str, quote: str) -> int:
+        try:
+            # A partial record left by an interrupted append is ignored
+            return min(os.path.getsize(filename) // 8 for filename in self._filenames(base, quote))
+        except FileNotFoundError:
+            return 0
+
+    def _map(self, base: str, quote: str):
+        count = self._count(base, quote)
+        if not count:
+            return None
+        # Plain array views of the maps, searching them is cheaper than searching np.memmap
+        return tuple(np.asarray(np.memmap(filename, dtype='<f8', mode='r', shape=(count,)))
+                     for filename in self._filenames(base, quote))
+
+    def pair(self, base: str, quote: str) -> tuple:
+        """Timestamps and rates of base in quote, and whether they are of quote in base.
+        Raises KeyError if neither pair is in the history."""
+        key = (base.upper(), quote.upper())
+        try:
+            arrays = self._pairs[key]
+        except KeyError:
+            arrays = self._map(*key)
+            if arrays is not None:
+                arrays += (False,)
+            else:
+                arrays = self._map(key[1], key[0])
+                if arrays is not None:
+                    arrays += (True,)
+            self._pairs[key] = arrays
+        if arrays is None:
+            raise KeyError(f'{base}/{quote} not in rate history!')
+        return arrays
+
+    def pairs(self) -> list:
+        return sorted(tuple(filename[:-len('.rates')].split('-'))
+                      for filename in os.listdir(self.directory) if filename.endswith('.rates'))
+
+    def append(self, base: str, quote: str, timestamps, rates) -> int:
+        """Append rates of base in quote. Rates older than the last stored one are dropped."""
+        timestamps, rates = np.asarray(timestamps, dtype='<f8'), np.asarray(rates, dtype='<f8')
+        assert timestamps.shape == rates.shape, 'Timestamps and rates must have the same length!'
+        assert (rates > 0).all(), 'Rates must be positive!'
+        order = np.argsort(timestamps, kind='stable')
+        timestamps, rates = timestamps[order], rates[order]
+        count = self._count(base, quote)
+        if count:
+            with open(self._filenames(base, quote)[0], 'rb') as f:
+                f.seek((count - 1) * 8)
+                last = np.frombuffer(f.read(8), dtype='<f8')[0]
+            newer = timestamps >= last
+            timestamps, rates = timestamps[newer], rates[newer]
+        if not len(timestamps):
+            return 0
+        for filename, values in zip(self._filenames(base, quote), (timestamps, rates)):
+            with open(filename, 'ab') as f:
+                f.truncate(count * 8)
+                f.write(values.tobytes())
+        # Remap both ways on the next lookup
+        self._pairs.pop((base.upper(), quote.upper()), None)
+        self._pairs.pop((quote.upper(), base.upper()), None)
+        return len(timestamps)
+
+    def rate_at(self, base: str, quote: str, at: float, max_age: float=None) -> float:
+        """Rate of base in quote at timestamp at, the last one stored before it. Raises KeyError
+        if there's none, or it's older than max_age seconds."""
+        timestamps, rates, inverted = self.pair(base, quote)
+        index = timestamps.searchsorted(at, side='right') - 1
+        if index < 0 or (max_age is not None and at - timestamps[index] > max_age):
+            raise KeyError(f'No {base}/{quote} rate at {at}!')
+        rate = float(rates[index])
+        return 1 / rate if inverted else rate
+
+    def rates_at(self, base: str, quote: str, at, max_age: float=None):
+        """Rates of base in quote at each timestamp of the array at, NaN where there's none"""
+        timestamps, rates, inverted = self.pair(base, quote)
+        at = np.asarray(at, dtype='<f8')
+        indexes = timestamps.searchsorted(at, side='right') - 1
+        found = indexes >= 0
+        if max_age is not None:
+            found &= at - timestamps[indexes] <= max_age
+        result = np.where(found, rates[indexes], np.nan)
+        return 1 / result if inverted else result
+
+    def clear(self):
+        self._pairs = {}
+        for base, quote in self.pairs():
+            for filename in self._filenames(base, quote):
+                os.remove(filename)
+
+
+class HistoricalConverter(Converter):
+    """Rates from a rate history, at a point in time.
+
+    Rates are the ones at `at`, or at time.time() if not given, which is the simulated time
+    inside a Backtest, so bots converting prices get the rates of the time being simulated.
+    Rates older than max_age seconds are missing. Lookups are cheap enough not to be cached;
+    use `rates_at` and `convert_at` to look up arrays of timestamps at once.
+    """
+    name = 'Historical'
+    slug = 'historical'
+    rate_ttl = 0
+
+    def __init__(self, history: RateHistory=None, max_age: float=None, return_decimal: bool=False, **kwargs):
+        super().__init__(return_decimal, **kwargs)
+        self.history = history or RateHistory()
+        self.max_age = max_age
+
+    def _rate_at(self, base: str, quote: str, at: float) -> Number:
+        try:
+            rate = self.history.rate_at(base, quote, time.time() if at is None else at, self.max_age)
+        except KeyError as e:
+            raise ConverterRateError(self.name) from e
+        return self._format_number(str(rate)) if self.return_decimal else rate
+
+    def _get_rate(self, currency: str, to: str):
+        return self._rate_at(currency, to, None)
+
+    def get_rate_for(self, currency: str, to: str, reverse: bool=False, at: float=None) -> Number:
+        """Rate of currency in to at timestamp at, now by default"""
+        if currency.upper() == to.upper():
+            return self._format_number('1.0')
+        if reverse:
+            return self._format_number('1.0') / self._rate_at(to, currency, at)
+        return self._rate_at(currency, to, at)
+
+    def convert(self, amount: Number, currency: str, to: str, reverse: bool=False, at: float=None) -> Number:
+        rate = self.get_rate_for(currency, to, reverse, at)
+        if self.return_decimal:
+            amount = self._format_number(amount)
+        return amount * rate
+
+    def rates_at(self, currency: str, to: str, at):
+        """Float rates of currency in to at each timestamp of the array at, NaN where there's none"""
+        if currency.upper() == to.upper():
+            return np.ones(np.shape(at))
+        return self.history.rates_at(currency, to, at, self.max_age)
+
+    def convert_at(self, amounts, currency: str, to: str, at):
+        """Convert an array of amounts at an array of timestamps"""
+        return np.asarray(amounts, dtype='<f8') * self.rates_at(currency, to, at)
@@ -1,22 +1,28 @@
 import trading_api_wrappers as wrappers
 
-from .base import Converter
+from .base import Converter, FiatRatesMixin
 
 __all__ = [
     'OpenExchangeRates'
 ]
 
 
-class OpenExchangeRates(Converter):
+class OpenExchangeRates(FiatRatesMixin, Converter):
     name = 'OpenExchangeRates'
     slug = 'open-exchange-rates'
 
-    def __init__(self, return_decimal: bool=False, timeout: int=None, retry: bool=None):
-        super().__init__(return_decimal)
+    def __init__(self, return_decimal: bool=False, timeout: int=None, retry: bool=None, **kwargs):
+        super().__init__(return_decimal, **kwargs)
         app_id = self.credentials['app_id']
-        self.client = wrappers.OXR(app_id, timeout, retry)
+        client = wrappers.OXR(app_id, timeout or self.transport.timeout, retry)
+        self.client = self.transport.mount(client)
 
     def _get_rate(self, currency: str, to: str):
         response = self.client.latest(base=currency.lower(), symbols=[to.lower()])
         rate = response['rates'][to.upper()]
         return rate
+
+    def _get_rates(self, currency: str, to: list) -> dict:
+        symbols = None if to is None else [quote.lower() for quote in to]
+        response = self.client.latest(base=currency.lower(), symbols=symbols)
+        return response['rates']
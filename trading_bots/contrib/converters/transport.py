@@ -0,0 +1,175 @@
+import json
+import os
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from trading_bots.conf import settings
+from trading_bots.core.metrics import StoreMetrics
+
+__all__ = [
+    'Cassette',
+    'Transport',
+    'get_transport',
+]
+
+
+class Cassette:
+    """Recorded HTTP responses, by method and URL, to replay converters offline.
+
+    In 'record' mode requests go out and their responses are saved to path on `save`,
+    in 'replay' mode responses come from path and unrecorded requests raise ConnectionError,
+    in 'once' mode recorded requests are replayed and the others recorded.
+    Query parameters named in redact, like API keys, are left out of the recording.
+    """
+    redact = ('app_id', 'access_key', 'api_key', 'key')
+
+    def __init__(self, path: str, mode: str='replay'):
+        assert mode in ('record', 'replay', 'once'), f'Unknown cassette mode: {mode}!'
+        self.path = path
+        self.mode = mode
+        self.responses = {}
+        self._lock = threading.Lock()
+        if mode != 'record' and os.path.exists(path):
+            with open(path) as f:
+                self.responses = json.load(f)
+
+    def key(self, request: requests.PreparedRequest) -> str:
+        scheme, netloc, path, query, _ = urlsplit(request.url)
+        query = urlencode([(name, value) for name, value in parse_qsl(query) if name not in self.redact])
+        return f'{request.method} {urlunsplit((scheme, netloc, path, query, ""))}'
+
+    def play(self, request: requests.PreparedRequest) -> requests.Response:
+        """Recorded response of request, None if it should go out"""
+        recorded = self.responses.get(self.key(request))
+        if recorded is None:
+            if self.mode == 'replay':
+                raise requests.ConnectionError(f'{self.key(request)} not recorded in {self.path}!', request=request)
+            return None
+        response = requests.Response()
+        response.status_code = recorded['status']
+        response.headers.update(recorded['headers'])
+        response._content = recorded['content'].encode('utf-8', 'surrogateescape')
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        return response
+
+    def record(self, request: requests.PreparedRequest, response: requests.Response):
+        if self.mode == 'replay':
+            return
+        with self._lock:
+            self.responses[self.key(request)] = {
+                'status': response.status_code,
+                'headers': {'Content-Type': response.headers.get('Content-Type', '')},
+                'content': response.content.decode('utf-8', 'surrogateescape'),
+            }
+
+    def save(self):
+        with self._lock:
+            with open(self.path, 'w') as f:
+                json.dump(self.responses, f, indent=2, sort_keys=True)
+
+
+class TransportAdapter(HTTPAdapter):
+    """Pooled adapter of a transport, timing and recording every request it sends"""
+
+    def __init__(self, transport: 'Transport', **kwargs):
+        self.transport = transport
+        super().__init__(**kwargs)
+
+    def send(self, request, stream=False, timeout=None, **kwargs):
+        cassette = self.transport.cassette
+        if cassette is not None:
+            response = cassette.play(request)
+            if response is not None:
+                self.transport.record(request, 0.0, response, len(response.content))
+                return response
+        started = time.perf_counter()
+        try:
+            response = super().send(request, stream=stream, timeout=timeout or self.transport.timeout, **kwargs)
+            if not stream:
+                # Time the whole response, not just its headers
+                response.content
+        except Exception:
+            self.transport.record(request, time.perf_counter() - started)
+            raise
+        nbytes = 0 if stream else len(response.content)
+        self.transport.record(request, time.perf_counter() - started, response, nbytes)
+        if cassette is not None and not stream:
+            cassette.record(request, response)
+        return response
+
+    def close(self):
+        # Shared by sessions, closing one of them mustn't drop the pool
+        pass
+
+
+class Transport:
+    """HTTP transport shared by converters.
+
+    Requests go through one pool of keep-alive connections per host, so converters don't open
+    a connection, and do a TLS handshake, per request. Requests time out after timeout seconds
+    (settings.timeout by default, unless the request sets one), and idempotent ones are retried
+    with exponential backoff on connection errors and 429 and 5xx responses. Latencies are
+    recorded by method and host in `metrics`.
+    A cassette records responses, or replays them without network access.
+
+    `mount` routes the requests of a trading_api_wrappers client through the transport.
+    """
+    retry_statuses = (429, 500, 502, 503, 504)
+
+    def __init__(self, timeout: float=None, retries: int=3, backoff_factor: float=0.5, pool_size: int=10,
+                 cassette: Cassette=None):
+        self.timeout = settings.timeout if timeout is None else timeout
+        self.cassette = cassette
+        self.metrics = StoreMetrics('http', separator='/')
+        self._lock = threading.Lock()
+        retry = Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=self.retry_statuses,
+                      raise_on_status=False)
+        self.adapter = TransportAdapter(self, pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = self.mount(requests.Session())
+
+    def mount(self, client):
+        """Route the requests of a requests session, or of a client with one, through the transport"""
+        session = getattr(client, 'session', client)
+        session.mount('https://', self.adapter)
+        session.mount('http://', self.adapter)
+        return client
+
+    def record(self, request: requests.PreparedRequest, seconds: float, response: requests.Response=None,
+               nbytes: int=0):
+        url = urlsplit(request.url)
+        error = response is None or response.status_code >= 400
+        with self._lock:
+            self.metrics.record(request.method, f'{url.netloc}{url.path}', seconds, nbytes=nbytes, error=error)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        return self.session.request(method, url, **kwargs)
+
+    def get_json(self, url: str, params: dict=None, **kwargs):
+        """Decoded JSON response of a GET request, raises HTTPError on error statuses"""
+        response = self.request('GET', url, params=params, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    def close(self):
+        HTTPAdapter.close(self.adapter)
+        self.session.close()
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> Transport:
+    """Transport shared by the converters of this process"""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = Transport()
+        return _transport
@@ -0,0 +1,170 @@
+from collections import deque
+from heapq import merge
+from logging import Logger
+from operator import itemgetter
+
+from trading_bots.contrib.clients import MarketClient
+from trading_bots.core.logging import get_logger
+
+__all__ = [
+    'TradeIngestion',
+]
+
+by_timestamp = itemgetter('timestamp')
+
+
+class TradeIngestion:
+    """Poll a market client's public trades and publish each trade once, in timestamp order.
+
+    Trades are deduplicated by exchange id against a bounded window of the latest ids, so
+    polls can overlap the last trades without republishing them. Full pages (page_size trades)
+    are followed by fetching forward from their last trade. A full page starting after the
+    cursor, or skipping sequential ids, means trades are missing: the gap is backfilled by
+    paging forward from the cursor, and recorded in `gaps` if it can't be filled. Consumers
+    are called with every list of new trades, in timestamp order.
+    """
+
+    def __init__(self, client: MarketClient, window: int=10000, overlap: float=1.0, page_size: int=None,
+                 sequential_ids: bool=False, max_pages: int=10, logger: Logger=None):
+        assert window > 0, 'Window must be positive!'
+        self.client = client
+        self.window = window
+        self.overlap = overlap
+        self.page_size = page_size
+        self.sequential_ids = sequential_ids
+        self.max_pages = max_pages
+        self.log = logger or get_logger(__name__)
+        self.consumers = []
+        self.gaps = []
+        self.late_trades = 0
+        self.reset()
+
+    def reset(self, since: float=None):
+        """Start over from a timestamp, or from whatever the client returns"""
+        self.last_timestamp = since
+        self.last_id = None
+        self._ids = deque()
+        self._seen = set()
+
+    def subscribe(self, consumer):
+        self.consumers.append(consumer)
+        return consumer
+
+    def unsubscribe(self, consumer):
+        self.consumers.remove(consumer)
+
+    # Dedup ------------------------------------------------------------------
+    def _remember(self, trade_id):
+        self._ids.append(trade_id)
+        self._seen.add(trade_id)
+        if len(self._ids) > self.window:
+            self._seen.discard(self._ids.popleft())
+
+    def _new(self, trades: list, exclude: set=(), end: float=None) -> list:
+        """Unseen trades not in exclude, before end if given, oldest first"""
+        new, batch = [], set()
+        for trade in trades:
+            trade_id = trade['id']
+            if trade_id in self._seen or trade_id in exclude or trade_id in batch:
+                continue
+            if end is not None and trade['timestamp'] >= end:
+                continue
+            batch.add(trade_id)
+            new.append(trade)
+        # Client results come sorted or nearly so, which makes this sort close to linear
+        new.sort(key=by_timestamp)
+        return new
+
+    # Polling ----------------------------------------------------------------
+    def _fetch(self, since: float=None) -> list:
+        return self.client.get_trades(since)
+
+    def _full(self, fetched: list) -> bool:
+        return bool(self.page_size) and len(fetched) >= self.page_size
+
+    def _gap_start(self, fetched: list, new: list):
+        """Start of the trades missing before the new ones, None when there is no gap"""
+        if self.last_timestamp is None or not new:
+            return None
+        if self._full(fetched) and fetched[0]['timestamp'] > self.last_timestamp:
+            return self.last_timestamp
+        if self.sequential_ids and self.last_id is not None and new[0]['id'] > self.last_id + 1:
+            return self.last_timestamp
+        return None
+
+    def _pages(self, fetched: list, new: list) -> list:
+        """Keep fetching forward while pages come full"""
+        ids = {t['id'] for t in new}
+        for _ in range(self.max_pages - 1):
+            if not new or not self._full(fetched):
+                break
+            fetched = self._fetch(new[-1]['timestamp'])
+            page = self._new(fetched, exclude=ids)
+            if not page:
+                break
+            ids.update(t['id'] for t in page)
+            new.extend(page)
+        return new
+
+    def poll(self) -> list:
+        """Fetch, dedup and publish new trades, returns them"""
+        since = None if self.last_timestamp is None else self.last_timestamp - self.overlap
+        fetched = self._fetch(since)
+        new = self._pages(fetched, self._new(fetched))
+        gap_start = self._gap_start(fetched, new)
+        if gap_start is not None:
+            new = list(merge(self.backfill(gap_start, new[0]['timestamp']), new, key=by_timestamp))
+        return self.publish(new)
+
+    def backfill(self, start: float, end: float) -> list:
+        """Page forward from start for the unseen trades before end"""
+        self.log.warning(f'Trades gap on {self.client.name} {self.client.market}, backfilling since {start}')
+        trades, ids, since = [], set(), start
+        missing = None
+        for page_number in range(self.max_pages):
+            fetched = self._fetch(since)
+            if page_number == 0 and self._full(fetched) and fetched[0]['timestamp'] > start:
+                # The exchange doesn't go back far enough
+                missing = (start, fetched[0]['timestamp'])
+            page = self._new(fetched, exclude=ids, end=end)
+            if not page:
+                break
+            trades.extend(page)
+            ids.update(t['id'] for t in page)
+            since = page[-1]['timestamp']
+            if not self._full(fetched):
+                break
+        else:
+            missing = (since, end)
+        if missing:
+            self.gaps.append(missing)
+            self.log.warning(f'Trades gap on {self.client.name} {self.client.market} not filled: {missing}')
+        trades.sort(key=by_timestamp)
+        return trades
+
+    def publish(self, trades: list) -> list:
+        """Remember and send trades to consumers. Trades older than the last published one are dropped."""
+        if self.last_timestamp is not None:
+            in_order = [t for t in trades if t['timestamp'] >= self.last_timestamp]
+            self.late_trades += len(trades) - len(in_order)
+            trades = in_order
+        if not trades:
+            return trades
+        for trade in trades:
+            self._remember(trade['id'])
+        self.last_timestamp = trades[-1]['timestamp']
+        self.last_id = max(t['id'] for t in trades) if self.sequential_ids else trades[-1]['id']
+        for consumer in self.consumers:
+            consumer(trades)
+        return trades
+
+    # Checkpoints ------------------------------------------------------------
+    def get_state(self) -> dict:
+        """JSON serializable cursor and latest ids"""
+        return {'last_timestamp': self.last_timestamp, 'last_id': self.last_id, 'ids': list(self._ids)}
+
+    def set_state(self, state: dict):
+        self.reset(state['last_timestamp'])
+        self.last_id = state['last_id']
+        for trade_id in state['ids'][-self.window:]:
+            self._remember(trade_id)
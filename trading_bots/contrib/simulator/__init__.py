@@ -0,0 +1,4 @@
+from .clients import *
+from .engine import *
+from .feeds import *
+from .fees import *
@@ -0,0 +1,119 @@
+from trading_bots.contrib.clients.base import *
+from .engine import SimulatedExchange
+
+__all__ = [
+    'SimulatedBase',
+    'SimulatedMarket',
+    'SimulatedWallet',
+    'SimulatedTrading',
+    'simulated_clients',
+]
+
+
+class SimulatedBase(BaseClient):
+    name = 'Simulated'
+
+    def __init__(self, client=None, dry_run: bool=False, timeout: int=None, logger=None, store=None, **kwargs):
+        super().__init__(client, dry_run, timeout, logger, store, **kwargs)
+        # Simulated clients execute against their own exchange, dry run or not
+        self.simulator = self.client
+
+    def _client(self):
+        return self.simulator or SimulatedExchange()
+
+
+class SimulatedMarket(MarketClient, SimulatedBase):
+    depth = None
+
+    def _ticker(self):
+        return self.client.ticker(self.market)
+
+    def _order_book(self, side: Side=None):
+        order_book = self.client.order_book(self.market, self.depth)
+        if side:
+            return order_book.bids if side == Side.BUY else order_book.asks
+        return order_book
+
+    def _order_book_entry_amount(self, order):
+        return order[1]
+
+    def _order_book_entry_price(self, order):
+        return order[0]
+
+    def _trades(self, since: float=None):
+        return [
+            dict(id=t.id, timestamp=t.timestamp, rate=t.price, amount=t.amount * (-1 if t.side == Side.SELL else 1))
+            for t in self.client.trades(self.market, since)]
+
+
+class SimulatedWallet(WalletClient, SimulatedBase):
+
+    def _balance(self, currency: str, available_only: bool=False):
+        if available_only:
+            return self.client.available(currency)
+        return self.client.balance(currency)
+
+    def _deposits(self, currency: str):
+        return self.client.deposits(currency)
+
+    def _withdrawals(self, currency: str):
+        return self.client.withdrawals(currency)
+
+    def _withdraw(self, currency: str, amount: float, address: str, subtract_fee: bool=False):
+        return self.client.withdraw(currency, amount, address, fee=self.withdrawal_fee, subtract_fee=subtract_fee)
+
+
+class SimulatedTrading(TradingClient, SimulatedMarket):
+    wallet_client = SimulatedWallet
+
+    def _open_orders(self):
+        return self.client.open_orders(self.market)
+
+    def _order_amount(self, order):
+        return order.remaining
+
+    def _cancel_order(self, order):
+        return self.client.cancel_order(order.id)
+
+    def _order_details(self, order_id: int):
+        return self.client.order_details(order_id)
+
+    def _place_order(self, side: Side, o_type: OrderType, amount: float, price: float=None):
+        return self.client.place_order(self.market, side, o_type, amount, price)
+
+    def _open_positions(self):
+        return []
+
+    def _open_position(self, side: Side, p_type: OrderType, amount: float, price: float=None, leverage: float=None):
+        raise NotImplementedError('Margin positions are not simulated!')
+
+
+def simulated_clients(exchange: SimulatedExchange):
+    """Clients factory binding the market, wallet and trading clients of a bot to a simulated exchange.
+
+    Given as the clients of a bot, `bot.get_client(BudaTrading, market, ...)` returns a
+    SimulatedTrading on the same market instead, so bots can run unchanged over simulated markets.
+    Other clients are created as usual.
+    """
+    def create(client_cls, *args, **kwargs):
+        if issubclass(client_cls, SimulatedBase):
+            simulated_cls = client_cls
+        elif issubclass(client_cls, TradingClient):
+            simulated_cls = SimulatedTrading
+        elif issubclass(client_cls, MarketClient):
+            simulated_cls = SimulatedMarket
+        elif issubclass(client_cls, WalletClient):
+            simulated_cls = SimulatedWallet
+        else:
+            return client_cls(*args, **kwargs)
+        # Client and dry run are the second and third positional arguments of market and wallet clients,
+        # orders on a simulated exchange are never real so dry run is turned off
+        args, kwargs = list(args), dict(kwargs)
+        for i, (key, value) in enumerate([('client', exchange), ('dry_run', False)], start=1):
+            if len(args) > i:
+                args[i] = value
+            else:
+                kwargs[key] = value
+        return simulated_cls(*args, **kwargs)
+
+    return create
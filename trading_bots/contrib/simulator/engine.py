@@ -0,0 +1,417 @@
+import heapq
+import time
+from collections import deque, namedtuple
+from enum import Enum
+from itertools import count
+
+from trading_bots.contrib.clients.base import Market, OrderBook, OrderNotFoundError, OrderType, Side
+from .fees import FeeModel, NoFee
+
+__all__ = [
+    'OrderState',
+    'SimulatedOrder',
+    'Fill',
+    'Trade',
+    'Withdrawal',
+    'Deposit',
+    'InsufficientFundsError',
+    'OrderNotFoundError',
+    'MatchingEngine',
+    'SimulatedExchange',
+]
+
+# Amounts below this value are considered fully traded
+EPSILON = 1e-12
+
+Fill = namedtuple('fill', 'order_id market side price amount fee maker timestamp')
+Trade = namedtuple('trade', 'id timestamp price amount side')
+Withdrawal = namedtuple('withdrawal', 'id currency amount fee address state timestamp')
+Deposit = namedtuple('deposit', 'id currency amount state timestamp')
+
+
+class InsufficientFundsError(Exception):
+    pass
+
+
+class OrderState(Enum):
+    PENDING = 'pending'
+    TRADED = 'traded'
+    CANCELED = 'canceled'
+
+
+class SimulatedOrder:
+    """An order resting on or matched by the simulated exchange"""
+
+    __slots__ = ('id', 'market', 'side', 'type', 'price', 'amount', 'remaining', 'traded_amount',
+                 'total_exchanged', 'paid_fee', 'state', 'created_at', 'owned')
+
+    def __init__(self, id: int, market: str, side: Side, o_type: OrderType, amount: float, price: float=None,
+                 created_at: float=None, owned: bool=True):
+        self.id = id
+        self.market = market
+        self.side = side
+        self.type = o_type
+        self.price = price
+        self.amount = amount
+        self.remaining = amount
+        self.traded_amount = 0.0
+        self.total_exchanged = 0.0
+        self.paid_fee = 0.0
+        self.state = OrderState.PENDING
+        self.created_at = created_at
+        # Owned orders belong to the simulated account, the rest are book liquidity
+        self.owned = owned
+
+    @property
+    def is_open(self):
+        return self.state == OrderState.PENDING
+
+    @property
+    def average_price(self):
+        if not self.traded_amount:
+            return None
+        return self.total_exchanged / self.traded_amount
+
+    def __repr__(self):
+        price = f'{self.price:,f}' if self.price is not None else 'market'
+        return (f'<Order {self.id} {self.market} {self.side.value} {self.type.value} | '
+                f'Amount: {self.amount:,f} | Price: {price} | Traded: {self.traded_amount:,f} | '
+                f'State: {self.state.value}>')
+
+
+class MatchingEngine:
+    """Price-time priority limit order book for a single market.
+
+    Price levels are FIFO queues indexed by price, with a heap of prices per side
+    to find the best level. Cancelled orders are removed lazily when they reach
+    the front of their level.
+    """
+
+    def __init__(self, market: str):
+        self.market = market
+        pair = Market(market)
+        self.base, self.quote = pair.base, pair.quote
+        self.bids = {}
+        self.asks = {}
+        self._bid_prices = []  # Negated prices, max-heap
+        self._ask_prices = []
+
+    def _best(self, levels: dict, prices: list, sign: int):
+        while prices:
+            price = prices[0] * sign
+            level = levels.get(price)
+            if level is not None:
+                while level and level[0].remaining <= EPSILON:
+                    level.popleft()
+                if level:
+                    return price, level
+                del levels[price]
+            heapq.heappop(prices)
+        return None, None
+
+    def best_bid(self):
+        return self._best(self.bids, self._bid_prices, -1)[0]
+
+    def best_ask(self):
+        return self._best(self.asks, self._ask_prices, 1)[0]
+
+    def rest(self, order: SimulatedOrder):
+        """Add an order to the book without matching"""
+        if order.side == Side.BUY:
+            levels, prices, key = self.bids, self._bid_prices, -order.price
+        else:
+            levels, prices, key = self.asks, self._ask_prices, order.price
+        level = levels.get(order.price)
+        if level is None:
+            level = levels[order.price] = deque()
+            heapq.heappush(prices, key)
+        level.append(order)
+
+    def match(self, order: SimulatedOrder, on_fill):
+        """Match an incoming order against the opposite side of the book.
+        Calls on_fill(maker, price, amount) for every execution, which returns the amount actually filled."""
+        if order.side == Side.BUY:
+            levels, prices, sign = self.asks, self._ask_prices, 1
+        else:
+            levels, prices, sign = self.bids, self._bid_prices, -1
+        limit = order.price if order.type == OrderType.LIMIT else None
+        while order.remaining > EPSILON:
+            price, level = self._best(levels, prices, sign)
+            if price is None:
+                break
+            if limit is not None and (price - limit) * sign > 0:
+                break
+            maker = level[0]
+            amount = min(order.remaining, maker.remaining)
+            amount = on_fill(maker, price, amount)
+            if amount <= EPSILON:
+                break
+            if maker.remaining <= EPSILON:
+                level.popleft()
+
+    def levels(self, side: Side, depth: int=None):
+        """Aggregated (price, amount) levels of one side, best first"""
+        if side == Side.BUY:
+            levels, select = self.bids, heapq.nlargest
+        else:
+            levels, select = self.asks, heapq.nsmallest
+        prices = [p for p, level in levels.items() if level]
+        prices = select(depth, prices) if depth else sorted(prices, reverse=side == Side.BUY)
+        book = []
+        for price in prices:
+            amount = sum(o.remaining for o in levels[price])
+            if amount > EPSILON:
+                book.append([price, amount])
+        return book
+
+    def clear(self, include_owned: bool=False):
+        """Drop all liquidity orders, keeping owned orders unless asked otherwise"""
+        for levels, prices in ((self.bids, self._bid_prices), (self.asks, self._ask_prices)):
+            for price, level in list(levels.items()):
+                kept = deque(o for o in level if o.owned and not include_owned and o.remaining > EPSILON)
+                if kept:
+                    levels[price] = kept
+                else:
+                    del levels[price]
+            prices[:] = [p for p in prices if abs(p) in levels]
+            heapq.heapify(prices)
+
+
+class SimulatedExchange:
+    """In-memory exchange with price-time priority matching, balance accounting and fees.
+
+    Liquidity comes from recorded or synthetic order books (load_order_book) and from
+    trades replayed through process_trade. Orders placed through place_order belong to
+    the simulated account and move its balances when filled.
+    """
+
+    name = 'Simulated'
+
+    def __init__(self, balances: dict=None, fee_model: FeeModel=None, clock=None):
+        self.fee_model = fee_model or NoFee()
+        self.clock = clock or time.time
+        self.engines = {}
+        self.orders = {}
+        self._open = {}
+        self.fills = []
+        self._trades = {}
+        self._totals = {}
+        self._locked = {}
+        self._deposits = []
+        self._withdrawals = []
+        self._ids = count(1)
+        for currency, amount in (balances or {}).items():
+            self.deposit(currency, amount)
+
+    @staticmethod
+    def _market_code(market):
+        return str(market).upper()
+
+    def engine(self, market) -> MatchingEngine:
+        code = self._market_code(market)
+        engine = self.engines.get(code)
+        if engine is None:
+            engine = self.engines[code] = MatchingEngine(code)
+        return engine
+
+    # Balances ---------------------------------------------------------------
+    def balance(self, currency: str) -> float:
+        return self._totals.get(currency.upper(), 0.0)
+
+    def balances(self) -> dict:
+        return dict(self._totals)
+
+    def available(self, currency: str) -> float:
+        currency = currency.upper()
+        return self._totals.get(currency, 0.0) - self._locked.get(currency, 0.0)
+
+    def _credit(self, currency: str, amount: float):
+        self._totals[currency] = self._totals.get(currency, 0.0) + amount
+
+    def _lock(self, currency: str, amount: float):
+        if self.available(currency) + EPSILON < amount:
+            raise InsufficientFundsError(f'Not enough {currency} available: {self.available(currency)} < {amount}')
+        self._locked[currency] = self._locked.get(currency, 0.0) + amount
+
+    def _unlock(self, currency: str, amount: float):
+        self._locked[currency] = max(self._locked.get(currency, 0.0) - amount, 0.0)
+
+    def deposit(self, currency: str, amount: float) -> Deposit:
+        currency = currency.upper()
+        self._credit(currency, amount)
+        deposit = Deposit(next(self._ids), currency, amount, 'confirmed', self.clock())
+        self._deposits.append(deposit)
+        return deposit
+
+    def deposits(self, currency: str) -> list:
+        return [d for d in self._deposits if d.currency == currency.upper()]
+
+    def withdraw(self, currency: str, amount: float, address: str, fee: float=0,
+                 subtract_fee: bool=False) -> Withdrawal:
+        currency = currency.upper()
+        total = amount if subtract_fee else amount + fee
+        if self.available(currency) + EPSILON < total:
+            raise InsufficientFundsError(f'Not enough {currency} available: {self.available(currency)} < {total}')
+        self._credit(currency, -total)
+        net = total - fee
+        withdrawal = Withdrawal(next(self._ids), currency, net, fee, address, 'confirmed', self.clock())
+        self._withdrawals.append(withdrawal)
+        return withdrawal
+
+    def withdrawals(self, currency: str) -> list:
+        return [w for w in self._withdrawals if w.currency == currency.upper()]
+
+    # Market data ------------------------------------------------------------
+    def load_order_book(self, market, order_book: OrderBook):
+        """Replace the book liquidity with (price, amount) levels, filling crossed owned orders"""
+        code = self._market_code(market)
+        engine = self.engine(code)
+        engine.clear()
+        now = self.clock()
+        for side, entries in ((Side.SELL, order_book.asks), (Side.BUY, order_book.bids)):
+            for price, amount in entries:
+                price, amount = float(price), float(amount)
+                order = SimulatedOrder(next(self._ids), code, side, OrderType.LIMIT, amount, price, now, owned=False)
+                self._submit(engine, order)
+
+    def process_trade(self, market, price: float, amount: float, side: Side=None):
+        """Replay a public trade, which takes resting orders at or better than its price"""
+        code = self._market_code(market)
+        engine = self.engine(code)
+        now = self.clock()
+        if side is None:
+            # Unknown aggressor: the trade crosses whichever side it reaches
+            best_bid = engine.best_bid()
+            side = Side.SELL if best_bid is not None and price <= best_bid else Side.BUY
+        order = SimulatedOrder(next(self._ids), code, side, OrderType.LIMIT, amount, price, now, owned=False)
+        engine.match(order, self._fill_handler(order))
+        self._trades.setdefault(code, []).append(Trade(order.id, now, price, amount, side))
+
+    def trades(self, market, since: float=None) -> list:
+        trades = self._trades.get(self._market_code(market), [])
+        if since is None:
+            return list(trades)
+        return [t for t in trades if t.timestamp >= since]
+
+    def order_book(self, market, depth: int=None) -> OrderBook:
+        engine = self.engine(market)
+        return OrderBook(bids=engine.levels(Side.BUY, depth), asks=engine.levels(Side.SELL, depth))
+
+    def ticker(self, market) -> dict:
+        engine = self.engine(market)
+        trades = self._trades.get(engine.market)
+        last = trades[-1].price if trades else None
+        return dict(bid=engine.best_bid(), ask=engine.best_ask(), last=last, timestamp=self.clock())
+
+    # Trading ----------------------------------------------------------------
+    def place_order(self, market, side: Side, o_type: OrderType, amount: float, price: float=None) -> SimulatedOrder:
+        code = self._market_code(market)
+        if o_type == OrderType.LIMIT:
+            assert price is not None and price > 0, 'A limit order must have a price!'
+        assert amount > 0, 'Order amount must be positive!'
+        engine = self.engine(code)
+        order = SimulatedOrder(next(self._ids), code, side, o_type, amount, price, self.clock())
+        # Reserve funds for limit orders up front
+        if o_type == OrderType.LIMIT:
+            base, quote = self._currencies(code)
+            if side == Side.BUY:
+                self._lock(quote, amount * price)
+            else:
+                self._lock(base, amount)
+        elif side == Side.SELL:
+            base, _ = self._currencies(code)
+            if self.available(base) + EPSILON < amount:
+                raise InsufficientFundsError(f'Not enough {base} available: {self.available(base)} < {amount}')
+        self.orders[order.id] = order
+        self._submit(engine, order)
+        if order.state == OrderState.PENDING:
+            self._open[order.id] = order
+        return order
+
+    def cancel_order(self, order_id: int) -> SimulatedOrder:
+        order = self.order_details(order_id)
+        if order.state != OrderState.PENDING:
+            return order
+        if order.type == OrderType.LIMIT:
+            self._release(order)
+        order.remaining = 0.0
+        order.state = OrderState.CANCELED
+        self._open.pop(order.id, None)
+        return order
+
+    def order_details(self, order_id: int) -> SimulatedOrder:
+        try:
+            return self.orders[order_id]
+        except KeyError:
+            raise OrderNotFoundError(f'Order {order_id} not found!')
+
+    def open_orders(self, market=None) -> list:
+        code = self._market_code(market) if market is not None else None
+        return [o for o in self._open.values() if code is None or o.market == code]
+
+    # Internals --------------------------------------------------------------
+    def _currencies(self, code: str):
+        engine = self.engine(code)
+        return engine.base, engine.quote
+
+    def _submit(self, engine: MatchingEngine, order: SimulatedOrder):
+        engine.match(order, self._fill_handler(order))
+        if order.remaining <= EPSILON:
+            order.remaining = 0.0
+            order.state = OrderState.TRADED
+        elif order.type == OrderType.LIMIT:
+            engine.rest(order)
+        else:
+            # Market orders never rest, the unfilled amount is dropped
+            order.remaining = 0.0
+            order.state = OrderState.TRADED if order.traded_amount else OrderState.CANCELED
+
+    def _release(self, order: SimulatedOrder):
+        base, quote = self._currencies(order.market)
+        if order.side == Side.BUY:
+            self._unlock(quote, order.remaining * order.price)
+        else:
+            self._unlock(base, order.remaining)
+
+    def _fill_handler(self, taker: SimulatedOrder):
+        def on_fill(maker: SimulatedOrder, price: float, amount: float):
+            if taker.owned and taker.type == OrderType.MARKET and taker.side == Side.BUY:
+                # Market buys are bounded by the available quote balance
+                _, quote = self._currencies(taker.market)
+                affordable = self.available(quote) / price
+                if affordable < amount:
+                    amount = affordable
+                if amount <= EPSILON:
+                    return 0.0
+            self._execute(maker, price, amount, maker=True)
+            self._execute(taker, price, amount, maker=False)
+            return amount
+        return on_fill
+
+    def _execute(self, order: SimulatedOrder, price: float, amount: float, maker: bool):
+        order.remaining -= amount
+        order.traded_amount += amount
+        order.total_exchanged += amount * price
+        if order.remaining <= EPSILON:
+            order.remaining = 0.0
+            order.state = OrderState.TRADED
+        if not order.owned:
+            return
+        if order.state == OrderState.TRADED:
+            self._open.pop(order.id, None)
+        base, quote = self._currencies(order.market)
+        fee_rate = self.fee_model.rate(maker)
+        if order.side == Side.BUY:
+            if order.type == OrderType.LIMIT:
+                self._unlock(quote, amount * order.price)
+            fee = amount * fee_rate
+            self._credit(quote, -amount * price)
+            self._credit(base, amount - fee)
+        else:
+            if order.type == OrderType.LIMIT:
+                self._unlock(base, amount)
+            fee = amount * price * fee_rate
+            self._credit(base, -amount)
+            self._credit(quote, amount * price - fee)
+        order.paid_fee += fee
+        self.fills.append(Fill(order.id, order.market, order.side, price, amount, fee, maker, self.clock()))
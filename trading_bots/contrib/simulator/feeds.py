@@ -0,0 +1,48 @@
+import random
+
+from trading_bots.contrib.clients.base import OrderBook
+
+__all__ = [
+    'synthetic_order_book',
+    'random_walk',
+    'synthetic_books',
+    'recorded_books',
+]
+
+
+def synthetic_order_book(mid: float, spread: float=0.001, depth: int=10, step: float=0.0005,
+                         amount: float=1.0) -> OrderBook:
+    """Build a symmetric order book around a mid price.
+    Levels are separated by a relative step, and amounts grow linearly with depth."""
+    half_spread = mid * spread / 2
+    bids = [[mid - half_spread - mid * step * i, amount * (i + 1)] for i in range(depth)]
+    asks = [[mid + half_spread + mid * step * i, amount * (i + 1)] for i in range(depth)]
+    return OrderBook(bids=bids, asks=asks)
+
+
+def random_walk(start: float, volatility: float=0.001, steps: int=None, seed: int=None):
+    """Generate prices following a geometric random walk"""
+    rnd = random.Random(seed)
+    price = start
+    n = 0
+    while steps is None or n < steps:
+        yield price
+        price *= 1 + rnd.gauss(0, volatility)
+        n += 1
+
+
+def synthetic_books(start: float, start_time: float, interval: float=60, steps: int=None,
+                    volatility: float=0.001, seed: int=None, **book_kwargs):
+    """Generate (timestamp, OrderBook) snapshots around a random walk mid price"""
+    for i, mid in enumerate(random_walk(start, volatility, steps, seed)):
+        yield start_time + i * interval, synthetic_order_book(mid, **book_kwargs)
+
+
+def recorded_books(snapshots):
+    """Normalize recorded (timestamp, bids, asks) snapshots into (timestamp, OrderBook) pairs.
+    Entries may be [price, amount] pairs of strings or numbers, as returned by the exchange APIs."""
+    for timestamp, bids, asks in snapshots:
+        yield float(timestamp), OrderBook(
+            bids=[[float(p), float(a)] for p, a, *_ in bids],
+            asks=[[float(p), float(a)] for p, a, *_ in asks],
+        )
@@ -0,0 +1,49 @@
+__all__ = [
+    'FeeModel',
+    'NoFee',
+    'FlatFee',
+    'MakerTakerFee',
+]
+
+
+class FeeModel:
+    """Fee rate charged on the received side of a fill"""
+
+    def rate(self, maker: bool) -> float:
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}()'
+
+
+class NoFee(FeeModel):
+
+    def rate(self, maker: bool) -> float:
+        return 0.0
+
+
+class FlatFee(FeeModel):
+
+    def __init__(self, fee: float):
+        assert 0 <= fee < 1, 'Fee must be a rate between 0 and 1!'
+        self.fee = fee
+
+    def rate(self, maker: bool) -> float:
+        return self.fee
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.fee})'
+
+
+class MakerTakerFee(FeeModel):
+
+    def __init__(self, maker: float, taker: float):
+        assert 0 <= maker < 1 and 0 <= taker < 1, 'Fees must be rates between 0 and 1!'
+        self.maker = maker
+        self.taker = taker
+
+    def rate(self, maker: bool) -> float:
+        return self.maker if maker else self.taker
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(maker={self.maker}, taker={self.taker})'
@@ -0,0 +1,608 @@
+import asyncio
+import functools
+import json as j
+import threading
+import time
+import weakref
+from concurrent.futures import Executor, ThreadPoolExecutor
+from logging import Logger
+
+from .metrics import StoreMetrics
+from .serializers import serializers
+from .storage import BaseStore, NamespacedStore, Pipeline, Store, get_store
+
+try:
+    # redis-py 4.2+, on Python 3.7+
+    from redis import asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+__all__ = [
+    'AsyncStore',
+    'AsyncPipeline',
+    'AsyncNamespacedStore',
+    'AsyncRedisStore',
+    'ThreadedStore',
+    'WorkerStore',
+    'get_async_store',
+    'store_executor',
+]
+
+# Native async stores by event loop and settings profile, their clients are bound to the loop
+_async_stores = weakref.WeakKeyDictionary()
+# Worker threads of sync stores
+_executors = weakref.WeakKeyDictionary()
+_executors_lock = threading.Lock()
+
+
+def store_executor(store: Store) -> Executor:
+    """Single worker thread running the operations of a sync store off an event loop.
+
+    The operations of a shared sync store from async code, `ThreadedStore` and the bots of
+    async loops (`WorkerStore`), run on its worker, so the file stores are only used by a thread at a time.
+    """
+    with _executors_lock:
+        executor = _executors.get(store)
+        if executor is None:
+            executor = _executors[store] = ThreadPoolExecutor(1, thread_name_prefix=f'{store.name}Store')
+        return executor
+
+
+def get_async_store(logger: Logger=None, store_settings: dict=None) -> 'AsyncStore':
+    """Async store for the storage settings: native on Redis, shared by the callers on the same event loop,
+    the shared store on its worker thread otherwise"""
+    if store_settings is None:
+        from trading_bots.conf import settings
+        store_settings = settings.storage
+    if store_settings.get('name', 'json') != 'redis':
+        return ThreadedStore(get_store(logger, store_settings))
+    stores = _async_stores.setdefault(asyncio.get_event_loop(), {})
+    profile = j.dumps(store_settings, sort_keys=True, default=str)
+    store = stores.get(profile)
+    if store is None:
+        store = stores[profile] = AsyncRedisStore(logger=logger, **AsyncRedisStore.configure(store_settings))
+        if 'slow_threshold' in store_settings:
+            store.slow_threshold = store_settings['slow_threshold']
+    return store
+
+
+class AsyncStore(BaseStore):
+    """The `Store` methods as coroutines, for bots running on an event loop.
+
+    Values are serialized, cast and measured the same way as on `Store`, so the same names
+    can be read and written by sync and async bots. Backends implement the async hooks
+    (`_get`, `_set`, ...), expiry must be native.
+    """
+    serializers = serializers
+    binary = True
+    BASE64_PREFIX = Store.BASE64_PREFIX
+    slow_threshold = Store.slow_threshold
+    _metrics = None
+
+    # Same values and metrics as the sync stores
+    _serialize = Store._serialize
+    _deserialize = Store._deserialize
+    _size = staticmethod(Store._size)
+    _record = Store._record
+    _metric_name = Store._metric_name
+
+    @property
+    def metrics(self) -> StoreMetrics:
+        if self._metrics is None:
+            self._metrics = StoreMetrics(self.name)
+        return self._metrics
+
+    # GET --------------------------------------------------------------------
+    async def __get(self, method, *path, cast=None, serializer=None, **kwargs):
+        path_str = ' '.join(path)
+        self.log.debug(f'Get {path_str} from {self.name}')
+        started = time.perf_counter()
+        try:
+            value = await method(*path, **kwargs)
+            result = self._deserialize(value, cast, serializer)
+        except KeyError:
+            self._record(method.__name__[1:], path, started, misses=1)
+            self.log.warning(f'{path_str} not found on {self.name}')
+            return None
+        except Exception:
+            self._record(method.__name__[1:], path, started, error=True)
+            self.log.exception(f'Failed to get {path_str} from {self.name}')
+            raise
+        self._record(method.__name__[1:], path, started, self._size(value), hits=1)
+        return result
+
+    async def _get(self, name: str, **kwargs):
+        raise NotImplementedError
+
+    async def get(self, name: str, cast=None, serializer=None, **kwargs):
+        return await self.__get(self._get, name, cast=cast, serializer=serializer, **kwargs)
+
+    async def _hget(self, name: str, key: str, **kwargs):
+        raise NotImplementedError
+
+    async def hget(self, name: str, key: str, cast=None, serializer=None, **kwargs):
+        return await self.__get(self._hget, name, key, cast=cast, serializer=serializer, **kwargs)
+
+    # SET --------------------------------------------------------------------
+    async def __set(self, method, *path, value, serializer=None, ttl: float=None, **kwargs):
+        path_str = ' '.join(path)
+        self.log.debug(f'Set {path_str} on {self.name}')
+        started = time.perf_counter()
+        try:
+            value = self._serialize(value, serializer)
+            await method(*path, value=value, **kwargs)
+            if ttl is not None:
+                await self._expire(path[0], ttl)
+        except Exception:
+            self._record(method.__name__[1:], path, started, error=True)
+            self.log.exception(f'Failed to set {path_str} on {self.name}')
+            raise
+        self._record(method.__name__[1:], path, started, self._size(value))
+
+    async def _set(self, name: str, value, **kwargs):
+        raise NotImplementedError
+
+    async def set(self, name: str, value, serializer=None, ttl: float=None, **kwargs):
+        """Set a value, that expires after ttl seconds if given"""
+        return await self.__set(self._set, name, value=value, serializer=serializer, ttl=ttl, **kwargs)
+
+    async def _hset(self, name: str, key: str, value, **kwargs):
+        raise NotImplementedError
+
+    async def hset(self, name: str, key: str, value, serializer=None, ttl: float=None, **kwargs):
+        """Set a hash key, the whole hash expires after ttl seconds if given"""
+        return await self.__set(self._hset, name, key, value=value, serializer=serializer, ttl=ttl, **kwargs)
+
+    # DELETE -----------------------------------------------------------------
+    async def __delete(self, method, *path, **kwargs):
+        path_str = ' '.join(path)
+        self.log.debug(f'Delete {path_str} from {self.name}')
+        started = time.perf_counter()
+        try:
+            await method(*path, **kwargs)
+        except KeyError:
+            self._record(method.__name__[1:], path, started, misses=1)
+            self.log.warning(f'{path_str} not found on {self.name}')
+        except Exception:
+            self._record(method.__name__[1:], path, started, error=True)
+            self.log.exception(f'Failed to delete {path_str} from {self.name}')
+            raise
+        else:
+            self._record(method.__name__[1:], path, started, hits=1)
+
+    async def _delete(self, name: str, **kwargs):
+        raise NotImplementedError
+
+    async def delete(self, name: str, **kwargs):
+        return await self.__delete(self._delete, name, **kwargs)
+
+    async def _hdel(self, name: str, key: str, **kwargs):
+        raise NotImplementedError
+
+    async def hdel(self, name: str, key: str, **kwargs):
+        return await self.__delete(self._hdel, name, key, **kwargs)
+
+    # BATCH ------------------------------------------------------------------
+    async def __batch(self, description: str, name: str, method, *args, **kwargs):
+        self.log.debug(f'{description} on {self.name}')
+        started = time.perf_counter()
+        try:
+            result = await method(*args, **kwargs)
+        except Exception:
+            self._record(method.__name__[1:], (name,), started, error=True, description=description)
+            self.log.exception(f'Failed to {description.lower()} on {self.name}')
+            raise
+        values = result.values() if isinstance(result, dict) else result if isinstance(result, list) else []
+        nbytes = sum(map(self._size, values)) + sum(sum(map(self._size, arg.values()))
+                                                    for arg in args if isinstance(arg, dict))
+        hits = misses = 0
+        if method.__name__ in ('_mget', '_hmget'):
+            misses = result.count(None)
+            hits = len(result) - misses
+        self._record(method.__name__[1:], (name,), started, nbytes, hits, misses, description=description)
+        return result
+
+    async def _mget(self, names: list, **kwargs) -> list:
+        values = []
+        for name in names:
+            try:
+                values.append(await self._get(name, **kwargs))
+            except KeyError:
+                values.append(None)
+        return values
+
+    async def mget(self, names: list, cast=None, serializer=None, **kwargs) -> list:
+        """Values of several names, None for the missing ones"""
+        names = list(names)
+        values = await self.__batch(f'Get {len(names)} names', next(iter(names), ''), self._mget, names, **kwargs)
+        return [None if value is None else self._deserialize(value, cast, serializer) for value in values]
+
+    async def _mset(self, mapping: dict, **kwargs):
+        for name, value in mapping.items():
+            await self._set(name, value=value, **kwargs)
+
+    async def mset(self, mapping: dict, serializer=None, ttl: float=None, **kwargs):
+        mapping = {name: self._serialize(value, serializer) for name, value in mapping.items()}
+        await self.__batch(f'Set {len(mapping)} names', next(iter(mapping), ''), self._mset, mapping, **kwargs)
+        if ttl is not None:
+            for name in mapping:
+                await self._expire(name, ttl)
+
+    async def _hmget(self, name: str, keys: list, **kwargs) -> list:
+        values = []
+        for key in keys:
+            try:
+                values.append(await self._hget(name, key, **kwargs))
+            except KeyError:
+                values.append(None)
+        return values
+
+    async def hmget(self, name: str, keys: list, cast=None, serializer=None, **kwargs) -> list:
+        """Values of several keys of a hash, None for the missing ones"""
+        values = await self.__batch(f'Get {len(keys)} keys of {name}', name, self._hmget, name, list(keys), **kwargs)
+        return [None if value is None else self._deserialize(value, cast, serializer) for value in values]
+
+    async def _hmset(self, name: str, mapping: dict, **kwargs):
+        for key, value in mapping.items():
+            await self._hset(name, key, value=value, **kwargs)
+
+    async def hmset(self, name: str, mapping: dict, serializer=None, ttl: float=None, **kwargs):
+        mapping = {key: self._serialize(value, serializer) for key, value in mapping.items()}
+        await self.__batch(f'Set {len(mapping)} keys of {name}', name, self._hmset, name, mapping, **kwargs)
+        if ttl is not None:
+            await self._expire(name, ttl)
+
+    async def _hgetall(self, name: str, **kwargs) -> dict:
+        raise NotImplementedError
+
+    async def hgetall(self, name: str, cast=None, serializer=None, **kwargs) -> dict:
+        """Every key of a hash, empty if there is none"""
+        values = await self.__batch(f'Get all keys of {name}', name, self._hgetall, name, **kwargs)
+        return {key: self._deserialize(value, cast, serializer) for key, value in values.items()}
+
+    async def _scan(self, prefix: str, **kwargs) -> list:
+        raise NotImplementedError
+
+    async def scan(self, prefix: str='', **kwargs) -> list:
+        """Sorted names starting with prefix"""
+        return sorted(await self.__batch(f'Scan {prefix}*', prefix, self._scan, prefix, **kwargs))
+
+    # PIPELINE ---------------------------------------------------------------
+    def pipeline(self) -> 'AsyncPipeline':
+        """Writes buffered and applied together, see `AsyncPipeline`"""
+        return AsyncPipeline(self)
+
+    async def _execute(self, operations: list):
+        raise NotImplementedError
+
+    async def execute(self, operations: list):
+        name = operations[0][1] if operations else ''
+        return await self.__batch(f'Execute {len(operations)} operations', name, self._execute, operations)
+
+    # EXPIRY -----------------------------------------------------------------
+    async def _expire(self, name: str, ttl: float):
+        raise NotImplementedError
+
+    async def _ttl(self, name: str):
+        raise NotImplementedError
+
+    async def expire(self, name: str, ttl: float):
+        """Expire name after ttl seconds"""
+        self.log.debug(f'Expire {name} in {ttl} seconds on {self.name}')
+        await self._expire(name, ttl)
+
+    async def ttl(self, name: str):
+        """Seconds until name expires, None if it doesn't"""
+        return await self._ttl(name)
+
+    # NAMESPACE --------------------------------------------------------------
+    def namespace(self, prefix: str) -> 'AsyncStore':
+        """View of this store with every name prefixed"""
+        return AsyncNamespacedStore(self, prefix)
+
+    # FLUSH ------------------------------------------------------------------
+    async def flush(self):
+        """Write pending changes, for stores that buffer them"""
+        pass
+
+    async def close(self):
+        """Write pending changes and release resources"""
+        await self.flush()
+
+
+class AsyncPipeline(Pipeline):
+    """`Pipeline` of an async store, used with `async with store.pipeline()`"""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            await self.execute()
+        else:
+            self.operations = []
+
+    async def execute(self):
+        operations, self.operations = self.operations, []
+        if operations:
+            await self.store.execute(operations)
+
+
+class AsyncNamespacedStore(AsyncStore):
+    """View of an async store with every name prefixed, see `NamespacedStore`"""
+
+    def __init__(self, store: AsyncStore, prefix: str):
+        self.name = store.name
+        super().__init__(store.log)
+        self.store = store
+        self.prefix = prefix
+        self.serializers = store.serializers
+        self.binary = store.binary
+        self.slow_threshold = store.slow_threshold
+
+    def _key(self, name: str) -> str:
+        return self.prefix + name
+
+    @property
+    def metrics(self) -> StoreMetrics:
+        return self.store.metrics
+
+    def _metric_name(self, name: str) -> str:
+        return self._key(name)
+
+    def namespace(self, prefix: str) -> 'AsyncNamespacedStore':
+        return AsyncNamespacedStore(self.store, self.prefix + prefix)
+
+    async def _get(self, name: str, **kwargs):
+        return await self.store._get(self._key(name), **kwargs)
+
+    async def _hget(self, name: str, key: str, **kwargs):
+        return await self.store._hget(self._key(name), key, **kwargs)
+
+    async def _set(self, name: str, value, **kwargs):
+        return await self.store._set(self._key(name), value=value, **kwargs)
+
+    async def _hset(self, name: str, key: str, value, **kwargs):
+        return await self.store._hset(self._key(name), key, value=value, **kwargs)
+
+    async def _delete(self, name: str, **kwargs):
+        return await self.store._delete(self._key(name), **kwargs)
+
+    async def _hdel(self, name: str, key: str, **kwargs):
+        return await self.store._hdel(self._key(name), key, **kwargs)
+
+    async def _mget(self, names: list, **kwargs) -> list:
+        return await self.store._mget([self._key(name) for name in names], **kwargs)
+
+    async def _mset(self, mapping: dict, **kwargs):
+        return await self.store._mset({self._key(name): value for name, value in mapping.items()}, **kwargs)
+
+    async def _hmget(self, name: str, keys: list, **kwargs) -> list:
+        return await self.store._hmget(self._key(name), keys, **kwargs)
+
+    async def _hmset(self, name: str, mapping: dict, **kwargs):
+        return await self.store._hmset(self._key(name), mapping, **kwargs)
+
+    async def _hgetall(self, name: str, **kwargs) -> dict:
+        return await self.store._hgetall(self._key(name), **kwargs)
+
+    async def _scan(self, prefix: str, **kwargs) -> list:
+        return [name[len(self.prefix):] for name in await self.store._scan(self._key(prefix), **kwargs)]
+
+    async def _execute(self, operations: list):
+        operations = [(op, self._key(name), key, value) for op, name, key, value in operations]
+        return await self.store._execute(operations)
+
+    async def _expire(self, name: str, ttl: float):
+        return await self.store._expire(self._key(name), ttl)
+
+    async def _ttl(self, name: str):
+        return await self.store._ttl(self._key(name))
+
+    async def flush(self):
+        return await self.store.flush()
+
+
+class AsyncRedisStore(AsyncStore):
+    """Redis store on redis-py's asyncio client, reads and writes the same values as `RedisStore`"""
+    name = 'Redis'
+
+    def __init__(self, url: str, logger: Logger=None):
+        assert aioredis is not None, 'Async Redis stores need redis-py 4.2+ on Python 3.7+!'
+        super().__init__(logger)
+        self.r = aioredis.StrictRedis.from_url(url)
+
+    @classmethod
+    def configure(cls, settings):
+        kwargs = super().configure(settings)
+        kwargs['url'] = settings.get('url')
+        return kwargs
+
+    async def _get(self, name: str, **kwargs):
+        value = await self.r.get(name)
+        if value is None:
+            raise KeyError
+        return value
+
+    async def _hget(self, name: str, key: str, **kwargs):
+        value = await self.r.hget(name, key)
+        if value is None:
+            raise KeyError
+        return value
+
+    async def _set(self, name: str, value, **kwargs):
+        return await self.r.set(name, value)
+
+    async def _hset(self, name, key, value, **kwargs):
+        return await self.r.hset(name, key, value)
+
+    async def _delete(self, name: str, **kwargs):
+        deleted = await self.r.delete(name)
+        if not deleted:
+            raise KeyError
+        return deleted
+
+    async def _hdel(self, name: str, key: str, **kwargs):
+        deleted = await self.r.hdel(name, key)
+        if not deleted:
+            raise KeyError
+        return deleted
+
+    async def close(self):
+        await self.r.connection_pool.disconnect()
+
+    async def _expire(self, name: str, ttl: float):
+        await self.r.pexpire(name, int(ttl * 1000))
+
+    async def _ttl(self, name: str):
+        ttl = await self.r.pttl(name)
+        return None if ttl is None or ttl < 0 else ttl / 1000
+
+    async def _mget(self, names: list, **kwargs) -> list:
+        return await self.r.mget(names) if names else []
+
+    async def _mset(self, mapping: dict, **kwargs):
+        if mapping:
+            await self.r.mset(mapping)
+
+    async def _hmget(self, name: str, keys: list, **kwargs) -> list:
+        return await self.r.hmget(name, keys) if keys else []
+
+    async def _hmset(self, name: str, mapping: dict, **kwargs):
+        if mapping:
+            await self.r.hset(name, mapping=mapping)
+
+    async def _hgetall(self, name: str, **kwargs) -> dict:
+        return {key.decode(): value for key, value in (await self.r.hgetall(name)).items()}
+
+    async def _scan(self, prefix: str, **kwargs) -> list:
+        pattern = ''.join(f'\\{c}' if c in '*?[]\\' else c for c in prefix) + '*'
+        return [name.decode() async for name in self.r.scan_iter(match=pattern, count=1000)]
+
+    async def _execute(self, operations: list):
+        """Operations in a MULTI/EXEC transaction, a single round trip"""
+        pipe = self.r.pipeline(transaction=True)
+        for op, name, key, value in operations:
+            if op == 'set':
+                pipe.set(name, value)
+            elif op == 'hset':
+                pipe.hset(name, key, value)
+            elif op == 'delete':
+                pipe.delete(name)
+            elif op == 'hdel':
+                pipe.hdel(name, key)
+            elif op == 'expire':
+                pipe.pexpire(name, int(value * 1000))
+        return await pipe.execute()
+
+
+class _OnWorker:
+    """Store whose methods run on its worker, other attributes are read as is"""
+
+    def __init__(self, store: Store):
+        self._store = store
+        self._executor = store_executor(store)
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._store, name)
+        if not callable(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        def run(*args, **kwargs):
+            return self._executor.submit(attribute, *args, **kwargs).result()
+        return run
+
+
+class WorkerStore(NamespacedStore):
+    """Sync view of a shared store running its operations on the store's worker (see `store_executor`).
+
+    For bots running on threads of their own alongside async code using the same store: the
+    bots run concurrently, only their store operations are serialized.
+    """
+
+    def __init__(self, store: Store, prefix: str=''):
+        if isinstance(store, NamespacedStore):
+            store, prefix = store.store, store.prefix + prefix
+        super().__init__(_OnWorker(store), prefix)
+
+
+class ThreadedStore(AsyncStore):
+    """Async adapter running the operations of a sync store on a worker thread, e.g. for the file stores.
+
+    The sync store does the serialization, expiry and metrics, so values and behavior are the
+    same as calling it directly. Operations run on the store's worker by default (see
+    `store_executor`), as the file stores aren't thread-safe: one at a time, in the order they
+    were awaited, and never alongside async bot loops using the same store.
+    """
+
+    def __init__(self, store: Store, executor: Executor=None):
+        self.name = store.name
+        super().__init__(store.log)
+        self.store = store
+        self.executor = executor or store_executor(store.store if isinstance(store, NamespacedStore) else store)
+        self.serializers = store.serializers
+        self.binary = store.binary
+
+    @property
+    def metrics(self) -> StoreMetrics:
+        return self.store.metrics
+
+    async def _run(self, method, *args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(method, *args, **kwargs))
+
+    async def get(self, name: str, cast=None, serializer=None, **kwargs):
+        return await self._run(self.store.get, name, cast=cast, serializer=serializer, **kwargs)
+
+    async def hget(self, name: str, key: str, cast=None, serializer=None, **kwargs):
+        return await self._run(self.store.hget, name, key, cast=cast, serializer=serializer, **kwargs)
+
+    async def set(self, name: str, value, serializer=None, ttl: float=None, **kwargs):
+        return await self._run(self.store.set, name, value, serializer=serializer, ttl=ttl, **kwargs)
+
+    async def hset(self, name: str, key: str, value, serializer=None, ttl: float=None, **kwargs):
+        return await self._run(self.store.hset, name, key, value, serializer=serializer, ttl=ttl, **kwargs)
+
+    async def delete(self, name: str, **kwargs):
+        return await self._run(self.store.delete, name, **kwargs)
+
+    async def hdel(self, name: str, key: str, **kwargs):
+        return await self._run(self.store.hdel, name, key, **kwargs)
+
+    async def mget(self, names: list, cast=None, serializer=None, **kwargs) -> list:
+        return await self._run(self.store.mget, names, cast=cast, serializer=serializer, **kwargs)
+
+    async def mset(self, mapping: dict, serializer=None, ttl: float=None, **kwargs):
+        return await self._run(self.store.mset, mapping, serializer=serializer, ttl=ttl, **kwargs)
+
+    async def hmget(self, name: str, keys: list, cast=None, serializer=None, **kwargs) -> list:
+        return await self._run(self.store.hmget, name, keys, cast=cast, serializer=serializer, **kwargs)
+
+    async def hmset(self, name: str, mapping: dict, serializer=None, ttl: float=None, **kwargs):
+        return await self._run(self.store.hmset, name, mapping, serializer=serializer, ttl=ttl, **kwargs)
+
+    async def hgetall(self, name: str, cast=None, serializer=None, **kwargs) -> dict:
+        return await self._run(self.store.hgetall, name, cast=cast, serializer=serializer, **kwargs)
+
+    async def scan(self, prefix: str='', **kwargs) -> list:
+        return await self._run(self.store.scan, prefix, **kwargs)
+
+    async def execute(self, operations: list):
+        return await self._run(self.store.execute, operations)
+
+    async def expire(self, name: str, ttl: float):
+        return await self._run(self.store.expire, name, ttl)
+
+    async def ttl(self, name: str):
+        return await self._run(self.store.ttl, name)
+
+    def namespace(self, prefix: str) -> 'ThreadedStore':
+        return ThreadedStore(self.store.namespace(prefix), self.executor)
+
+    async def flush(self):
+        return await self._run(self.store.flush)
+
+    async def close(self):
+        """Flush the store, it may be shared so it and its worker stay open"""
+        await self.flush()
@@ -0,0 +1,214 @@
+import functools
+import hashlib
+import threading
+import time
+import types
+from collections import OrderedDict
+from concurrent.futures import Future
+from logging import Logger
+
+from .exceptions import LockError
+from .logging import get_logger
+
+__all__ = [
+    'Memoized',
+    'memoize',
+]
+
+
+class Memoized:
+    """Function with its results cached in process, then in a store.
+
+    Results are keyed by function name, version and arguments (by repr, unless a key function
+    is given). Methods are keyed by their instance's class, not the instance, so results are
+    shared by instances and across processes; give a key function to tell instances apart.
+    They are fresh for ttl seconds, then served stale for up to stale_ttl more seconds
+    while a background thread recomputes them. Calls for a missing or expired result wait for a
+    single computation: one per process, and one across processes holding the store lock.
+    The in-process cache keeps the maxsize latest results, the store keeps them for
+    ttl + stale_ttl seconds, so restarted processes find them too.
+    """
+
+    def __init__(self, function, ttl: float=60, stale_ttl: float=0, maxsize: int=128, version=1, store=None,
+                 serializer: str='pickle', key=None, lock_timeout: float=30, logger: Logger=None):
+        assert ttl > 0, 'TTL must be positive!'
+        self.function = function
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.maxsize = maxsize
+        self.version = version
+        self._store = store
+        self.serializer = serializer
+        self.key_function = key
+        self.lock_timeout = lock_timeout
+        self.log = logger or get_logger(__name__)
+        self.name = f'{function.__module__}.{function.__qualname__}'
+        self.method = False
+        self.cache = OrderedDict()  # key: (value, fresh_until, stale_until)
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+        self._flights = {}
+        functools.update_wrapper(self, function)
+
+    def __set_name__(self, owner, name):
+        self.method = True
+
+    def __get__(self, instance, owner):
+        # Bind like a function when decorating methods
+        return self if instance is None else types.MethodType(self, instance)
+
+    @property
+    def store(self):
+        """Store of results, the configured one by default, None if store=False"""
+        if self._store is None:
+            from .storage import get_store
+            self._store = get_store(self.log)
+        return self._store or None
+
+    def key(self, *args, **kwargs) -> str:
+        if self.key_function is not None:
+            arguments = repr(self.key_function(*args, **kwargs))
+        elif self.method:
+            # Instance reprs hold memory addresses, which would never hit again
+            arguments = repr((type(args[0]).__qualname__, args[1:], sorted(kwargs.items())))
+        else:
+            arguments = repr((args, sorted(kwargs.items())))
+        digest = hashlib.sha1(arguments.encode()).hexdigest()
+        return f'memoize:{self.name}:{self.version}:{digest}'
+
+    # Levels -----------------------------------------------------------------
+    def _get(self, key: str):
+        """Cached entry, from the process or the store, None if missing"""
+        with self._lock:
+            entry = self.cache.get(key)
+            if entry is not None:
+                self.cache.move_to_end(key)
+                return entry
+        store = self.store
+        if store is not None:
+            # Misses are expected, mget doesn't warn about them
+            entry = store.mget([key], serializer=self.serializer)[0]
+            if entry is not None:
+                entry = tuple(entry)
+                self._remember(key, entry)
+                return entry
+        return None
+
+    def _remember(self, key: str, entry: tuple):
+        with self._lock:
+            self.cache[key] = entry
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.maxsize:
+                self.cache.popitem(last=False)
+
+    def _put(self, key: str, value):
+        now = time.time()
+        entry = (value, now + self.ttl, now + self.ttl + self.stale_ttl)
+        self._remember(key, entry)
+        store = self.store
+        if store is not None:
+            store.set(key, entry, serializer=self.serializer, ttl=self.ttl + self.stale_ttl)
+
+    # Computation ------------------------------------------------------------
+    def _compute(self, key: str, args: tuple, kwargs: dict):
+        """Compute once per process: concurrent callers wait for the first one"""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Future()
+        if not leader:
+            return flight.result()
+        try:
+            value = self._compute_locked(key, args, kwargs)
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        else:
+            flight.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                del self._flights[key]
+
+    def _compute_locked(self, key: str, args: tuple, kwargs: dict):
+        """Compute holding the store lock, unless another process just did"""
+        store = self.store
+        if store is None:
+            value = self.function(*args, **kwargs)
+            self._put(key, value)
+            return value
+        try:
+            with store.lock(key, timeout=self.lock_timeout, blocking_timeout=self.lock_timeout):
+                entry = store.mget([key], serializer=self.serializer)[0]
+                if entry is not None and entry[1] > time.time():
+                    self._remember(key, tuple(entry))
+                    return entry[0]
+                value = self.function(*args, **kwargs)
+                self._put(key, value)
+                return value
+        except LockError:
+            self.log.warning(f'{self.name} lock not acquired, computing anyway')
+            value = self.function(*args, **kwargs)
+            self._put(key, value)
+            return value
+
+    def _revalidate(self, key: str, args: tuple, kwargs: dict):
+        with self._lock:
+            if key in self._flights:
+                return
+
+        def refresh():
+            try:
+                self._compute(key, args, kwargs)
+            except Exception:
+                self.log.exception(f'Failed to refresh {self.name}, serving the stale result')
+
+        threading.Thread(target=refresh, name=f'Refresh {self.name}', daemon=True).start()
+
+    def __call__(self, *args, **kwargs):
+        key = self.key(*args, **kwargs)
+        entry = self._get(key)
+        now = time.time()
+        if entry is not None:
+            value, fresh_until, stale_until = entry
+            if now < fresh_until:
+                self.hits += 1
+                return value
+            if now < stale_until:
+                self.hits += 1
+                self._revalidate(key, args, kwargs)
+                return value
+        self.misses += 1
+        return self._compute(key, args, kwargs)
+
+    # Invalidation -----------------------------------------------------------
+    def invalidate(self, *args, **kwargs):
+        """Drop the result of these arguments, in process and in the store"""
+        key = self.key(*args, **kwargs)
+        with self._lock:
+            self.cache.pop(key, None)
+        store = self.store
+        if store is not None:
+            store.delete(key)
+
+    def refresh(self, *args, **kwargs):
+        """Recompute and cache the result of these arguments"""
+        self.invalidate(*args, **kwargs)
+        return self(*args, **kwargs)
+
+    def clear(self):
+        """Drop the results cached in process"""
+        with self._lock:
+            self.cache.clear()
+
+
+def memoize(function=None, **options):
+    """Decorator caching results in process and in the configured store, see `Memoized`.
+
+    Used as `@memoize` or `@memoize(ttl=300, stale_ttl=60, version=2)`. Bump version when the
+    function's results change meaning, to ignore the ones already stored.
+    """
+    if function is None:
+        return lambda f: Memoized(f, **options)
+    return Memoized(function, **options)
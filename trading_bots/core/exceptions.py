@@ -11,3 +11,13 @@ class AppRegistryNotReady(Exception):
 class ImproperlyConfigured(Exception):
     """Trading-Bots is somehow improperly configured"""
     pass
+
+
+class LockError(Exception):
+    """A store lock couldn't be acquired in time"""
+    pass
+
+
+class ConflictError(Exception):
+    """A store value kept being changed by others during an update"""
+    pass
@@ -0,0 +1,123 @@
+import os
+
+try:
+    import numpy as np
+except ImportError:
+    pass
+
+__all__ = [
+    'TRADE_FIELDS',
+    'TradeHistory',
+]
+
+# Fixed trade record: side is 1 on buys and -1 on sells, amount is always positive
+TRADE_FIELDS = [
+    ('timestamp', '<f8'),
+    ('rate', '<f8'),
+    ('amount', '<f8'),
+    ('side', 'i1'),
+]
+
+
+class TradeHistory:
+    """Append-only file of fixed size trade records, ordered by timestamp.
+
+    Reads memory map the file, so ranges are sliced by binary search on the timestamps
+    without loading or copying the records. Appending costs in proportion to the new trades.
+    Old trades are discarded by rewriting the file only once they are most of it.
+    """
+
+    def __init__(self, filename: str, compact_ratio: float=0.5):
+        assert 0 < compact_ratio <= 1, 'Compact ratio must be in (0, 1]!'
+        self.dtype = np.dtype(TRADE_FIELDS)
+        self.filename = filename
+        self.compact_ratio = compact_ratio
+        self._records = None
+        self._count = None
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _file_count(self) -> int:
+        try:
+            return os.path.getsize(self.filename) // self.dtype.itemsize
+        except FileNotFoundError:
+            return 0
+
+    @property
+    def records(self):
+        """Memory mapped records, remapped only when the file changed"""
+        count = self._file_count()
+        if count != self._count:
+            self._count = count
+            if count:
+                self._records = np.memmap(self.filename, dtype=self.dtype, mode='r', shape=(count,))
+            else:
+                self._records = np.empty(0, dtype=self.dtype)
+        return self._records
+
+    def __len__(self):
+        return len(self.records)
+
+    def first_timestamp(self):
+        records = self.records
+        return float(records['timestamp'][0]) if len(records) else None
+
+    def last_timestamp(self):
+        records = self.records
+        return float(records['timestamp'][-1]) if len(records) else None
+
+    def to_records(self, trades: list):
+        """Records from trade dicts with timestamp, rate and signed amount (negative on sells)"""
+        records = np.empty(len(trades), dtype=self.dtype)
+        for i, trade in enumerate(trades):
+            amount = trade['amount']
+            records[i] = trade['timestamp'], trade['rate'], abs(amount), -1 if amount < 0 else 1
+        return records
+
+    def append(self, trades) -> int:
+        """Append trade dicts or records. Trades older than the last stored one are dropped."""
+        records = trades if isinstance(trades, np.ndarray) else self.to_records(trades)
+        if not len(records):
+            return 0
+        records = records[np.argsort(records['timestamp'], kind='stable')]
+        last = self.last_timestamp()
+        if last is not None:
+            records = records[records['timestamp'] >= last]
+        if not len(records):
+            return 0
+        size = len(self.records) * self.dtype.itemsize
+        with open(self.filename, 'ab') as f:
+            # Drop a partial record left by an interrupted append before writing
+            if f.tell() != size:
+                f.truncate(size)
+            f.write(records.astype(self.dtype).tobytes())
+        return len(records)
+
+    def range(self, start: float=None, end: float=None):
+        """Records with start <= timestamp <= end, as a view of the file"""
+        records = self.records
+        timestamps = records['timestamp']
+        lo = 0 if start is None else np.searchsorted(timestamps, start, side='left')
+        hi = len(records) if end is None else np.searchsorted(timestamps, end, side='right')
+        return records[lo:hi]
+
+    def discard_before(self, timestamp: float):
+        """Drop trades older than timestamp, once they are compact_ratio of the file"""
+        records = self.records
+        index = int(np.searchsorted(records['timestamp'], timestamp, side='left'))
+        if not index or index < len(records) * self.compact_ratio:
+            return 0
+        tmp_filename = self.filename + '.tmp'
+        with open(tmp_filename, 'wb') as f:
+            f.write(records[index:].tobytes())
+        self._records, self._count = None, None
+        os.replace(tmp_filename, self.filename)
+        return index
+
+    def clear(self):
+        self._records, self._count = None, None
+        try:
+            os.remove(self.filename)
+        except FileNotFoundError:
+            pass
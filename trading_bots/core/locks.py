@@ -0,0 +1,145 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+from urllib.parse import quote
+
+from .exceptions import LockError
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+__all__ = [
+    'StoreLock',
+    'LocalLock',
+    'FileLock',
+    'RedisLock',
+]
+
+
+class StoreLock:
+    """Advisory lock of a store name, used as `with store.lock(name):`.
+
+    Locks are only respected by code taking them. timeout is the lease of the lock: after it,
+    a lock left by a hung or dead holder is released, where the backend allows it. Acquiring
+    waits up to blocking_timeout seconds, forever if None, and raises `LockError` on the
+    `with` statement if it can't. Locks aren't reentrant.
+    """
+    # Polling interval bounds while waiting, in seconds
+    min_sleep = 0.001
+    max_sleep = 0.05
+
+    def __init__(self, name: str, timeout: float=10.0, blocking_timeout: float=None):
+        self.name = name
+        self.timeout = timeout
+        self.blocking_timeout = blocking_timeout
+        self.acquired = False
+
+    def _acquire(self) -> bool:
+        raise NotImplementedError
+
+    def _release(self):
+        raise NotImplementedError
+
+    def acquire(self, blocking: bool=True, blocking_timeout: float=None) -> bool:
+        """Acquire the lock, returns whether it was"""
+        blocking_timeout = self.blocking_timeout if blocking_timeout is None else blocking_timeout
+        deadline = None if blocking_timeout is None else time.time() + blocking_timeout
+        sleep = self.min_sleep
+        while not self._acquire():
+            if not blocking or (deadline is not None and time.time() + sleep > deadline):
+                return False
+            time.sleep(sleep)
+            sleep = min(sleep * 2, self.max_sleep)
+        self.acquired = True
+        return True
+
+    def release(self):
+        if self.acquired:
+            self._release()
+            self.acquired = False
+
+    def __enter__(self):
+        if not self.acquire():
+            raise LockError(f'Lock on {self.name} not acquired in {self.blocking_timeout} seconds!')
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class LocalLock(StoreLock):
+    """Lock shared by the threads of a process, for stores that can't be shared by processes"""
+
+    def __init__(self, lock: threading.Lock, name: str, timeout: float=10.0, blocking_timeout: float=None):
+        super().__init__(name, timeout, blocking_timeout)
+        self.lock = lock
+
+    def _acquire(self) -> bool:
+        return self.lock.acquire(blocking=False)
+
+    def _release(self):
+        self.lock.release()
+
+
+class FileLock(StoreLock):
+    """Lock of a file with flock (or msvcrt on Windows), released by the OS when its process dies.
+    Names get a file each in directory, the timeout lease isn't enforced."""
+
+    def __init__(self, directory: str, name: str, timeout: float=10.0, blocking_timeout: float=None):
+        super().__init__(name, timeout, blocking_timeout)
+        filename = quote(name, safe='')
+        if len(filename) > 200:
+            filename = hashlib.sha1(name.encode()).hexdigest()
+        self.directory = directory
+        self.path = os.path.join(directory, f'{filename}.lock')
+        self.fd = None
+
+    def _acquire(self) -> bool:
+        if self.fd is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT)
+        try:
+            if fcntl is not None:
+                fcntl.flock(self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(self.fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def _release(self):
+        # Lock files are kept, removing them would race with processes waiting on them
+        if fcntl is None:
+            msvcrt.locking(self.fd, msvcrt.LK_UNLCK, 1)
+        os.close(self.fd)
+        self.fd = None
+
+    def acquire(self, blocking: bool=True, blocking_timeout: float=None) -> bool:
+        acquired = super().acquire(blocking, blocking_timeout)
+        if not acquired and self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+        return acquired
+
+
+class RedisLock(StoreLock):
+    """Lock set with SET NX PX and a random token, deleted only by its holder.
+    The key expires after timeout, releasing locks of hung or dead holders."""
+    RELEASE = "if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end return 0"
+
+    def __init__(self, client, key: str, name: str, timeout: float=10.0, blocking_timeout: float=None):
+        super().__init__(name, timeout, blocking_timeout)
+        self.client = client
+        self.key = key
+        self.token = uuid.uuid4().hex
+
+    def _acquire(self) -> bool:
+        return bool(self.client.set(self.key, self.token, nx=True, px=int(self.timeout * 1000)))
+
+    def _release(self):
+        self.client.eval(self.RELEASE, 1, self.key, self.token)
@@ -1,6 +1,7 @@
 import os
 
 import click
+import yaml
 
 from trading_bots.bots import BotTask
 from trading_bots.conf import defaults
@@ -94,6 +95,90 @@ def abort(bot, config, settings):
     bot_task.abort()
 
 
+def parse_assignments(assignments, separator=','):
+    """Parse 'path=v1,v2' options into {path: [values]}, values as YAML scalars"""
+    parsed = {}
+    for assignment in assignments:
+        path, _, values = assignment.partition('=')
+        if not values:
+            raise click.BadParameter(f"Expected 'path=values', got '{assignment}'")
+        parsed[path] = [yaml.safe_load(value) for value in values.split(separator)]
+    return parsed
+
+
+@cli.command(short_help="Backtest a bot over a grid or random search of config values")
+@bot_argument
+@config_option
+@interval_option
+@settings_option
+@click.option('--data', '-d', required=True, type=click.Path(exists=True, file_okay=False),
+              help="Directory with the market data to backtest on, as saved by MarketData.save")
+@click.option('--grid', '-g', 'grid', multiple=True,
+              help="Config values to try, e.g. 'prices.buy_multiplier=0.9,0.95,0.99'. Can be repeated.")
+@click.option('--range', '-r', 'ranges', multiple=True,
+              help="Config range to sample on random search, e.g. 'talib.rsi.periods=7:28'. Can be repeated.")
+@click.option('--samples', '-n', type=int, help="Random search with this many samples instead of a full grid")
+@click.option('--seed', type=int, help="Random search seed")
+@click.option('--balance', '-b', 'balances', multiple=True, help="Starting balance, e.g. 'CLP=10000000'")
+@click.option('--workers', '-w', type=int, help="Worker processes. Defaults to the number of CPUs")
+@click.option('--sort-by', default='total_return', help="Result column to rank by. Defaults to 'total_return'")
+@click.option('--output', '-o', type=click.Path(dir_okay=False), help="Write the ranked results as CSV")
+@click.option('--top', default=20, help="Number of results to print. Defaults to 20")
+def sweep(bot, config, interval, settings, data, grid, ranges, samples, seed, balances, workers, sort_by, output,
+          top):
+    """Backtest a BOT (by label) over config variations, e.g. 'MyBot -d data/ -g talib.rsi.periods=7,14,21'"""
+    from trading_bots.backtest import (
+        ParameterSweep, format_table, grid_params, load_market_data, random_params, write_results)
+    print_options(bot, config, settings)
+    click.echo(f'- Interval: {interval}s')
+    click.echo()
+    space = parse_assignments(grid)
+    for path, bounds in parse_assignments(ranges, separator=':').items():
+        if len(bounds) != 2:
+            raise click.BadParameter(f"Expected 'path=low:high' range for '{path}'")
+        space[path] = tuple(bounds)
+    if samples:
+        params = random_params(space, samples, seed)
+    elif any(isinstance(values, tuple) for values in space.values()):
+        raise click.BadParameter('Ranges require --samples')
+    else:
+        params = grid_params(space)
+    bot_task = BotTask(bot, config)
+    parameter_sweep = ParameterSweep(
+        bot_task.bot_cls, bot_task.bot_config, load_market_data(data), interval=interval,
+        balances={k: v[0] for k, v in parse_assignments(balances).items()}, workers=workers, sort_by=sort_by)
+    results = parameter_sweep.run(params)
+    click.echo(format_table(results, limit=top))
+    if output:
+        write_results(results, output)
+        click.echo()
+        click.echo(f'Results written to {output}')
+
+
+@cli.command(short_help="Record market data of exchanges")
+@interval_option
+@settings_option
+@click.option('--market', '-m', 'markets', multiple=True, required=True,
+              help="Exchange and market to record, e.g. 'Bitstamp:BTCUSD'. Can be repeated.")
+@click.option('--directory', '-d', default='data', help="Directory to record into. Defaults to 'data'")
+@click.option('--depth', default=10, help="Order book levels per side to record. Defaults to 10")
+def record(interval, settings, markets, directory, depth):
+    """Record tickers, order books and trades of MARKETS on an interval, e.g. '-m Bitstamp:BTCUSD -i 10'"""
+    from trading_bots.contrib import clients
+    from trading_bots.recorder import MarketRecorder
+    click.echo(f"- Settings files: {os.environ.get('SETTINGS', settings)}")
+    click.echo(f'- Interval: {interval}s')
+    click.echo()
+    market_clients = []
+    for market in markets:
+        exchange, _, code = market.partition(':')
+        client_cls = getattr(clients, f'{exchange}Market', None)
+        if client_cls is None or not code:
+            raise click.BadParameter(f"Unknown exchange market '{market}'")
+        market_clients.append(client_cls(code))
+    MarketRecorder(market_clients, directory, depth=depth).run(interval)
+
+
 @cli.command(short_help="Creates a Trading-Bots project directory structure")
 @click.option('--name', prompt=True, default='MyAwesomeProject')
 @click.option('--directory', prompt=True, default='.')
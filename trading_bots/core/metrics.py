@@ -0,0 +1,155 @@
+import bisect
+import copy
+
+__all__ = [
+    'Histogram',
+    'OperationStats',
+    'StoreMetrics',
+]
+
+
+class Histogram:
+    """Latency histogram with fixed exponential buckets, in seconds.
+    Memory doesn't grow with the values, percentiles are the upper bound of their bucket."""
+    # 1 microsecond to ~67 seconds, doubling
+    bounds = [1e-6 * 2 ** i for i in range(27)]
+
+    def __init__(self):
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, p: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = p / 100 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return self.max
+
+    def __sub__(self, other: 'Histogram') -> 'Histogram':
+        diff = Histogram()
+        diff.counts = [a - b for a, b in zip(self.counts, other.counts)]
+        diff.count = self.count - other.count
+        diff.total = self.total - other.total
+        diff.max = self.max if diff.count else 0.0
+        return diff
+
+
+class OperationStats:
+    """Counters and latency of one operation on one key prefix"""
+    counters = ('calls', 'hits', 'misses', 'errors', 'slow', 'bytes')
+
+    def __init__(self):
+        for counter in self.counters:
+            setattr(self, counter, 0)
+        self.latency = Histogram()
+
+    def __sub__(self, other: 'OperationStats') -> 'OperationStats':
+        diff = OperationStats()
+        for counter in self.counters:
+            setattr(diff, counter, getattr(self, counter) - getattr(other, counter))
+        diff.latency = self.latency - other.latency
+        return diff
+
+    def summary(self) -> dict:
+        return {
+            'calls': self.calls,
+            'hits': self.hits,
+            'misses': self.misses,
+            'errors': self.errors,
+            'slow': self.slow,
+            'bytes': self.bytes,
+            'total_ms': self.latency.total * 1000,
+            'mean_ms': self.latency.mean * 1000,
+            'p99_ms': self.latency.percentile(99) * 1000,
+            'max_ms': self.latency.max * 1000,
+        }
+
+
+class StoreMetrics:
+    """Store operation stats by (operation, key prefix).
+
+    The prefix of a name is the part before its first separator, e.g. the bot label of
+    namespaced names. Latencies are kept in fixed size histograms, so recording doesn't
+    allocate once every (operation, prefix) has been seen.
+    """
+
+    # Names whose stats are looked up directly, skipping the prefix
+    max_cached_names = 10000
+
+    def __init__(self, backend: str='', separator: str=':'):
+        self.backend = backend
+        self.separator = separator
+        self.stats = {}
+        self._by_name = {}
+
+    def prefix_of(self, name: str) -> str:
+        return name.partition(self.separator)[0]
+
+    def record(self, operation: str, name: str, seconds: float, nbytes: int=0, hits: int=0, misses: int=0,
+               error: bool=False, slow: bool=False) -> OperationStats:
+        stats = self._by_name.get((operation, name))
+        if stats is None:
+            key = (operation, self.prefix_of(name))
+            stats = self.stats.get(key)
+            if stats is None:
+                stats = self.stats[key] = OperationStats()
+            if len(self._by_name) < self.max_cached_names:
+                self._by_name[(operation, name)] = stats
+        stats.calls += 1
+        stats.bytes += nbytes
+        stats.latency.add(seconds)
+        stats.hits += hits
+        stats.misses += misses
+        stats.errors += error
+        stats.slow += slow
+        return stats
+
+    def snapshot(self) -> dict:
+        return copy.deepcopy(self.stats)
+
+    def since(self, snapshot: dict) -> dict:
+        """Stats of the operations after a snapshot"""
+        stats = {}
+        for key, current in self.stats.items():
+            diff = current - snapshot[key] if key in snapshot else current
+            if diff.calls:
+                stats[key] = diff
+        return stats
+
+    def summary(self, snapshot: dict=None) -> list:
+        """Rows of stats by operation and prefix, slowest first"""
+        stats = self.stats if snapshot is None else self.since(snapshot)
+        rows = [{'backend': self.backend, 'operation': operation, 'prefix': prefix, **s.summary()}
+                for (operation, prefix), s in stats.items()]
+        return sorted(rows, key=lambda row: row['total_ms'], reverse=True)
+
+    def format(self, snapshot: dict=None) -> str:
+        lines = []
+        for row in self.summary(snapshot):
+            hits = f' hits {row["hits"]}/{row["hits"] + row["misses"]}' if row['hits'] + row['misses'] else ''
+            slow = f', {row["slow"]} slow' if row['slow'] else ''
+            lines.append(f'{row["backend"]} {row["operation"]} {row["prefix"]}: {row["calls"]} calls, '
+                         f'{row["total_ms"]:.1f} ms (mean {row["mean_ms"]:.2f}, p99 {row["p99_ms"]:.2f}, '
+                         f'max {row["max_ms"]:.2f}), {row["bytes"]} bytes{hits}{slow}')
+        return '\n'.join(lines)
+
+    def reset(self):
+        self.stats = {}
+        self._by_name = {}
@@ -0,0 +1,164 @@
+import json
+import pickle
+import zlib
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+__all__ = [
+    'Codec',
+    'JSONCodec',
+    'OrjsonCodec',
+    'MsgpackCodec',
+    'PickleCodec',
+    'FramedSerializer',
+    'serializers',
+    'register_serializer',
+]
+
+# Framed values start with MAGIC, then a codec id byte and a compression byte
+MAGIC = b'\x00TB'
+HEADER_SIZE = len(MAGIC) + 2
+NO_COMPRESSION, ZLIB = 0, 1
+
+
+class Codec:
+    """Encodes values to bytes, identified in frames by a unique id"""
+    id = None
+    name = ''
+
+    def dumps(self, value) -> bytes:
+        raise NotImplementedError
+
+    def loads(self, data: bytes):
+        raise NotImplementedError
+
+
+class JSONCodec(Codec):
+    id = 1
+    name = 'json'
+
+    def dumps(self, value) -> bytes:
+        return json.dumps(value, separators=(',', ':')).encode()
+
+    def loads(self, data: bytes):
+        return json.loads(data)
+
+
+class OrjsonCodec(JSONCodec):
+    """JSON with orjson, reads what JSONCodec writes. NaN and infinities are written as null."""
+    name = 'orjson'
+
+    def dumps(self, value) -> bytes:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+    def loads(self, data: bytes):
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # NaN and infinities written by the stdlib
+            return json.loads(data)
+
+
+class MsgpackCodec(Codec):
+    id = 2
+    name = 'msgpack'
+
+    def dumps(self, value) -> bytes:
+        return msgpack.packb(value, use_bin_type=True)
+
+    def loads(self, data: bytes):
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+class PickleCodec(Codec):
+    id = 3
+    name = 'pickle'
+
+    def dumps(self, value) -> bytes:
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def loads(self, data: bytes):
+        return pickle.loads(data)
+
+
+def _json_codec() -> Codec:
+    return OrjsonCodec() if orjson is not None else JSONCodec()
+
+
+def _codecs(allow_pickle: bool=False) -> dict:
+    codecs = {JSONCodec.id: _json_codec()}
+    if allow_pickle:
+        codecs[PickleCodec.id] = PickleCodec()
+    if msgpack is not None:
+        codecs[MsgpackCodec.id] = MsgpackCodec()
+    return codecs
+
+
+class FramedSerializer:
+    """Serializer writing a small header with the codec and compression used.
+
+    Values are zlib compressed when encoded to more than compress_threshold bytes (never if
+    None), and only kept compressed if it made them smaller. Values are read with the codec
+    of their header, whatever the codec used to write, and values without a header are read
+    as legacy stdlib JSON text. Unpickling runs arbitrary code, so pickles, framed or legacy,
+    are only read with allow_pickle, or by serializers writing them.
+    """
+
+    def __init__(self, codec: Codec=None, compress_threshold: int=1024, compression_level: int=1,
+                 allow_pickle: bool=None):
+        self.codec = codec or _json_codec()
+        self.compress_threshold = compress_threshold
+        self.compression_level = compression_level
+        self.allow_pickle = isinstance(self.codec, PickleCodec) if allow_pickle is None else allow_pickle
+        self.codecs = _codecs(self.allow_pickle)
+
+    def dumps(self, value) -> bytes:
+        data = self.codec.dumps(value)
+        compression = NO_COMPRESSION
+        if self.compress_threshold is not None and len(data) > self.compress_threshold:
+            compressed = zlib.compress(data, self.compression_level)
+            if len(compressed) < len(data):
+                data, compression = compressed, ZLIB
+        return MAGIC + bytes((self.codec.id, compression)) + data
+
+    def loads(self, data):
+        if isinstance(data, str):
+            return json.loads(data)
+        if not data.startswith(MAGIC):
+            if data[:1] == b'\x80':
+                assert self.allow_pickle, 'Pickled value, read it with the pickle serializer!'
+                return pickle.loads(data)
+            return json.loads(data)
+        codec_id, compression = data[len(MAGIC)], data[len(MAGIC) + 1]
+        assert codec_id != PickleCodec.id or self.allow_pickle, 'Pickled value, pickles are not allowed!'
+        assert codec_id in self.codecs, f'Codec {codec_id} is not available!'
+        data = memoryview(data)[HEADER_SIZE:]
+        if compression == ZLIB:
+            data = zlib.decompress(data)
+        return self.codecs[codec_id].loads(bytes(data))
+
+
+serializers = {
+    # Legacy stdlib modules, values are written without header
+    'json': json,
+    'pickle': pickle,
+    # Fastest codec installed: msgpack, orjson or stdlib JSON
+    'fast': FramedSerializer(MsgpackCodec() if msgpack is not None else _json_codec()),
+}
+if orjson is not None:
+    serializers['orjson'] = FramedSerializer(OrjsonCodec())
+if msgpack is not None:
+    serializers['msgpack'] = FramedSerializer(MsgpackCodec())
+
+
+def register_serializer(name: str, serializer):
+    """Register an object with dumps and loads, to use by name in store methods"""
+    serializers[name] = serializer
@@ -1,8 +1,20 @@
+import atexit
+import base64
+import copy
 import json as j
-import pickle as p
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from logging import Logger
 
+from .exceptions import ConflictError
+from .locks import FileLock, LocalLock, RedisLock, StoreLock
 from .logging import get_logger
+from .metrics import StoreMetrics
+from .serializers import serializers
 from .utils import load_class_by_name
 
 try:
@@ -11,18 +23,62 @@ except ImportError:
     pass
 
 
-def get_store(logger: Logger=None):
-    """Get and configure the storage backend"""
-    from trading_bots.conf import settings
-    store_settings = settings.storage
+STORE_CLASSES = {
+    'json': 'trading_bots.core.storage.JSONStore',
+    'redis': 'trading_bots.core.storage.RedisStore',
+    'memory': 'trading_bots.core.storage.MemoryStore',
+    'log': 'trading_bots.core.storage.LogStore',
+    'sqlite': 'trading_bots.core.storage.SQLiteStore',
+}
+
+# Shared stores by process and settings profile
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def create_store(store_settings: dict, logger: Logger=None):
+    """Configure a new storage backend from storage settings"""
     store = store_settings.get('name', 'json')
-    if store == 'json':
-        store = 'trading_bots.core.storage.JSONStore'
-    elif store == 'redis':
-        store = 'trading_bots.core.storage.RedisStore'
-    store_cls = load_class_by_name(store)
+    store_cls = load_class_by_name(STORE_CLASSES.get(store, store))
     kwargs = store_cls.configure(store_settings)
-    return store_cls(logger=logger, **kwargs)
+    store = store_cls(logger=logger, **kwargs)
+    if 'slow_threshold' in store_settings:
+        store.slow_threshold = store_settings['slow_threshold']
+    return store
+
+
+def get_store(logger: Logger=None, store_settings: dict=None):
+    """Get the storage backend configured by the storage settings.
+
+    Stores are shared by every caller in the process with the same settings, so they also
+    share caches and connection pools (e.g. a single Redis pool). Shared stores log with
+    their own logger, the logger is only used for messages about the store creation.
+    """
+    if store_settings is None:
+        from trading_bots.conf import settings
+        store_settings = settings.storage
+    profile = (os.getpid(), j.dumps(store_settings, sort_keys=True, default=str))
+    store = _stores.get(profile)
+    if store is None:
+        with _stores_lock:
+            store = _stores.get(profile)
+            if store is None:
+                (logger or get_logger(__name__)).debug(f'Creating {store_settings.get("name", "json")} store')
+                store = _stores[profile] = create_store(store_settings)
+    return store
+
+
+@atexit.register
+def close_stores():
+    """Flush and close the shared stores of this process"""
+    with _stores_lock:
+        pid = os.getpid()
+        for profile in [profile for profile in _stores if profile[0] == pid]:
+            store = _stores.pop(profile)
+            try:
+                store.close()
+            except Exception:
+                store.log.exception(f'Failed to close {store.name}!')
 
 
 class BaseStore:
@@ -39,30 +95,87 @@ class BaseStore:
 
 
 class Store(BaseStore):
-    serializers = {
-        'json': j,
-        'pickle': p,
-    }
+    serializers = serializers
+    # Stores that can't keep bytes get serialized bytes as base64 text with this prefix
+    binary = True
+    BASE64_PREFIX = 'base64:'
+    # Hash of expiry timestamps by name, on stores without native expiry
+    EXPIRES = '__expires__'
+    sweep_interval = 60
+    _expires = None
+    _swept = 0.0
+    # Hash of versions by name, bumped by compare-and-set
+    VERSIONS = '__versions__'
+    # Directory of lock files, on stores shared through files
+    lock_dir = None
+    # Operations taking longer are logged with their key, None to never log them
+    slow_threshold = 0.1
+    _metrics = None
+
+    # METRICS ----------------------------------------------------------------
+    @property
+    def metrics(self) -> StoreMetrics:
+        """Latency, payload bytes and hits of the operations on this store, by operation and name prefix"""
+        if self._metrics is None:
+            self._metrics = StoreMetrics(self.name)
+        return self._metrics
+
+    def _metric_name(self, name: str) -> str:
+        return name
+
+    @staticmethod
+    def _size(value) -> int:
+        return len(value) if isinstance(value, (bytes, str)) else 0
+
+    def _record(self, operation: str, path: tuple, started: float, nbytes: int=0, hits: int=0, misses: int=0,
+                error: bool=False, description: str=None):
+        seconds = time.perf_counter() - started
+        slow = self.slow_threshold is not None and seconds >= self.slow_threshold
+        self.metrics.record(operation, self._metric_name(path[0]), seconds, nbytes, hits, misses, error, slow)
+        if slow:
+            self.log.warning(f'Slow {description or operation + " " + " ".join(path)} on {self.name}: '
+                             f'{seconds * 1000:,.1f} ms')
 
     # GET --------------------------------------------------------------------
+    def _deserialize(self, value, cast=None, serializer=None):
+        if serializer:
+            if isinstance(serializer, str):
+                serializer = self.serializers[serializer]
+            if isinstance(value, str) and value.startswith(self.BASE64_PREFIX):
+                value = base64.b64decode(value[len(self.BASE64_PREFIX):])
+            return serializer.loads(value)
+        if cast:
+            return cast(value)
+        return value
+
+    def _serialize(self, value, serializer=None):
+        if serializer:
+            if isinstance(serializer, str):
+                serializer = self.serializers[serializer]
+            value = serializer.dumps(value)
+            if isinstance(value, bytes) and not self.binary:
+                value = self.BASE64_PREFIX + base64.b64encode(value).decode()
+        return value
+
     def __get(self, method, *path, cast=None, serializer=None, **kwargs):
         path_str = ' '.join(path)
         self.log.debug(f'Get {path_str} from {self.name}')
+        started = time.perf_counter()
         try:
+            if self._expired(path[0]):
+                raise KeyError(path[0])
             value = method(*path, **kwargs)
-            if serializer:
-                if isinstance(serializer, str):
-                    serializer = self.serializers[serializer]
-                return serializer.loads(value)
-            if cast:
-                return cast(value)
-            return value
+            result = self._deserialize(value, cast, serializer)
         except KeyError:
+            self._record(method.__name__[1:], path, started, misses=1)
             self.log.warning(f'{path_str} not found on {self.name}')
             return None
         except Exception:
+            self._record(method.__name__[1:], path, started, error=True)
             self.log.exception(f'Failed to get {path_str} from {self.name}')
             raise
+        self._record(method.__name__[1:], path, started, self._size(value), hits=1)
+        return result
 
     def _get(self, name: str, **kwargs):
         raise NotImplementedError
@@ -77,70 +190,433 @@ class Store(BaseStore):
         return self.__get(self._hget, name, key, cast=cast, serializer=serializer, **kwargs)
 
     # SET --------------------------------------------------------------------
-    def __set(self, method, *path, value, serializer=None, **kwargs):
+    def __set(self, method, *path, value, serializer=None, ttl: float=None, replace: bool=False, **kwargs):
         path_str = ' '.join(path)
         self.log.debug(f'Set {path_str} on {self.name}')
+        started = time.perf_counter()
         try:
-            if serializer:
-                if isinstance(serializer, str):
-                    serializer = self.serializers[serializer]
-                value = serializer.dumps(value)
+            value = self._serialize(value, serializer)
+            self._expired(path[0])
             method(*path, value=value, **kwargs)
+            if ttl is not None:
+                self._expire(path[0], ttl)
+            elif replace:
+                self._persist(path[0])
         except Exception:
+            self._record(method.__name__[1:], path, started, error=True)
             self.log.exception(f'Failed to set {path_str} on {self.name}')
             raise
+        self._record(method.__name__[1:], path, started, self._size(value))
+        self._maybe_sweep()
 
     def _set(self, name: str, value, **kwargs):
         raise NotImplementedError
 
-    def set(self, name: str, value, serializer=None, **kwargs):
-        return self.__set(self._set, name, value=value, serializer=serializer, **kwargs)
+    def set(self, name: str, value, serializer=None, ttl: float=None, **kwargs):
+        """Set a value, that expires after ttl seconds if given"""
+        return self.__set(self._set, name, value=value, serializer=serializer, ttl=ttl, replace=True, **kwargs)
 
     def _hset(self, name: str, key: str, value, **kwargs):
         raise NotImplementedError
 
-    def hset(self, name: str, key: str, value, serializer=None, **kwargs):
-        return self.__set(self._hset, name, key, value=value, serializer=serializer, **kwargs)
+    def hset(self, name: str, key: str, value, serializer=None, ttl: float=None, **kwargs):
+        """Set a hash key, the whole hash expires after ttl seconds if given"""
+        return self.__set(self._hset, name, key, value=value, serializer=serializer, ttl=ttl, **kwargs)
 
     # DELETE -----------------------------------------------------------------
     def __delete(self, method, *path, **kwargs):
         path_str = ' '.join(path)
         self.log.debug(f'Delete {path_str} from {self.name}')
+        started = time.perf_counter()
         try:
             method(*path, **kwargs)
         except KeyError:
+            self._record(method.__name__[1:], path, started, misses=1)
             self.log.warning(f'{path_str} not found on {self.name}')
-            pass
         except Exception:
+            self._record(method.__name__[1:], path, started, error=True)
             self.log.exception(f'Failed to delete {path_str} from {self.name}')
             raise
+        else:
+            self._record(method.__name__[1:], path, started, hits=1)
 
     def _delete(self, name: str, **kwargs):
         raise NotImplementedError
 
     def delete(self, name: str, **kwargs):
+        self._persist(name)
         return self.__delete(self._delete, name, **kwargs)
 
     def _hdel(self, name: str, key: str, **kwargs):
         raise NotImplementedError
 
     def hdel(self, name: str, key: str, **kwargs):
+        self._expired(name)
         return self.__delete(self._hdel, name, key, **kwargs)
 
+    # BATCH ------------------------------------------------------------------
+    def __batch(self, description: str, name: str, method, *args, **kwargs):
+        """Run a batch method, recording its metrics under the prefix of name, e.g. its first name"""
+        self.log.debug(f'{description} on {self.name}')
+        started = time.perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        except Exception:
+            self._record(method.__name__[1:], (name,), started, error=True, description=description)
+            self.log.exception(f'Failed to {description.lower()} on {self.name}')
+            raise
+        # Payload is the values read, or the mapping written
+        values = result.values() if isinstance(result, dict) else result if isinstance(result, list) else []
+        nbytes = sum(map(self._size, values)) + sum(sum(map(self._size, arg.values()))
+                                                    for arg in args if isinstance(arg, dict))
+        hits = misses = 0
+        if method.__name__ in ('_mget', '_hmget'):
+            misses = result.count(None)
+            hits = len(result) - misses
+        self._record(method.__name__[1:], (name,), started, nbytes, hits, misses, description=description)
+        return result
+
+    def _mget(self, names: list, **kwargs) -> list:
+        values = []
+        for name in names:
+            try:
+                values.append(self._get(name, **kwargs))
+            except KeyError:
+                values.append(None)
+        return values
+
+    def mget(self, names: list, cast=None, serializer=None, **kwargs) -> list:
+        """Values of several names, None for the missing ones"""
+        names = list(names)
+        for name in names:
+            self._expired(name)
+        values = self.__batch(f'Get {len(names)} names', next(iter(names), ''), self._mget, names, **kwargs)
+        return [None if value is None else self._deserialize(value, cast, serializer) for value in values]
+
+    def _mset(self, mapping: dict, **kwargs):
+        for name, value in mapping.items():
+            self._set(name, value=value, **kwargs)
+
+    def mset(self, mapping: dict, serializer=None, ttl: float=None, **kwargs):
+        mapping = {name: self._serialize(value, serializer) for name, value in mapping.items()}
+        self.__batch(f'Set {len(mapping)} names', next(iter(mapping), ''), self._mset, mapping, **kwargs)
+        for name in mapping:
+            if ttl is not None:
+                self._expire(name, ttl)
+            else:
+                self._persist(name)
+
+    def _hmget(self, name: str, keys: list, **kwargs) -> list:
+        values = []
+        for key in keys:
+            try:
+                values.append(self._hget(name, key, **kwargs))
+            except KeyError:
+                values.append(None)
+        return values
+
+    def hmget(self, name: str, keys: list, cast=None, serializer=None, **kwargs) -> list:
+        """Values of several keys of a hash, None for the missing ones"""
+        self._expired(name)
+        values = self.__batch(f'Get {len(keys)} keys of {name}', name, self._hmget, name, list(keys), **kwargs)
+        return [None if value is None else self._deserialize(value, cast, serializer) for value in values]
+
+    def _hmset(self, name: str, mapping: dict, **kwargs):
+        for key, value in mapping.items():
+            self._hset(name, key, value=value, **kwargs)
+
+    def hmset(self, name: str, mapping: dict, serializer=None, ttl: float=None, **kwargs):
+        mapping = {key: self._serialize(value, serializer) for key, value in mapping.items()}
+        self._expired(name)
+        self.__batch(f'Set {len(mapping)} keys of {name}', name, self._hmset, name, mapping, **kwargs)
+        if ttl is not None:
+            self._expire(name, ttl)
+
+    def _hgetall(self, name: str, **kwargs) -> dict:
+        try:
+            return dict(self._get(name, **kwargs))
+        except KeyError:
+            return {}
+
+    def hgetall(self, name: str, cast=None, serializer=None, **kwargs) -> dict:
+        """Every key of a hash, empty if there is none"""
+        self._expired(name)
+        values = self.__batch(f'Get all keys of {name}', name, self._hgetall, name, **kwargs)
+        return {key: self._deserialize(value, cast, serializer) for key, value in values.items()}
+
+    def _scan(self, prefix: str, **kwargs) -> list:
+        raise NotImplementedError
+
+    def scan(self, prefix: str='', **kwargs) -> list:
+        """Sorted names starting with prefix"""
+        names = self.__batch(f'Scan {prefix}*', prefix, self._scan, prefix, **kwargs)
+        return sorted(name for name in names if name not in (self.EXPIRES, self.VERSIONS) and not self._expired(name))
+
+    # PIPELINE ---------------------------------------------------------------
+    def pipeline(self) -> 'Pipeline':
+        """Writes buffered and applied together, see `Pipeline`"""
+        return Pipeline(self)
+
+    def _execute(self, operations: list):
+        """Apply (op, name, key, value) operations, atomically where the backend allows it"""
+        for op, name, key, value in operations:
+            try:
+                if op == 'set':
+                    self._set(name, value=value)
+                elif op == 'hset':
+                    self._hset(name, key, value=value)
+                elif op == 'delete':
+                    self._delete(name)
+                elif op == 'hdel':
+                    self._hdel(name, key)
+                elif op == 'expire':
+                    self._expire(name, value)
+                elif op == 'persist':
+                    self._persist(name)
+            except KeyError:
+                self.log.warning(f'{" ".join(filter(None, (name, key)))} not found on {self.name}')
+
+    def execute(self, operations: list):
+        name = operations[0][1] if operations else ''
+        return self.__batch(f'Execute {len(operations)} operations', name, self._execute, operations)
+
+    # EXPIRY -----------------------------------------------------------------
+    def _expiry(self) -> dict:
+        """Expiry timestamps by name, loaded once and kept in the EXPIRES hash"""
+        if self._expires is None:
+            try:
+                self._expires = dict(self._get(self.EXPIRES))
+            except KeyError:
+                self._expires = {}
+        return self._expires
+
+    def _expire(self, name: str, ttl: float):
+        expires = time.time() + ttl
+        self._expiry()[name] = expires
+        self._hset(self.EXPIRES, name, value=expires)
+
+    def _persist(self, name: str):
+        if name in self._expiry():
+            del self._expires[name]
+            try:
+                self._hdel(self.EXPIRES, name)
+            except KeyError:
+                pass
+
+    def _expired(self, name: str) -> bool:
+        """Whether name expired, dropping it if so"""
+        expires = self._expiry().get(name)
+        if expires is None or expires > time.time():
+            return False
+        try:
+            self._delete(name)
+        except KeyError:
+            pass
+        self._persist(name)
+        return True
+
+    def _ttl(self, name: str):
+        expires = self._expiry().get(name)
+        return None if expires is None else max(expires - time.time(), 0.0)
+
+    def expire(self, name: str, ttl: float):
+        """Expire name after ttl seconds"""
+        self.log.debug(f'Expire {name} in {ttl} seconds on {self.name}')
+        self._expire(name, ttl)
+
+    def ttl(self, name: str):
+        """Seconds until name expires, None if it doesn't"""
+        return self._ttl(name)
+
+    def sweep(self) -> int:
+        """Delete every expired name, returns how many. TTLs set by other processes are reloaded."""
+        self._expires = None
+        now = time.time()
+        expired = [name for name, expires in self._expiry().items() if expires <= now]
+        for name in expired:
+            self._expired(name)
+        self._swept = now
+        if expired:
+            self.log.debug(f'Swept {len(expired)} expired names from {self.name}')
+        return len(expired)
+
+    def _maybe_sweep(self):
+        if self.sweep_interval is not None and time.time() - self._swept >= self.sweep_interval:
+            self.sweep()
+
+    # CONCURRENCY ------------------------------------------------------------
+    def lock(self, name: str, timeout: float=10.0, blocking_timeout: float=None) -> StoreLock:
+        """Advisory lock of name, see `StoreLock`. Shared by processes on file stores and Redis."""
+        if self.lock_dir is not None:
+            return FileLock(self.lock_dir, name, timeout, blocking_timeout)
+        locks = self.__dict__.setdefault('_name_locks', {})
+        return LocalLock(locks.setdefault(name, threading.Lock()), name, timeout, blocking_timeout)
+
+    def _version(self, name: str) -> int:
+        try:
+            return int(self._hget(self.VERSIONS, name))
+        except KeyError:
+            return 0
+
+    def _get_versioned(self, name: str) -> tuple:
+        """Raw value and version, read again if the version changed meanwhile"""
+        version = self._version(name)
+        while True:
+            try:
+                value = self._get(name)
+            except KeyError:
+                value = None
+            current = self._version(name)
+            if current == version:
+                return value, version
+            version = current
+
+    def _cas(self, name: str, value, version: int) -> bool:
+        with self.lock(name):
+            if self._version(name) != version:
+                return False
+            self._execute([('set', name, None, value), ('hset', self.VERSIONS, name, version + 1)])
+            return True
+
+    def get_versioned(self, name: str, cast=None, serializer=None) -> tuple:
+        """Value and version of name, (None, version) if missing. Versions start at 0."""
+        self._expired(name)
+        value, version = self.__batch(f'Get versioned {name}', name, self._get_versioned, name)
+        return (None if value is None else self._deserialize(value, cast, serializer)), version
+
+    def cas(self, name: str, value, version: int, serializer=None, ttl: float=None) -> bool:
+        """Compare-and-set: set name and bump its version, only if its version is still version.
+        Versions are only bumped here, names using them must only be written with cas or update."""
+        value = self._serialize(value, serializer)
+        done = self.__batch(f'Compare-and-set {name}', name, self._cas, name, value, version)
+        if not done:
+            self.log.debug(f'{name} changed since version {version} on {self.name}')
+        elif ttl is not None:
+            self._expire(name, ttl)
+        else:
+            self._persist(name)
+        return done
+
+    def update(self, name: str, function, cast=None, serializer=None, ttl: float=None, retries: int=10):
+        """Set name to function(current value) with compare-and-set, retrying when others changed it.
+        function may be called several times. Returns the new value, raises ConflictError after retries."""
+        for attempt in range(retries + 1):
+            value, version = self.get_versioned(name, cast, serializer)
+            value = function(value)
+            if self.cas(name, value, version, serializer, ttl):
+                return value
+            # Jittered backoff, so writers don't retry in lockstep
+            time.sleep(random.uniform(0, 0.001 * 2 ** min(attempt, 6)))
+        raise ConflictError(f'{name} kept changing on {self.name}, update failed after {retries} retries!')
+
+    # NAMESPACE --------------------------------------------------------------
+    def namespace(self, prefix: str) -> 'NamespacedStore':
+        """View of this store with every name prefixed"""
+        return NamespacedStore(self, prefix)
+
+    # FLUSH ------------------------------------------------------------------
+    def flush(self):
+        """Write pending changes, for stores that buffer them"""
+        pass
+
+    def close(self):
+        """Write pending changes and release resources"""
+        self.flush()
+
+
+class Pipeline:
+    """Store writes buffered until `execute`, or the end of a `with store.pipeline()` block.
+
+    Buffered writes are applied together: in a single transaction on Redis and SQLite, and
+    with a single read and write of the file on JSONStore. Nothing is written if the block raises.
+    """
+
+    def __init__(self, store: Store):
+        self.store = store
+        self.operations = []
+
+    def __len__(self):
+        return len(self.operations)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.execute()
+        else:
+            self.operations = []
+
+    def set(self, name: str, value, serializer=None, ttl: float=None):
+        self.operations.append(('set', name, None, self.store._serialize(value, serializer)))
+        self.operations.append(('persist', name, None, None) if ttl is None else ('expire', name, None, ttl))
+        return self
+
+    def hset(self, name: str, key: str, value, serializer=None, ttl: float=None):
+        self.operations.append(('hset', name, key, self.store._serialize(value, serializer)))
+        if ttl is not None:
+            self.operations.append(('expire', name, None, ttl))
+        return self
+
+    def mset(self, mapping: dict, serializer=None, ttl: float=None):
+        for name, value in mapping.items():
+            self.set(name, value, serializer=serializer, ttl=ttl)
+        return self
+
+    def hmset(self, name: str, mapping: dict, serializer=None, ttl: float=None):
+        for key, value in mapping.items():
+            self.hset(name, key, value, serializer=serializer, ttl=ttl)
+        return self
+
+    def delete(self, name: str):
+        self.operations.append(('delete', name, None, None))
+        self.operations.append(('persist', name, None, None))
+        return self
+
+    def hdel(self, name: str, key: str):
+        self.operations.append(('hdel', name, key, None))
+        return self
+
+    def execute(self):
+        operations, self.operations = self.operations, []
+        if operations:
+            self.store.execute(operations)
+
 
 class JSONStore(Store):
+    """Store on a JSON file.
+
+    Every operation reads and writes the whole file, unless write_back is set: then the file is
+    read once, reads are served from memory and written names are marked dirty, until `flush`
+    writes them on top of the current file, and reloads it, so the changes of other processes
+    are seen after every flush. Flushes happen on `flush()`, at the end of
+    `Bot.execute` and on writes once flush_interval seconds passed since the last one.
+    Files are written to a temporary file first and renamed, so a crash never leaves them partial.
+    Each read-modify-write of the file holds a lock on filename.lock, so processes sharing the
+    file don't overwrite each other's changes.
+    """
     name = 'JSON File'
     filename = 'store.json'
+    binary = False
 
-    def __init__(self, filename: str=None, logger: Logger=None):
+    def __init__(self, filename: str=None, write_back: bool=False, flush_interval: float=None,
+                 logger: Logger=None):
         super().__init__(logger)
         if filename is not None:
             self.filename = filename
+        self.write_back = write_back
+        self.flush_interval = flush_interval
+        self.lock_dir = f'{self.filename}.locks'
+        self._data = None
+        self._dirty = set()
+        self._flushed = time.time()
 
     @classmethod
     def configure(cls, settings):
         kwargs = super().configure(settings)
         kwargs['filename'] = settings.get('filename')
+        kwargs['write_back'] = settings.get('write_back', False)
+        kwargs['flush_interval'] = settings.get('flush_interval')
         return kwargs
 
     def _read(self):
@@ -151,43 +627,645 @@ class JSONStore(Store):
             self.log.warning(f'File not found! ({self.name})')
             return {}
 
+    def _file_lock(self) -> FileLock:
+        """Lock of the whole file, for read-modify-write cycles"""
+        directory, filename = os.path.split(os.path.abspath(self.filename))
+        return FileLock(directory, filename, blocking_timeout=None)
+
     def _write(self, value):
+        tmp_filename = f'{self.filename}.tmp'
         try:
-            with open(self.filename, 'w') as outfile:
+            with open(tmp_filename, 'w') as outfile:
                 j.dump(value, outfile)
+            os.replace(tmp_filename, self.filename)
         except Exception:
             self.log.exception(f'Failed to write to {self.name}!')
             raise
 
+    # Write-back cache -------------------------------------------------------
+    @property
+    def data(self) -> dict:
+        if self._data is None:
+            self._data = self._read()
+        return self._data
+
+    def _changed(self, *names):
+        self._dirty.update(names)
+        if self.flush_interval is not None and time.time() - self._flushed >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write dirty names on top of the current file, and reload it"""
+        if not self._dirty:
+            # Reloaded on the next read
+            self._data = None
+            return
+        self.log.debug(f'Flushing {len(self._dirty)} names to {self.name}')
+        with self._file_lock():
+            data = self._read()
+            for name in self._dirty:
+                if name in self._data:
+                    data[name] = self._data[name]
+                else:
+                    data.pop(name, None)
+            self._write(data)
+        # The file as written is the current one
+        self._data = data
+        self._dirty.clear()
+        self._flushed = time.time()
+
+    def _current(self) -> dict:
+        return self.data if self.write_back else self._read()
+
+    def _copy(self, value):
+        # Cached values are copied, so changing a value doesn't change the cache
+        return copy.deepcopy(value) if self.write_back else value
+
+    # Operations -------------------------------------------------------------
     def _get(self, name: str, **kwargs):
-        data = self._read()
-        return data[name]
+        return self._copy(self._current()[name])
 
     def _hget(self, name: str, key: str, **kwargs):
-        return self._get(name)[key]
+        return self._copy(self._current()[name][key])
 
     def _set(self, name: str, value, **kwargs):
-        data = self._read()
-        data[name] = value
-        return self._write(data)
+        return self._execute([('set', name, None, value)])
 
     def _hset(self, name, key, value, **kwargs):
+        return self._execute([('hset', name, key, value)])
+
+    def _delete(self, name: str, **kwargs):
+        return self._execute([('delete', name, None, None)])
+
+    def _hdel(self, name: str, key: str, **kwargs):
+        return self._execute([('hdel', name, key, None)])
+
+    def _execute(self, operations: list):
+        """Apply operations with a single read and write of the file"""
+        if self.write_back:
+            self._apply(self.data, operations)
+        else:
+            with self._file_lock():
+                self._apply(self._read(), operations)
+        expiry = [operation for operation in operations if operation[0] in ('expire', 'persist')]
+        if expiry:
+            super()._execute(expiry)
+
+    def _apply(self, data: dict, operations: list):
+        changed = set()
+        for op, name, key, value in operations:
+            value = self._copy(value)
+            try:
+                if op == 'set':
+                    data[name] = value
+                elif op == 'hset':
+                    old = data.get(name)
+                    if not isinstance(old, dict):
+                        old = data[name] = {}
+                    old[key] = value
+                elif op == 'delete':
+                    data.pop(name)
+                elif op == 'hdel':
+                    data[name].pop(key)
+            except KeyError:
+                self.log.warning(f'{" ".join(filter(None, (name, key)))} not found on {self.name}')
+                continue
+            changed.add(name)
+        if changed and self.write_back:
+            self._changed(*changed)
+        elif changed:
+            self._write(data)
+
+    # Compare-and-set, always on the file ------------------------------------
+    def _refresh(self, data: dict, name: str):
+        """Update the cache of a name from the file, unless it has unflushed changes"""
+        if self._data is not None and name not in self._dirty:
+            for cached in (name, self.VERSIONS):
+                if cached in data:
+                    self._data[cached] = copy.deepcopy(data[cached])
+                else:
+                    self._data.pop(cached, None)
+
+    def _get_versioned(self, name: str) -> tuple:
         data = self._read()
-        old = data.get(name, {})
+        self._refresh(data, name)
+        return data.get(name), data.get(self.VERSIONS, {}).get(name, 0)
+
+    def _cas(self, name: str, value, version: int) -> bool:
+        with self._file_lock():
+            data = self._read()
+            if data.get(self.VERSIONS, {}).get(name, 0) != version:
+                return False
+            data[name] = self._copy(value)
+            data.setdefault(self.VERSIONS, {})[name] = version + 1
+            self._write(data)
+        self._dirty.discard(name)
+        self._refresh(data, name)
+        return True
+
+    # Batch operations -------------------------------------------------------
+    def _mget(self, names: list, **kwargs) -> list:
+        data = self._current()
+        return [self._copy(data.get(name)) for name in names]
+
+    def _mset(self, mapping: dict, **kwargs):
+        self._execute([('set', name, None, value) for name, value in mapping.items()])
+
+    def _hmget(self, name: str, keys: list, **kwargs) -> list:
+        values = self._current().get(name, {})
+        return [self._copy(values.get(key)) for key in keys]
+
+    def _hmset(self, name: str, mapping: dict, **kwargs):
+        self._execute([('hset', name, key, value) for key, value in mapping.items()])
+
+    def _scan(self, prefix: str, **kwargs) -> list:
+        return [name for name in self._current() if name.startswith(prefix)]
+
+
+class LogStore(Store):
+    """Store on an append-only log file.
+
+    Every change appends one line with a small JSON header, [op, name, key], and the JSON value,
+    so writes cost in proportion to the change. An in-memory index maps names and hash keys to
+    the offset of their last value, which is read back from the file on get. Opening the store
+    replays the log parsing only the headers. Superseded records are dropped by `compact`,
+    which rewrites the live ones and renames the file, automatically once they are compact_ratio
+    of at least compact_min records. A single process should write the file at a time.
+    """
+    name = 'Log File'
+    filename = 'store.log'
+    binary = False
+    SET, HSET, DELETE, HDEL = 's', 'h', 'd', 'x'
+
+    def __init__(self, filename: str=None, compact_ratio: float=0.5, compact_min: int=1000, fsync: bool=False,
+                 logger: Logger=None):
+        super().__init__(logger)
+        assert 0 < compact_ratio <= 1, 'Compact ratio must be in (0, 1]!'
+        if filename is not None:
+            self.filename = filename
+        self.compact_ratio = compact_ratio
+        self.compact_min = compact_min
+        self.fsync = fsync
+        self.lock_dir = f'{self.filename}.locks'
+        self._reader = None
+        self._writer = None
+        self._open()
+
+    @classmethod
+    def configure(cls, settings):
+        kwargs = super().configure(settings)
+        kwargs['filename'] = settings.get('filename')
+        for option in ('compact_ratio', 'compact_min', 'fsync'):
+            if option in settings:
+                kwargs[option] = settings[option]
+        return kwargs
+
+    def _open(self):
+        self.close()
+        self.index = {}  # name: offset, or {key: offset} for hashes
+        self.records = 0
+        self.live = 0
+        size = self._replay()
+        self._writer = open(self.filename, 'ab')
+        # Drop a partial record left by an interrupted write
+        if self._writer.tell() != size:
+            self._writer.truncate(size)
+            self._writer.seek(size)
+        self._reader = open(self.filename, 'rb')
+
+    def close(self):
+        for f in (self._reader, self._writer):
+            if f is not None:
+                f.close()
+        self._reader = self._writer = None
+
+    def _replay(self) -> int:
+        """Rebuild the index from the log, returns the size of its complete records"""
+        try:
+            with open(self.filename, 'rb') as f:
+                lines = f.read().split(b'\n')
+        except FileNotFoundError:
+            return 0
+        # The last item is empty, or a partial record
+        lines.pop()
+        # Headers are parsed at once as a single JSON array
+        headers = j.loads(b'[' + b','.join(line.partition(b'\t')[0] for line in lines) + b']')
+        offset = 0
+        for (op, name, key), line in zip(headers, lines):
+            self._index(op, name, key, offset)
+            offset += len(line) + 1
+        return offset
+
+    def _index(self, op: str, name: str, key, offset: int):
+        self.records += 1
+        old = self.index.get(name)
+        if op == self.SET:
+            self.live -= len(old) if isinstance(old, dict) else old is not None
+            self.index[name] = offset
+            self.live += 1
+        elif op == self.HSET:
+            if not isinstance(old, dict):
+                self.live -= old is not None
+                old = self.index[name] = {}
+            self.live += key not in old
+            old[key] = offset
+        elif op == self.DELETE:
+            self.live -= len(old) if isinstance(old, dict) else 1
+            del self.index[name]
+        elif op == self.HDEL:
+            del old[key]
+            self.live -= 1
+
+    def _append(self, op: str, name: str, key=None, value=None):
+        line = j.dumps([op, name, key]).encode()
+        if op in (self.SET, self.HSET):
+            line += b'\t' + j.dumps(value).encode()
+        offset = self._writer.tell()
+        self._writer.write(line + b'\n')
+        self._writer.flush()
+        if self.fsync:
+            os.fsync(self._writer.fileno())
+        self._index(op, name, key, offset)
+        dead = self.records - self.live
+        if self.records >= self.compact_min and dead >= self.records * self.compact_ratio:
+            self.compact()
+
+    def _value(self, offset: int):
+        self._reader.seek(offset)
+        line = self._reader.readline()
+        return j.loads(line[line.index(b'\t') + 1:])
+
+    def compact(self):
+        """Rewrite the live records, dropping the superseded ones"""
+        self.log.debug(f'Compacting {self.name}: {self.records} records, {self.live} live')
+        tmp_filename = f'{self.filename}.tmp'
+        with open(tmp_filename, 'wb') as f:
+            for name, entry in self.index.items():
+                if entry == {}:
+                    # Hashes emptied by hdel are kept, as on JSONStore
+                    f.write(j.dumps([self.SET, name, None]).encode() + b'\t{}\n')
+                elif isinstance(entry, dict):
+                    for key, offset in entry.items():
+                        f.write(j.dumps([self.HSET, name, key]).encode() + b'\t')
+                        f.write(j.dumps(self._value(offset)).encode() + b'\n')
+                else:
+                    f.write(j.dumps([self.SET, name, None]).encode() + b'\t')
+                    f.write(j.dumps(self._value(entry)).encode() + b'\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.close()
+        os.replace(tmp_filename, self.filename)
+        self._open()
+
+    # Operations -------------------------------------------------------------
+    def _get(self, name: str, **kwargs):
+        entry = self.index[name]
+        if isinstance(entry, dict):
+            return {key: self._value(offset) for key, offset in entry.items()}
+        return self._value(entry)
+
+    def _hget(self, name: str, key: str, **kwargs):
+        entry = self.index[name]
+        if not isinstance(entry, dict):
+            return self._value(entry)[key]
+        return self._value(entry[key])
+
+    def _hash(self, name: str):
+        """Turn a dict set as a whole into a hash, so it can be changed by key"""
+        entry = self.index.get(name)
+        if entry is not None and not isinstance(entry, dict):
+            value = self._value(entry)
+            if isinstance(value, dict):
+                for key, item in value.items():
+                    self._append(self.HSET, name, key, item)
+        return self.index.get(name)
+
+    def _set(self, name: str, value, **kwargs):
+        self._append(self.SET, name, value=value)
+
+    def _hset(self, name, key, value, **kwargs):
+        self._hash(name)
+        self._append(self.HSET, name, key, value)
+
+    def _delete(self, name: str, **kwargs):
+        if name not in self.index:
+            raise KeyError(name)
+        self._append(self.DELETE, name)
+
+    def _hdel(self, name: str, key: str, **kwargs):
+        entry = self._hash(name)
+        if not isinstance(entry, dict) or key not in entry:
+            raise KeyError(key)
+        self._append(self.HDEL, name, key)
+
+    def _scan(self, prefix: str, **kwargs) -> list:
+        return [name for name in self.index if name.startswith(prefix)]
+
+
+class SQLiteStore(Store):
+    """Store on a SQLite database.
+
+    Plain values and hash fields live in two tables keyed by name and (name, key), so every
+    operation touches single rows. Values are kept as JSON text, or as blobs when bytes. The
+    database runs in WAL mode, readers don't block the writer, so several bot processes on the
+    same host can share it; writers wait up to timeout seconds for each other.
+    """
+    name = 'SQLite'
+    filename = 'store.db'
+
+    # Constant statements, compiled once by sqlite3's statement cache
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS store_values (name TEXT PRIMARY KEY, value) WITHOUT ROWID',
+        'CREATE TABLE IF NOT EXISTS store_hashes (name TEXT, key TEXT, value, PRIMARY KEY (name, key)) WITHOUT ROWID',
+    )
+    GET = 'SELECT value FROM store_values WHERE name = ?'
+    GET_HASH = 'SELECT key, value FROM store_hashes WHERE name = ?'
+    HGET = 'SELECT value FROM store_hashes WHERE name = ? AND key = ?'
+    SET = 'INSERT OR REPLACE INTO store_values (name, value) VALUES (?, ?)'
+    HSET = 'INSERT OR REPLACE INTO store_hashes (name, key, value) VALUES (?, ?, ?)'
+    DELETE = 'DELETE FROM store_values WHERE name = ?'
+    DELETE_HASH = 'DELETE FROM store_hashes WHERE name = ?'
+    HDEL = 'DELETE FROM store_hashes WHERE name = ? AND key = ?'
+    SCAN = ('SELECT name FROM store_values WHERE name >= ? AND name < ? '
+            'UNION SELECT DISTINCT name FROM store_hashes WHERE name >= ? AND name < ?')
+
+    def __init__(self, filename: str=None, timeout: float=30, logger: Logger=None):
+        super().__init__(logger)
+        if filename is not None:
+            self.filename = filename
+        self.timeout = timeout
+        self.lock_dir = f'{self.filename}.locks'
+        self._lock = threading.RLock()
+        self._connection = None
+        self._pid = None
+
+    @classmethod
+    def configure(cls, settings):
+        kwargs = super().configure(settings)
+        kwargs['filename'] = settings.get('filename')
+        if 'timeout' in settings:
+            kwargs['timeout'] = settings['timeout']
+        return kwargs
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        # Connections can't be shared with forked processes
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(self.filename, timeout=self.timeout, isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in self.SCHEMA:
+                connection.execute(statement)
+            self._connection, self._pid = connection, os.getpid()
+        return self._connection
+
+    def close(self):
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+
+    def _query(self, sql: str, params: tuple):
+        with self._lock:
+            return self.connection.execute(sql, params).fetchall()
+
+    @contextmanager
+    def _transaction(self):
+        """Connection in an immediate transaction, committed unless an exception is raised.
+        Nested transactions are part of the outer one."""
+        with self._lock:
+            connection = self.connection
+            if connection.in_transaction:
+                yield connection
+                return
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                yield connection
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+            connection.execute('COMMIT')
+
+    @staticmethod
+    def _dumps(value):
+        return value if isinstance(value, bytes) else j.dumps(value)
+
+    @staticmethod
+    def _loads(value):
+        return value if isinstance(value, bytes) else j.loads(value)
+
+    def _to_hash(self, connection: sqlite3.Connection, name: str):
+        """Turn a dict set as a whole into hash fields, so it can be changed by key"""
+        row = connection.execute(self.GET, (name,)).fetchone()
+        value = None if row is None else self._loads(row[0])
+        if isinstance(value, dict):
+            connection.execute(self.DELETE, (name,))
+            connection.executemany(self.HSET, [(name, key, self._dumps(item)) for key, item in value.items()])
+
+    def _get(self, name: str, **kwargs):
+        rows = self._query(self.GET, (name,))
+        if rows:
+            return self._loads(rows[0][0])
+        rows = self._query(self.GET_HASH, (name,))
+        if not rows:
+            raise KeyError(name)
+        return {key: self._loads(value) for key, value in rows}
+
+    def _hget(self, name: str, key: str, **kwargs):
+        rows = self._query(self.HGET, (name, key))
+        if not rows:
+            # A dict set as a whole
+            return self._get(name)[key]
+        return self._loads(rows[0][0])
+
+    def _set(self, name: str, value, **kwargs):
+        with self._transaction() as connection:
+            connection.execute(self.DELETE_HASH, (name,))
+            connection.execute(self.SET, (name, self._dumps(value)))
+
+    def _hset(self, name, key, value, **kwargs):
+        with self._transaction() as connection:
+            self._to_hash(connection, name)
+            connection.execute(self.DELETE, (name,))
+            connection.execute(self.HSET, (name, key, self._dumps(value)))
+
+    def _delete(self, name: str, **kwargs):
+        with self._transaction() as connection:
+            deleted = connection.execute(self.DELETE, (name,)).rowcount
+            deleted += connection.execute(self.DELETE_HASH, (name,)).rowcount
+        if not deleted:
+            raise KeyError(name)
+
+    def _hdel(self, name: str, key: str, **kwargs):
+        with self._transaction() as connection:
+            self._to_hash(connection, name)
+            if not connection.execute(self.HDEL, (name, key)).rowcount:
+                raise KeyError(key)
+
+    def _hgetall(self, name: str, **kwargs) -> dict:
+        rows = self._query(self.GET_HASH, (name,))
+        if rows:
+            return {key: self._loads(value) for key, value in rows}
+        return super()._hgetall(name, **kwargs)
+
+    def _hmset(self, name: str, mapping: dict, **kwargs):
+        with self._transaction() as connection:
+            self._to_hash(connection, name)
+            connection.execute(self.DELETE, (name,))
+            connection.executemany(self.HSET, [(name, key, self._dumps(value)) for key, value in mapping.items()])
+
+    def _mset(self, mapping: dict, **kwargs):
+        with self._transaction():
+            super()._mset(mapping, **kwargs)
+
+    def _scan(self, prefix: str, **kwargs) -> list:
+        # Range over the primary keys, instead of LIKE patterns
+        bounds = (prefix, prefix + '\U0010ffff')
+        rows = self._query(self.SCAN, bounds + bounds)
+        return [name for name, in rows]
+
+    def _execute(self, operations: list):
+        with self._transaction():
+            super()._execute(operations)
+
+    def _cas(self, name: str, value, version: int) -> bool:
+        """Version checked and bumped in the write transaction, no lock needed"""
+        with self._transaction() as connection:
+            row = connection.execute(self.HGET, (self.VERSIONS, name)).fetchone()
+            if (0 if row is None else self._loads(row[0])) != version:
+                return False
+            self._set(name, value)
+            connection.execute(self.HSET, (self.VERSIONS, name, self._dumps(version + 1)))
+        return True
+
+
+class NamespacedStore(Store):
+    """View of a store with every name prefixed, e.g. by bot and config.
+    Writes, expiry and flushes go to the underlying store, closing the view only flushes it."""
+
+    def __init__(self, store: Store, prefix: str):
+        self.name = store.name
+        super().__init__(store.log)
+        self.store = store
+        self.prefix = prefix
+        self.serializers = store.serializers
+        self.binary = store.binary
+        self.slow_threshold = store.slow_threshold
+
+    def _key(self, name: str) -> str:
+        return self.prefix + name
+
+    @property
+    def metrics(self) -> StoreMetrics:
+        return self.store.metrics
+
+    def _metric_name(self, name: str) -> str:
+        return self._key(name)
+
+    def namespace(self, prefix: str) -> 'NamespacedStore':
+        return NamespacedStore(self.store, self.prefix + prefix)
+
+    def _get(self, name: str, **kwargs):
+        return self.store._get(self._key(name), **kwargs)
+
+    def _hget(self, name: str, key: str, **kwargs):
+        return self.store._hget(self._key(name), key, **kwargs)
+
+    def _set(self, name: str, value, **kwargs):
+        return self.store._set(self._key(name), value=value, **kwargs)
+
+    def _hset(self, name: str, key: str, value, **kwargs):
+        return self.store._hset(self._key(name), key, value=value, **kwargs)
+
+    def _delete(self, name: str, **kwargs):
+        return self.store._delete(self._key(name), **kwargs)
+
+    def _hdel(self, name: str, key: str, **kwargs):
+        return self.store._hdel(self._key(name), key, **kwargs)
+
+    def _mget(self, names: list, **kwargs) -> list:
+        return self.store._mget([self._key(name) for name in names], **kwargs)
+
+    def _mset(self, mapping: dict, **kwargs):
+        return self.store._mset({self._key(name): value for name, value in mapping.items()}, **kwargs)
+
+    def _hmget(self, name: str, keys: list, **kwargs) -> list:
+        return self.store._hmget(self._key(name), keys, **kwargs)
+
+    def _hmset(self, name: str, mapping: dict, **kwargs):
+        return self.store._hmset(self._key(name), mapping, **kwargs)
+
+    def _hgetall(self, name: str, **kwargs) -> dict:
+        return self.store._hgetall(self._key(name), **kwargs)
+
+    def _scan(self, prefix: str, **kwargs) -> list:
+        return [name[len(self.prefix):] for name in self.store._scan(self._key(prefix), **kwargs)]
+
+    def _execute(self, operations: list):
+        return self.store._execute([(op, self._key(name), key, value) for op, name, key, value in operations])
+
+    def _expire(self, name: str, ttl: float):
+        return self.store._expire(self._key(name), ttl)
+
+    def _persist(self, name: str):
+        return self.store._persist(self._key(name))
+
+    def _expired(self, name: str) -> bool:
+        return self.store._expired(self._key(name))
+
+    def _ttl(self, name: str):
+        return self.store._ttl(self._key(name))
+
+    def lock(self, name: str, timeout: float=10.0, blocking_timeout: float=None) -> StoreLock:
+        return self.store.lock(self._key(name), timeout, blocking_timeout)
+
+    def _version(self, name: str) -> int:
+        return self.store._version(self._key(name))
+
+    def _get_versioned(self, name: str) -> tuple:
+        return self.store._get_versioned(self._key(name))
+
+    def _cas(self, name: str, value, version: int) -> bool:
+        return self.store._cas(self._key(name), value, version)
+
+    def sweep(self) -> int:
+        self._swept = time.time()
+        return self.store.sweep()
+
+    def flush(self):
+        return self.store.flush()
+
+
+class MemoryStore(Store):
+    name = 'Memory'
+
+    def __init__(self, logger: Logger=None):
+        super().__init__(logger)
+        self.data = {}
+
+    def _get(self, name: str, **kwargs):
+        return self.data[name]
+
+    def _hget(self, name: str, key: str, **kwargs):
+        return self.data[name][key]
+
+    def _set(self, name: str, value, **kwargs):
+        self.data[name] = value
+
+    def _hset(self, name, key, value, **kwargs):
+        old = self.data.get(name)
         if not isinstance(old, dict):
-            old = {}
-        data[name] = {**old, key: value}
-        return self._write(data)
+            old = self.data[name] = {}
+        old[key] = value
 
     def _delete(self, name: str, **kwargs):
-        data = self._read() or {}
-        data.pop(name)
-        return self._write(data)
+        del self.data[name]
 
     def _hdel(self, name: str, key: str, **kwargs):
-        data = self._get(name)
-        data.pop(key)
-        return self._write(data)
+        del self.data[name][key]
+
+    def _scan(self, prefix: str, **kwargs) -> list:
+        return [name for name in self.data if name.startswith(prefix)]
 
 
 class RedisStore(Store):
@@ -232,3 +1310,80 @@ class RedisStore(Store):
         if not deleted:
             raise KeyError
         return deleted
+
+    def close(self):
+        self.r.connection_pool.disconnect()
+
+    # Native expiry
+    def _expire(self, name: str, ttl: float):
+        self.r.pexpire(name, int(ttl * 1000))
+
+    def _persist(self, name: str):
+        # SET and DEL already drop TTLs
+        pass
+
+    def _expired(self, name: str) -> bool:
+        return False
+
+    def _ttl(self, name: str):
+        ttl = self.r.pttl(name)
+        return None if ttl is None or ttl < 0 else ttl / 1000
+
+    def sweep(self) -> int:
+        return 0
+
+    # Versions in a hash, checked and bumped by a script, atomically
+    CAS = """
+    local version = tonumber(redis.call('HGET', KEYS[2], KEYS[1]) or '0')
+    if version ~= tonumber(ARGV[2]) then return 0 end
+    redis.call('SET', KEYS[1], ARGV[1])
+    redis.call('HSET', KEYS[2], KEYS[1], version + 1)
+    return 1
+    """
+
+    def lock(self, name: str, timeout: float=10.0, blocking_timeout: float=None) -> StoreLock:
+        return RedisLock(self.r, f'__lock__:{name}', name, timeout, blocking_timeout)
+
+    def _get_versioned(self, name: str) -> tuple:
+        value, version = self.r.pipeline(transaction=True).get(name).hget(self.VERSIONS, name).execute()
+        return value, int(version or 0)
+
+    def _cas(self, name: str, value, version: int) -> bool:
+        return bool(self.r.eval(self.CAS, 2, name, self.VERSIONS, value, version))
+
+    def _mget(self, names: list, **kwargs) -> list:
+        return self.r.mget(names) if names else []
+
+    def _mset(self, mapping: dict, **kwargs):
+        if mapping:
+            self.r.mset(mapping)
+
+    def _hmget(self, name: str, keys: list, **kwargs) -> list:
+        return self.r.hmget(name, keys) if keys else []
+
+    def _hmset(self, name: str, mapping: dict, **kwargs):
+        if mapping:
+            self.r.hset(name, mapping=mapping)
+
+    def _hgetall(self, name: str, **kwargs) -> dict:
+        return {key.decode(): value for key, value in self.r.hgetall(name).items()}
+
+    def _scan(self, prefix: str, **kwargs) -> list:
+        pattern = ''.join(f'\\{c}' if c in '*?[]\\' else c for c in prefix) + '*'
+        return [name.decode() for name in self.r.scan_iter(match=pattern, count=1000)]
+
+    def _execute(self, operations: list):
+        """Operations in a MULTI/EXEC transaction, a single round trip"""
+        pipe = self.r.pipeline(transaction=True)
+        for op, name, key, value in operations:
+            if op == 'set':
+                pipe.set(name, value)
+            elif op == 'hset':
+                pipe.hset(name, key, value)
+            elif op == 'delete':
+                pipe.delete(name)
+            elif op == 'hdel':
+                pipe.hdel(name, key)
+            elif op == 'expire':
+                pipe.pexpire(name, int(value * 1000))
+        return pipe.execute()
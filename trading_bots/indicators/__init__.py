@@ -0,0 +1,3 @@
+from .batch import *
+from .candles import *
+from .streaming import *
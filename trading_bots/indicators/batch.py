@@ -0,0 +1,145 @@
+"""
+Batch technical indicators over whole series, with NumPy.
+Values match TA-Lib's: leading entries without enough history are NaN.
+"""
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    pass
+
+__all__ = [
+    'sma',
+    'ema',
+    'wilder',
+    'stddev',
+    'bbands',
+    'rsi',
+    'true_range',
+    'atr',
+]
+
+# Largest growth of the per-block weights in _smooth, keeps rounding errors negligible
+MAX_BLOCK_GROWTH = 1e12
+
+
+def _nan(n: int):
+    return np.full(n, np.nan)
+
+
+def _smooth(values, alpha: float, seed: float):
+    """Exponential smoothing y[t] = (1 - alpha) * y[t-1] + alpha * x[t], starting from y[-1] = seed.
+
+    The recursion is solved in closed form over blocks, y[k] = d^(k+1) * y0 + alpha * d^k * sum(x[j] / d^j),
+    with d = 1 - alpha, so it runs as array operations instead of a Python loop.
+    """
+    decay = 1 - alpha
+    out = np.empty(len(values))
+    if decay <= 0:
+        out[:] = values
+        return out
+    block = max(1, int(math.log(MAX_BLOCK_GROWTH) / -math.log(decay)))
+    steps = np.arange(block)
+    weights = decay ** -steps
+    powers = decay ** (steps + 1)
+    prev = seed
+    for start in range(0, len(values), block):
+        chunk = values[start:start + block]
+        n = len(chunk)
+        acc = np.cumsum(chunk * weights[:n]) * powers[:n] * alpha / decay
+        out[start:start + n] = acc + powers[:n] * prev
+        prev = out[start + n - 1]
+    return out
+
+
+def sma(values, periods: int=30):
+    """Simple moving average"""
+    values = np.asarray(values, dtype=float)
+    out = _nan(len(values))
+    if len(values) < periods:
+        return out
+    csum = np.cumsum(np.insert(values, 0, 0.0))
+    out[periods - 1:] = (csum[periods:] - csum[:-periods]) / periods
+    return out
+
+
+def ema(values, periods: int=30):
+    """Exponential moving average seeded with the simple average of the first periods"""
+    values = np.asarray(values, dtype=float)
+    out = _nan(len(values))
+    if len(values) < periods:
+        return out
+    seed = values[:periods].mean()
+    out[periods - 1] = seed
+    out[periods:] = _smooth(values[periods:], 2 / (periods + 1), seed)
+    return out
+
+
+def wilder(values, periods: int=14):
+    """Wilder's smoothing (alpha = 1 / periods) seeded with the simple average of the first periods"""
+    values = np.asarray(values, dtype=float)
+    out = _nan(len(values))
+    if len(values) < periods:
+        return out
+    seed = values[:periods].mean()
+    out[periods - 1] = seed
+    out[periods:] = _smooth(values[periods:], 1 / periods, seed)
+    return out
+
+
+def stddev(values, periods: int=5, nbdev: float=1.0):
+    """Rolling population standard deviation"""
+    values = np.asarray(values, dtype=float)
+    out = _nan(len(values))
+    if len(values) < periods:
+        return out
+    # Center values to avoid cancellation in the sum of squares
+    centered = values - values.mean()
+    csum = np.cumsum(np.insert(centered, 0, 0.0))
+    csum2 = np.cumsum(np.insert(centered ** 2, 0, 0.0))
+    mean = (csum[periods:] - csum[:-periods]) / periods
+    var = (csum2[periods:] - csum2[:-periods]) / periods - mean ** 2
+    out[periods - 1:] = np.sqrt(np.maximum(var, 0)) * nbdev
+    return out
+
+
+def bbands(values, periods: int=5, nbdevup: float=2.0, nbdevdn: float=2.0):
+    """Bollinger Bands, returns (upper, middle, lower) like TA-Lib"""
+    middle = sma(values, periods)
+    deviation = stddev(values, periods)
+    return middle + deviation * nbdevup, middle, middle - deviation * nbdevdn
+
+
+def rsi(values, periods: int=14):
+    """Relative Strength Index with Wilder's smoothing"""
+    values = np.asarray(values, dtype=float)
+    out = _nan(len(values))
+    if len(values) <= periods:
+        return out
+    deltas = np.diff(values)
+    avg_gain = wilder(np.maximum(deltas, 0), periods)[periods - 1:]
+    avg_loss = wilder(np.maximum(-deltas, 0), periods)[periods - 1:]
+    total = avg_gain + avg_loss
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out[periods:] = np.where(total > 0, 100 * avg_gain / total, 0.0)
+    return out
+
+
+def true_range(high, low, close):
+    """True range, NaN on the first entry as it has no previous close"""
+    high, low, close = (np.asarray(a, dtype=float) for a in (high, low, close))
+    out = _nan(len(close))
+    prev_close = close[:-1]
+    out[1:] = np.maximum(high[1:], prev_close) - np.minimum(low[1:], prev_close)
+    return out
+
+
+def atr(high, low, close, periods: int=14):
+    """Average True Range with Wilder's smoothing"""
+    tr = true_range(high, low, close)
+    out = _nan(len(tr))
+    if len(tr) <= periods:
+        return out
+    out[1:] = wilder(tr[1:], periods)
+    return out
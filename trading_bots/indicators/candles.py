@@ -0,0 +1,189 @@
+import math
+
+from trading_bots.utils import interval_to_seconds
+
+try:
+    import numpy as np
+except ImportError:
+    pass
+
+__all__ = [
+    'CANDLE_FIELDS',
+    'CandleBuffer',
+    'CandleAggregator',
+]
+
+CANDLE_FIELDS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+TIMESTAMP, OPEN, HIGH, LOW, CLOSE, VOLUME = range(len(CANDLE_FIELDS))
+
+
+class CandleBuffer:
+    """OHLCV candles of one interval, built from trades as they arrive.
+
+    Closed candles are kept in a fixed size ring buffer, only the open candle changes on each
+    trade. Intervals without trades are closed as flat candles at the previous close. Trades
+    older than the open candle are ignored. Listeners are called with every closed candle, as a {field: value} dict.
+    """
+
+    def __init__(self, interval: (str, int)='5min', size: int=1000):
+        assert size > 0, 'Size must be positive!'
+        self.interval = interval
+        self.seconds = interval_to_seconds(interval)
+        self.size = size
+        self.data = np.full((size, len(CANDLE_FIELDS)), np.nan)
+        self.count = 0  # Closed candles ever, the next one goes to data[count % size]
+        self.open = None
+        self.flat = False  # Open candle was started by advance, without trades yet
+        self.last_timestamp = None
+        self.listeners = []
+
+    def __len__(self):
+        return min(self.count, self.size)
+
+    def start_of(self, timestamp: float):
+        return math.floor(timestamp / self.seconds) * self.seconds
+
+    def _close(self, candle: list):
+        self.data[self.count % self.size] = candle
+        self.count += 1
+        if self.listeners:
+            candle = dict(zip(CANDLE_FIELDS, candle))
+            for listener in self.listeners:
+                listener(candle)
+
+    def _roll(self, start: float):
+        """Close the open candle and the empty ones until start"""
+        candle = self.open
+        self._close(candle)
+        close = candle[CLOSE]
+        # Only the last size empty candles can remain in the buffer
+        empty = int(round((start - candle[TIMESTAMP]) / self.seconds)) - 1
+        skipped = max(empty - self.size, 0)
+        self.count += skipped
+        for i in range(skipped + 1, empty + 1):
+            self._close([candle[TIMESTAMP] + i * self.seconds, close, close, close, close, 0.0])
+
+    def update(self, timestamp: float, rate: float, amount: float=0.0) -> bool:
+        """Add a trade, returns False if it was older than the open candle"""
+        start = self.start_of(timestamp)
+        candle = self.open
+        if candle is None or start > candle[TIMESTAMP] or (self.flat and start == candle[TIMESTAMP]):
+            if candle is not None and start > candle[TIMESTAMP]:
+                self._roll(start)
+            self.open = [start, rate, rate, rate, rate, abs(amount)]
+            self.flat = False
+        elif start < candle[TIMESTAMP]:
+            return False
+        else:
+            if rate > candle[HIGH]:
+                candle[HIGH] = rate
+            elif rate < candle[LOW]:
+                candle[LOW] = rate
+            candle[CLOSE] = rate
+            candle[VOLUME] += abs(amount)
+        self.last_timestamp = timestamp
+        return True
+
+    def update_many(self, timestamps, rates, amounts=None) -> int:
+        amounts = amounts if amounts is not None else [0.0] * len(timestamps)
+        added = 0
+        for timestamp, rate, amount in zip(timestamps, rates, amounts):
+            added += self.update(float(timestamp), float(rate), float(amount))
+        return added
+
+    def add_trades(self, trades: list) -> int:
+        """Add trade dicts with timestamp, rate and amount, e.g. as a trade ingestion consumer"""
+        return sum(self.update(trade['timestamp'], trade['rate'], trade['amount']) for trade in trades)
+
+    def advance(self, timestamp: float):
+        """Close the open candle if its interval ended before timestamp, even without new trades"""
+        start = self.start_of(timestamp)
+        if self.open is not None and start > self.open[TIMESTAMP]:
+            close = self.open[CLOSE]
+            self._roll(start)
+            self.open = [start, close, close, close, close, 0.0]
+            self.flat = True
+
+    def closed(self, n: int=None):
+        """Last n closed candles, oldest first, as an array with CANDLE_FIELDS columns"""
+        available = len(self)
+        n = available if n is None else min(n, available)
+        end = self.count % self.size
+        if end >= n:
+            return self.data[end - n:end].copy()
+        return np.concatenate((self.data[self.size - (n - end):], self.data[:end]))
+
+    def candles(self, n: int=None, include_open: bool=True) -> dict:
+        """Last n candles as {field: array}, including the open candle by default"""
+        if include_open and self.open is not None:
+            data = self.closed(None if n is None else n - 1)
+            data = np.concatenate((data, [self.open]))
+        else:
+            data = self.closed(n)
+        return {field: data[:, i] for i, field in enumerate(CANDLE_FIELDS)}
+
+    # Checkpoints ------------------------------------------------------------
+    def get_state(self) -> dict:
+        """JSON serializable state"""
+        return {
+            'interval': self.interval,
+            'size': self.size,
+            'count': self.count,
+            'closed': self.closed().tolist(),
+            'open': self.open,
+            'flat': self.flat,
+            'last_timestamp': self.last_timestamp,
+        }
+
+    @classmethod
+    def from_state(cls, state: dict):
+        buffer = cls(state['interval'], state['size'])
+        closed = np.asarray(state['closed'], dtype=float).reshape(-1, len(CANDLE_FIELDS))
+        buffer.count = state['count']
+        for i, candle in enumerate(closed):
+            buffer.data[(buffer.count - len(closed) + i) % buffer.size] = candle
+        buffer.open = state['open']
+        buffer.flat = state.get('flat', False)
+        buffer.last_timestamp = state['last_timestamp']
+        return buffer
+
+
+class CandleAggregator:
+    """Candles of several intervals from the same trades"""
+
+    def __init__(self, intervals=('5min',), size: int=1000):
+        self.buffers = {interval: CandleBuffer(interval, size) for interval in intervals}
+
+    def __getitem__(self, interval) -> CandleBuffer:
+        return self.buffers[interval]
+
+    @property
+    def last_timestamp(self):
+        return max((b.last_timestamp for b in self.buffers.values() if b.last_timestamp is not None), default=None)
+
+    def update(self, timestamp: float, rate: float, amount: float=0.0):
+        for buffer in self.buffers.values():
+            buffer.update(timestamp, rate, amount)
+
+    def update_many(self, timestamps, rates, amounts=None):
+        for buffer in self.buffers.values():
+            buffer.update_many(timestamps, rates, amounts)
+
+    def add_trades(self, trades: list):
+        for buffer in self.buffers.values():
+            buffer.add_trades(trades)
+
+    def advance(self, timestamp: float):
+        for buffer in self.buffers.values():
+            buffer.advance(timestamp)
+
+    def get_state(self) -> dict:
+        return {str(interval): buffer.get_state() for interval, buffer in self.buffers.items()}
+
+    @classmethod
+    def from_state(cls, state: dict):
+        aggregator = cls(intervals=())
+        for buffer_state in state.values():
+            buffer = CandleBuffer.from_state(buffer_state)
+            aggregator.buffers[buffer.interval] = buffer
+        return aggregator
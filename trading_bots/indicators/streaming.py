@@ -0,0 +1,241 @@
+"""
+Incremental technical indicators, updated in O(1) per value.
+Values match the batch ones: NaN until there is enough history.
+"""
+import math
+from collections import deque
+
+__all__ = [
+    'Indicator',
+    'EMA',
+    'Wilder',
+    'BBANDS',
+    'RSI',
+    'ATR',
+]
+
+NAN = float('nan')
+
+
+class Indicator:
+    """Base incremental indicator.
+
+    `update` adds a closed value and returns the indicator, `peek` returns what the indicator
+    would be with a value added, without changing it (e.g. for the open candle). The state
+    is JSON serializable, so indicators can be checkpointed to a store and resumed.
+    """
+    params = ()
+    fields = ()
+
+    def get_state(self) -> dict:
+        state = {}
+        for field in self.fields:
+            value = getattr(self, field)
+            state[field] = list(value) if isinstance(value, deque) else value
+        return {'params': {param: getattr(self, param) for param in self.params}, 'state': state}
+
+    @classmethod
+    def from_state(cls, state: dict):
+        indicator = cls(**state['params'])
+        for field, value in state['state'].items():
+            current = getattr(indicator, field)
+            if isinstance(current, deque):
+                current.extend(value)
+            else:
+                setattr(indicator, field, value)
+        return indicator
+
+    def save(self, store, name: str, key: str):
+        store.hset(name, key, value=self.get_state(), serializer='json')
+
+    @classmethod
+    def load(cls, store, name: str, key: str):
+        """Indicator checkpointed on a store, None if there is none"""
+        state = store.hget(name, key, serializer='json')
+        return cls.from_state(state) if state else None
+
+
+class _Smoothing(Indicator):
+    """Exponential smoothing seeded with the simple average of the first periods values"""
+    params = ('periods',)
+    fields = ('count', 'total', 'value')
+
+    def __init__(self, periods: int):
+        assert periods > 0, 'Periods must be positive!'
+        self.periods = periods
+        self.alpha = self._alpha(periods)
+        self.count = 0
+        self.total = 0.0
+        self.value = NAN
+
+    @staticmethod
+    def _alpha(periods: int) -> float:
+        raise NotImplementedError
+
+    def _next(self, x: float):
+        if self.count >= self.periods:
+            return (1 - self.alpha) * self.value + self.alpha * x, self.total
+        total = self.total + x
+        return (total / self.periods if self.count + 1 == self.periods else NAN), total
+
+    def update(self, x: float) -> float:
+        self.value, self.total = self._next(x)
+        self.count += 1
+        return self.value
+
+    def peek(self, x: float) -> float:
+        return self._next(x)[0]
+
+
+class EMA(_Smoothing):
+    """Exponential moving average"""
+
+    @staticmethod
+    def _alpha(periods: int) -> float:
+        return 2 / (periods + 1)
+
+
+class Wilder(_Smoothing):
+    """Wilder's smoothing"""
+
+    @staticmethod
+    def _alpha(periods: int) -> float:
+        return 1 / periods
+
+
+class BBANDS(Indicator):
+    """Bollinger Bands over a rolling window, (upper, middle, lower) like TA-Lib.
+    Running sums are recomputed from the window every `periods` updates to avoid drift."""
+    params = ('periods', 'nbdevup', 'nbdevdn')
+    fields = ('window', 'total', 'total_sq', 'updates')
+
+    def __init__(self, periods: int=5, nbdevup: float=2.0, nbdevdn: float=2.0):
+        assert periods > 0, 'Periods must be positive!'
+        self.periods = periods
+        self.nbdevup = nbdevup
+        self.nbdevdn = nbdevdn
+        self.window = deque(maxlen=periods)
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.updates = 0
+
+    def _bands(self, total: float, total_sq: float, n: int):
+        if n < self.periods:
+            return NAN, NAN, NAN
+        mean = total / n
+        std = math.sqrt(max(total_sq / n - mean * mean, 0.0))
+        return mean + self.nbdevup * std, mean, mean - self.nbdevdn * std
+
+    def _sums(self, x: float):
+        total, total_sq = self.total + x, self.total_sq + x * x
+        if len(self.window) == self.periods:
+            oldest = self.window[0]
+            total, total_sq = total - oldest, total_sq - oldest * oldest
+        return total, total_sq
+
+    def update(self, x: float):
+        self.total, self.total_sq = self._sums(x)
+        self.window.append(x)
+        self.updates += 1
+        if self.updates % self.periods == 0:
+            self.total = math.fsum(self.window)
+            self.total_sq = math.fsum(v * v for v in self.window)
+        return self.value
+
+    def peek(self, x: float):
+        return self._bands(*self._sums(x), min(len(self.window) + 1, self.periods))
+
+    @property
+    def value(self):
+        return self._bands(self.total, self.total_sq, len(self.window))
+
+
+class RSI(Indicator):
+    """Relative Strength Index with Wilder's smoothing"""
+    params = ('periods',)
+
+    def __init__(self, periods: int=14):
+        self.periods = periods
+        self.last = None
+        self.gain = Wilder(periods)
+        self.loss = Wilder(periods)
+
+    def get_state(self) -> dict:
+        return {
+            'params': {'periods': self.periods},
+            'state': {'last': self.last, 'gain': self.gain.get_state(), 'loss': self.loss.get_state()},
+        }
+
+    @classmethod
+    def from_state(cls, state: dict):
+        indicator = cls(**state['params'])
+        indicator.last = state['state']['last']
+        indicator.gain = Wilder.from_state(state['state']['gain'])
+        indicator.loss = Wilder.from_state(state['state']['loss'])
+        return indicator
+
+    @staticmethod
+    def _rsi(gain: float, loss: float) -> float:
+        total = gain + loss
+        if math.isnan(total):
+            return NAN
+        return 100 * gain / total if total > 0 else 0.0
+
+    def update(self, x: float) -> float:
+        if self.last is not None:
+            delta = x - self.last
+            self.gain.update(max(delta, 0.0))
+            self.loss.update(max(-delta, 0.0))
+        self.last = x
+        return self.value
+
+    def peek(self, x: float) -> float:
+        if self.last is None:
+            return NAN
+        delta = x - self.last
+        return self._rsi(self.gain.peek(max(delta, 0.0)), self.loss.peek(max(-delta, 0.0)))
+
+    @property
+    def value(self) -> float:
+        return self._rsi(self.gain.value, self.loss.value)
+
+
+class ATR(Indicator):
+    """Average True Range with Wilder's smoothing"""
+    params = ('periods',)
+
+    def __init__(self, periods: int=14):
+        self.periods = periods
+        self.last_close = None
+        self.smoothing = Wilder(periods)
+
+    def get_state(self) -> dict:
+        return {
+            'params': {'periods': self.periods},
+            'state': {'last_close': self.last_close, 'smoothing': self.smoothing.get_state()},
+        }
+
+    @classmethod
+    def from_state(cls, state: dict):
+        indicator = cls(**state['params'])
+        indicator.last_close = state['state']['last_close']
+        indicator.smoothing = Wilder.from_state(state['state']['smoothing'])
+        return indicator
+
+    def _true_range(self, high: float, low: float) -> float:
+        return max(high, self.last_close) - min(low, self.last_close)
+
+    def update(self, high: float, low: float, close: float) -> float:
+        if self.last_close is not None:
+            self.smoothing.update(self._true_range(high, low))
+        self.last_close = close
+        return self.value
+
+    def peek(self, high: float, low: float, close: float) -> float:
+        if self.last_close is None:
+            return NAN
+        return self.smoothing.peek(self._true_range(high, low))
+
+    @property
+    def value(self) -> float:
+        return self.smoothing.value
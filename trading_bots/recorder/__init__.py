@@ -0,0 +1,2 @@
+from .columns import *
+from .recorder import *
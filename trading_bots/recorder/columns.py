@@ -0,0 +1,179 @@
+import json
+import os
+import zlib
+from datetime import datetime, timezone
+
+try:
+    import numpy as np
+except ImportError:
+    pass
+
+__all__ = [
+    'ColumnarLog',
+    'day_of',
+]
+
+DAY_FORMAT = '%Y-%m-%d'
+SECONDS_PER_DAY = 86400
+SCHEMA_FILE = 'schema.json'
+RAW_SUFFIX = '.bin'
+SEALED_SUFFIX = '.bin.z'
+
+
+def day_of(timestamp: float) -> str:
+    """UTC day partition name of a timestamp"""
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime(DAY_FORMAT)
+
+
+def _day_start(day: str) -> float:
+    return datetime.strptime(day, DAY_FORMAT).replace(tzinfo=timezone.utc).timestamp()
+
+
+class ColumnarLog:
+    """Append-only columnar data, partitioned by UTC day.
+
+    Every column is a raw binary file of fixed size rows (a NumPy dtype and row shape) under
+    <path>/<day>/<column>.bin, and rows are ordered by the float 'timestamp' column. Open days
+    are memory mapped when read, so reads don't copy. Days that won't change anymore can be
+    sealed, which compresses their columns with zlib; those are decompressed once per read.
+    Rows partially written by an interrupted append are ignored.
+    """
+
+    def __init__(self, path: str, schema: dict=None, compression_level: int=6):
+        self.path = path
+        self.compression_level = compression_level
+        schema_path = os.path.join(path, SCHEMA_FILE)
+        if os.path.exists(schema_path):
+            with open(schema_path) as f:
+                stored = {name: (dtype, tuple(shape)) for name, (dtype, shape) in json.load(f).items()}
+            assert schema is None or self._normalize(schema) == stored, f'Schema differs from {schema_path}!'
+            schema = stored
+        else:
+            assert schema, f'No schema for new log {path}!'
+            schema = self._normalize(schema)
+            os.makedirs(path, exist_ok=True)
+            with open(schema_path, 'w') as f:
+                json.dump({name: [dtype, list(shape)] for name, (dtype, shape) in schema.items()}, f)
+        assert 'timestamp' in schema, 'Schema must have a timestamp column!'
+        self.schema = schema
+        self.dtypes = {name: np.dtype((dtype, shape)) if shape else np.dtype(dtype)
+                       for name, (dtype, shape) in schema.items()}
+
+    @staticmethod
+    def _normalize(schema: dict) -> dict:
+        normalized = {}
+        for name, spec in schema.items():
+            dtype, shape = (spec, ()) if not isinstance(spec, (tuple, list)) else spec
+            normalized[name] = (np.dtype(dtype).str, tuple(shape))
+        return normalized
+
+    def _column_path(self, day: str, name: str, suffix: str=RAW_SUFFIX):
+        return os.path.join(self.path, day, name + suffix)
+
+    def days(self) -> list:
+        return sorted(d for d in os.listdir(self.path) if os.path.isdir(os.path.join(self.path, d)))
+
+    def is_sealed(self, day: str) -> bool:
+        return os.path.exists(self._column_path(day, 'timestamp', SEALED_SUFFIX))
+
+    # Write ------------------------------------------------------------------
+    def append(self, **columns):
+        """Append rows, given as one array-like per column. Rows are split into their day partitions."""
+        assert set(columns) == set(self.schema), f'Columns must be {sorted(self.schema)}!'
+        arrays = {name: np.asarray(values, dtype=self.dtypes[name].base).reshape((-1,) + self.dtypes[name].shape)
+                  for name, values in columns.items()}
+        timestamps = arrays['timestamp']
+        if not len(timestamps):
+            return 0
+        day_numbers = np.floor(timestamps / SECONDS_PER_DAY).astype(np.int64)
+        for day_number in dict.fromkeys(day_numbers.tolist()):
+            mask = day_numbers == day_number
+            rows = arrays if mask.all() else {name: values[mask] for name, values in arrays.items()}
+            self._append_day(day_of(day_number * SECONDS_PER_DAY), rows)
+        return len(timestamps)
+
+    def _append_day(self, day: str, arrays: dict):
+        assert not self.is_sealed(day), f'Day {day} is sealed!'
+        os.makedirs(os.path.join(self.path, day), exist_ok=True)
+        rows = self._raw_rows(day)
+        for name, values in arrays.items():
+            path = self._column_path(day, name)
+            with open(path, 'ab') as f:
+                # Drop a partial row left by an interrupted append before writing
+                if f.tell() != rows * self.dtypes[name].itemsize:
+                    f.truncate(rows * self.dtypes[name].itemsize)
+                f.write(np.ascontiguousarray(values).tobytes())
+
+    def _raw_rows(self, day: str) -> int:
+        rows = []
+        for name, dtype in self.dtypes.items():
+            path = self._column_path(day, name)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            rows.append(size // dtype.itemsize)
+        return min(rows)
+
+    def seal(self, day: str):
+        """Compress a day's columns, the day becomes read only"""
+        if self.is_sealed(day):
+            return
+        rows = self._raw_rows(day)
+        for name, dtype in self.dtypes.items():
+            raw_path = self._column_path(day, name)
+            with open(raw_path, 'rb') as f:
+                data = f.read(rows * dtype.itemsize)
+            tmp_path = self._column_path(day, name, SEALED_SUFFIX + '.tmp')
+            with open(tmp_path, 'wb') as f:
+                f.write(zlib.compress(data, self.compression_level))
+            os.replace(tmp_path, self._column_path(day, name, SEALED_SUFFIX))
+        for name in self.dtypes:
+            os.remove(self._column_path(day, name))
+
+    def seal_before(self, timestamp: float):
+        """Seal every day before the day of timestamp"""
+        current = day_of(timestamp)
+        for day in self.days():
+            if day < current:
+                self.seal(day)
+
+    # Read -------------------------------------------------------------------
+    def read_day(self, day: str) -> dict:
+        """Columns of a day, memory mapped unless the day is sealed"""
+        if self.is_sealed(day):
+            columns = {}
+            for name, dtype in self.dtypes.items():
+                with open(self._column_path(day, name, SEALED_SUFFIX), 'rb') as f:
+                    columns[name] = np.frombuffer(zlib.decompress(f.read()), dtype=dtype.base).reshape(
+                        (-1,) + dtype.shape)
+            return columns
+        rows = self._raw_rows(day)
+        if not rows:
+            return {name: np.empty((0,) + dtype.shape, dtype=dtype.base) for name, dtype in self.dtypes.items()}
+        return {name: np.memmap(self._column_path(day, name), dtype=dtype.base, mode='r',
+                                shape=(rows,) + dtype.shape)
+                for name, dtype in self.dtypes.items()}
+
+    def partitions(self, start: float=None, end: float=None):
+        """Yield (day, columns) between start and end timestamps, sliced without copying"""
+        first = day_of(start) if start is not None else None
+        last = day_of(end) if end is not None else None
+        for day in self.days():
+            if (first and day < first) or (last and day > last):
+                continue
+            columns = self.read_day(day)
+            timestamps = columns['timestamp']
+            lo = 0 if start is None or _day_start(day) >= start else np.searchsorted(timestamps, start, 'left')
+            hi = len(timestamps) if end is None else np.searchsorted(timestamps, end, 'right')
+            if hi > lo:
+                yield day, {name: values[lo:hi] for name, values in columns.items()}
+
+    def read(self, start: float=None, end: float=None) -> dict:
+        """Columns between start and end timestamps. Only a single day partition is returned without copying."""
+        parts = [columns for _, columns in self.partitions(start, end)]
+        if len(parts) == 1:
+            return parts[0]
+        if not parts:
+            return {name: np.empty((0,) + dtype.shape, dtype=dtype.base) for name, dtype in self.dtypes.items()}
+        return {name: np.concatenate([part[name] for part in parts]) for name in self.dtypes}
+
+    def __len__(self):
+        return sum(len(self.read_day(day)['timestamp']) for day in self.days())
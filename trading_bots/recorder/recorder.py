@@ -0,0 +1,184 @@
+import json
+import os
+import time
+from logging import Logger
+
+from trading_bots.contrib.clients import MarketClient
+from trading_bots.core.logging import get_logger
+from .columns import ColumnarLog, day_of
+
+try:
+    import numpy as np
+except ImportError:
+    pass
+
+__all__ = [
+    'ticker_schema',
+    'book_schema',
+    'trade_schema',
+    'MarketRecorder',
+]
+
+ticker_schema = {
+    'timestamp': 'f8',
+    'bid': 'f8',
+    'bid_amount': 'f8',
+    'ask': 'f8',
+    'ask_amount': 'f8',
+}
+
+trade_schema = {
+    'timestamp': 'f8',
+    'rate': 'f8',
+    'amount': 'f8',  # Negative on sells
+}
+
+
+# Last recorded trade timestamp and the ids at it, next to the trades log
+CURSOR_FILE = 'cursor.json'
+
+
+def book_schema(depth: int) -> dict:
+    """Top depth bid and ask levels as [price, amount], padded with zeros"""
+    return {
+        'timestamp': 'f8',
+        'book': ('f8', (2, depth, 2)),
+    }
+
+
+class MarketRecorder:
+    """Poll market clients and record tickers, order books and trades.
+
+    Data of every client goes to <directory>/<exchange>/<market>/{ticker,book,trades}, as
+    ColumnarLog day partitions. Tickers are the top of the order book, so they are recorded
+    the same way for every exchange. Trades are fetched since the last recorded one and
+    deduplicated by id, and only order books are recorded of clients without trades.
+    Days are sealed (compressed) once the recorder moves past them.
+    """
+
+    def __init__(self, clients: list, directory: str, depth: int=10, seal: bool=True, logger: Logger=None):
+        for client in clients:
+            assert isinstance(client, MarketClient), f'{client} is not a MarketClient!'
+        self.clients = clients
+        self.directory = directory
+        self.depth = depth
+        self.seal = seal
+        self.log = logger or get_logger(__name__)
+        self.logs = {}
+        self.last_trade = {}
+        for client in clients:
+            key = self._key(client)
+            path = os.path.join(directory, client.name, str(client.market))
+            self.logs[key] = {
+                'ticker': ColumnarLog(os.path.join(path, 'ticker'), ticker_schema),
+                'book': ColumnarLog(os.path.join(path, 'book'), book_schema(depth)),
+            }
+            if type(client)._trades is MarketClient._trades:
+                self.log.warning(f'{client.name} trades are not supported, recording {client.market} books only')
+                continue
+            self.logs[key]['trades'] = ColumnarLog(os.path.join(path, 'trades'), trade_schema)
+            self.last_trade[key] = self._resume_last_trade(self.logs[key]['trades'])
+        self.day = None
+
+    @staticmethod
+    def _key(client: MarketClient):
+        return client.name, str(client.market)
+
+    @staticmethod
+    def _resume_last_trade(trades_log: ColumnarLog):
+        days = trades_log.days()
+        if not days:
+            return None, set()
+        timestamps = trades_log.read_day(days[-1])['timestamp']
+        if not len(timestamps):
+            return None, set()
+        last = float(timestamps[-1])
+        cursor_path = os.path.join(trades_log.path, CURSOR_FILE)
+        if os.path.exists(cursor_path):
+            with open(cursor_path) as f:
+                cursor = json.load(f)
+            if cursor['timestamp'] == last:
+                return last, set(cursor['ids'])
+        # Ids of trades at the last timestamp are missing, those are assumed complete
+        return last, None
+
+    @staticmethod
+    def _save_cursor(trades_log: ColumnarLog, last: float, ids: set):
+        path = os.path.join(trades_log.path, CURSOR_FILE)
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump({'timestamp': last, 'ids': list(ids)}, f)
+        os.replace(f'{path}.tmp', path)
+
+    def log_for(self, exchange: str, market: str, kind: str) -> ColumnarLog:
+        return self.logs[(exchange, str(market))][kind]
+
+    def _book_levels(self, client: MarketClient, entries: list):
+        levels = np.zeros((self.depth, 2))
+        for i, entry in enumerate(entries[:self.depth]):
+            levels[i] = client._order_book_entry_price(entry), client._order_book_entry_amount(entry)
+        return levels
+
+    def record_book(self, client: MarketClient, timestamp: float):
+        order_book = client.get_order_book()
+        bids = self._book_levels(client, order_book.bids)
+        asks = self._book_levels(client, order_book.asks)
+        logs = self.logs[self._key(client)]
+        logs['book'].append(timestamp=[timestamp], book=np.stack([bids, asks])[None])
+        logs['ticker'].append(timestamp=[timestamp], bid=[bids[0, 0]], bid_amount=[bids[0, 1]],
+                              ask=[asks[0, 0]], ask_amount=[asks[0, 1]])
+
+    def record_trades(self, client: MarketClient):
+        key = self._key(client)
+        since, seen = self.last_trade[key]
+        trades = client.get_trades(since)
+        if since is None:
+            new = trades
+        elif seen is None:
+            new = [t for t in trades if t['timestamp'] > since]
+        else:
+            new = [t for t in trades if t['timestamp'] >= since and t['id'] not in seen]
+        if not new:
+            return 0
+        new.sort(key=lambda t: t['timestamp'])
+        trades_log = self.logs[key]['trades']
+        trades_log.append(
+            timestamp=[t['timestamp'] for t in new],
+            rate=[t['rate'] for t in new],
+            amount=[t['amount'] for t in new],
+        )
+        last = new[-1]['timestamp']
+        # Keep the ids at the last timestamp, the next poll starts from it
+        last_ids = {t['id'] for t in new if t['timestamp'] == last}
+        if last == since and seen:
+            last_ids |= seen
+        # Ids are kept across restarts, trades at the last timestamp may still arrive
+        self._save_cursor(trades_log, last, last_ids)
+        self.last_trade[key] = last, last_ids
+        return len(new)
+
+    def record(self, timestamp: float=None):
+        """Record a snapshot of every client"""
+        timestamp = timestamp or time.time()
+        for client in self.clients:
+            try:
+                self.record_book(client, timestamp)
+                if self._key(client) in self.last_trade:
+                    count = self.record_trades(client)
+                    self.log.debug(f'Recorded {client.name} {client.market}: {count} new trades')
+            except Exception:
+                self.log.exception(f'Failed recording {client.name} {client.market}!')
+        day = day_of(timestamp)
+        if self.seal and day != self.day:
+            self.seal_before(timestamp)
+        self.day = day
+
+    def seal_before(self, timestamp: float):
+        for logs in self.logs.values():
+            for columnar_log in logs.values():
+                columnar_log.seal_before(timestamp)
+
+    def run(self, interval: float=10):
+        self.log.info(f'Recording {len(self.clients)} markets every {interval}s into {self.directory}')
+        while True:
+            self.record()
+            time.sleep(interval)
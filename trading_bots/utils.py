@@ -1,4 +1,5 @@
 import math
+import re
 from datetime import datetime
 
 DECIMALS = {
@@ -17,6 +18,14 @@ DECIMALS = {
     'LTC': 8,
 }
 
+INTERVAL_UNITS = {
+    's': 1, 'sec': 1, 'S': 1,
+    'min': 60, 'm': 60, 'T': 60,
+    'h': 3600, 'H': 3600,
+    'd': 86400, 'D': 86400,
+    'w': 604800, 'W': 604800,
+}
+
 
 def get_iso_time_str(timestamp=None):
     """Get the ISO time string from a timestamp or date obj. Returns current time str if no timestamp is passed"""
@@ -27,6 +36,17 @@ def get_iso_time_str(timestamp=None):
     return timestamp.isoformat(sep=' ', timespec='seconds')
 
 
+def interval_to_seconds(interval: (str, int, float)):
+    """Convert an interval such as '5min', '1h' or '30s' (pandas style) to seconds"""
+    if isinstance(interval, (int, float)):
+        return interval
+    match = re.fullmatch(r'\s*(\d*\.?\d*)\s*([a-zA-Z]+)\s*', interval)
+    assert match and match.group(2) in INTERVAL_UNITS, f'Invalid interval: {interval}'
+    value = float(match.group(1) or 1)
+    seconds = value * INTERVAL_UNITS[match.group(2)]
+    return int(seconds) if seconds.is_integer() else seconds
+
+
 def truncate(value: float, decimal_places: int):
     """Truncates a value to a number of decimals places"""
     return math.trunc(value * (10 ** decimal_places)) / (10 ** decimal_places)